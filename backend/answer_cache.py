@@ -0,0 +1,370 @@
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Files whose content the cached answers depend on
+KNOWLEDGE_FILES = ["data/rag_knowledge.json", "texts.json"]
+
+_file_hashes = {}
+_file_hashes_lock = threading.Lock()
+
+
+def knowledge_version(paths=KNOWLEDGE_FILES) -> str:
+    """
+    Content hash of the knowledge files.
+
+    Each file is only re-hashed when its size or modification time changes,
+    so this is cheap enough to call on every request.
+    """
+    digest = hashlib.sha256()
+    with _file_hashes_lock:
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                digest.update(f"{path}:missing".encode())
+                continue
+            key = (stat.st_mtime_ns, stat.st_size)
+            cached = _file_hashes.get(path)
+            if cached is None or cached[0] != key:
+                with open(path, "rb") as f:
+                    cached = (key, hashlib.sha256(f.read()).hexdigest())
+                _file_hashes[path] = cached
+            digest.update(f"{path}:{cached[1]}".encode())
+    return digest.hexdigest()[:16]
+
+
+_punctuation_re = re.compile(r"[^\w\s+#]+")
+_whitespace_re = re.compile(r"\s+")
+
+
+def canonicalize(query: str) -> str:
+    """
+    Canonical form of a question for exact-match caching.
+
+    Lowercases, turns punctuation into spaces (keeping "+" and "#" so C++
+    and C# stay distinct) and collapses whitespace. Only spellings every
+    guard treats alike share a key, so "Mayank's" and "his" stay distinct.
+    """
+    text = _punctuation_re.sub(" ", query.lower())
+    return _whitespace_re.sub(" ", text).strip()
+
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+
+
+class ResponseCache:
+    """
+    In-process LRU from canonicalized questions to final answers, together
+    with the path that produced each answer (see answer_with_path()).
+
+    Keys include the content hash of the knowledge files, so updating the
+    knowledge base makes every earlier entry unreachable; those entries are
+    then dropped as the cache fills up.
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, query: str):
+        return (knowledge_version(), canonicalize(query))
+
+    def get(self, query: str) -> Optional[str]:
+        entry = self.get_entry(query)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, query: str) -> Optional[Tuple[str, str]]:
+        """(answer, path) for a cached question, or None"""
+        key = self._key(query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, query: str, answer: str, path: str):
+        if self.max_entries <= 0:
+            return
+        key = self._key(query)
+        with self._lock:
+            self._entries[key] = (answer, path)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "2048"))
+
+
+class QueryEmbeddingCache:
+    """
+    In-process LRU from canonicalized questions to their embeddings.
+
+    The vectors are rows of one preallocated float32 array (2048 MiniLM
+    vectors take 3 MB), so a repeated question skips the encoder. embed()
+    encodes only the questions it has not seen, in one call to `encode`;
+    encoding happens outside the lock.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], np.ndarray], max_entries: int = QUERY_EMBEDDING_CACHE_SIZE):
+        self.encode = encode
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors = None
+        # canonical question -> row of self._vectors, in least-recently-used order
+        self._rows = OrderedDict()
+        self._free_rows = list(range(max_entries - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[np.ndarray]:
+        """The cached embedding of a question, or None (without encoding it)"""
+        key = canonicalize(query)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                return None
+            self._rows.move_to_end(key)
+            self.hits += 1
+            return self._vectors[row].copy()
+
+    def embed(self, queries: List[str]) -> np.ndarray:
+        """Embeddings of `queries` in order, as a float32 array"""
+        if self.max_entries <= 0:
+            with self._lock:
+                self.misses += len(queries)
+            return np.asarray(self.encode(queries), dtype="float32")
+
+        keys = [canonicalize(query) for query in queries]
+        vectors = {}
+        with self._lock:
+            for key in keys:
+                row = self._rows.get(key)
+                if row is not None and key not in vectors:
+                    self._rows.move_to_end(key)
+                    vectors[key] = self._vectors[row].copy()
+            found = sum(key in vectors for key in keys)
+            self.hits += found
+            self.misses += len(keys) - found
+
+        missing = {}
+        for key, query in zip(keys, queries):
+            if key not in vectors:
+                missing.setdefault(key, query)
+        if missing:
+            encoded = np.asarray(self.encode(list(missing.values())), dtype="float32")
+            vectors.update(zip(missing, encoded))
+            with self._lock:
+                if self._vectors is None:
+                    self._vectors = np.zeros((self.max_entries, encoded.shape[1]), dtype="float32")
+                for key, vector in zip(missing, encoded):
+                    row = self._rows.get(key)
+                    if row is None:
+                        if not self._free_rows:
+                            _, oldest = self._rows.popitem(last=False)
+                            self._free_rows.append(oldest)
+                        row = self._free_rows.pop()
+                    self._vectors[row] = vector
+                    self._rows[key] = row
+                    self._rows.move_to_end(key)
+
+        if not keys:
+            return np.zeros((0, 0), dtype="float32")
+        return np.stack([vectors[key] for key in keys])
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+            self._free_rows = list(range(self.max_entries - 1, -1, -1))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._rows),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "bytes": self._vectors.nbytes if self._vectors is not None else 0,
+            }
+
+
+def parse_section_thresholds(value: str) -> Dict[str, float]:
+    """Parse "projects=0.95,profile=0.9" into {"projects": 0.95, "profile": 0.9}"""
+    thresholds = {}
+    for item in value.split(","):
+        if "=" in item:
+            section, threshold = item.split("=", 1)
+            thresholds[section.strip()] = float(threshold)
+    return thresholds
+
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+SEMANTIC_CACHE_SECTION_THRESHOLDS = parse_section_thresholds(os.getenv("SEMANTIC_CACHE_SECTION_THRESHOLDS", ""))
+SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", "512"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", "3600"))
+
+
+class SemanticCache:
+    """
+    Answer cache keyed on question embeddings.
+
+    A stored answer is returned when a new question's embedding has a cosine
+    similarity with a stored question of at least the threshold for its
+    section. Questions are only compared with questions of the same section.
+    Entries are evicted least-recently-used once the cache is full and expire
+    after `ttl` seconds. The whole cache is dropped when the knowledge files
+    change.
+    """
+
+    def __init__(
+        self,
+        encode,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        section_thresholds: Optional[Dict[str, float]] = None,
+        max_entries: int = SEMANTIC_CACHE_SIZE,
+        ttl: float = SEMANTIC_CACHE_TTL,
+        enabled: bool = SEMANTIC_CACHE_ENABLED,
+    ):
+        self.encode = encode
+        self.threshold = threshold
+        self.section_thresholds = section_thresholds if section_thresholds is not None else SEMANTIC_CACHE_SECTION_THRESHOLDS
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # A cache with no room (SEMANTIC_CACHE_SIZE=0) is off
+        self.enabled = enabled and max_entries > 0
+        self._lock = threading.Lock()
+        self._vectors = None
+        # slot -> (question, answer, section, stored_at), in least-recently-used order
+        self._entries = OrderedDict()
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self._version = knowledge_version()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.encode([query]), dtype="float32")[0]
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _check_version(self):
+        version = knowledge_version()
+        if version != self._version:
+            self._version = version
+            self._entries.clear()
+            self._free_slots = list(range(self.max_entries - 1, -1, -1))
+            self.invalidations += 1
+
+    def _drop(self, slot: int):
+        del self._entries[slot]
+        self._free_slots.append(slot)
+
+    def lookup(self, query: str, section: Optional[str] = None, embedding: Optional[np.ndarray] = None):
+        """
+        Look up a question.
+
+        Returns (answer, embedding); answer is None on a miss. Pass the
+        embedding back to store() to avoid encoding the question twice.
+        An embedding already computed for the question (e.g. for retrieval)
+        can be passed in to skip encoding it here.
+        """
+        if not self.enabled:
+            return None, None
+
+        if embedding is None:
+            embedding = self._embed(query)
+        else:
+            norm = np.linalg.norm(embedding)
+            embedding = np.asarray(embedding, dtype="float32") / norm if norm else embedding
+        threshold = self.section_thresholds.get(section, self.threshold)
+        now = time.time()
+
+        with self._lock:
+            self._check_version()
+
+            slots = [slot for slot, entry in self._entries.items() if entry[2] == section]
+            expired = [slot for slot in slots if now - self._entries[slot][3] > self.ttl]
+            for slot in expired:
+                self._drop(slot)
+            slots = [slot for slot in slots if slot not in expired]
+
+            if slots:
+                similarities = self._vectors[slots] @ embedding
+                best = int(np.argmax(similarities))
+                if similarities[best] >= threshold:
+                    slot = slots[best]
+                    self._entries.move_to_end(slot)
+                    self.hits += 1
+                    return self._entries[slot][1], embedding
+
+            self.misses += 1
+            return None, embedding
+
+    def store(self, embedding, query: str, answer: str, section: Optional[str] = None):
+        """Store the answer to a question, evicting the least recently used entry if full"""
+        if not self.enabled or embedding is None:
+            return
+
+        with self._lock:
+            self._check_version()
+
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, embedding.shape[0]), dtype="float32")
+
+            if not self._free_slots:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+
+            slot = self._free_slots.pop()
+            self._vectors[slot] = embedding
+            self._entries[slot] = (query, answer, section, time.time())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._free_slots = list(range(self.max_entries - 1, -1, -1))
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "knowledge_version": self._version,
+            }
@@ -1,14 +1,35 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import List
+import json
 import os
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Import the Gemini-based system
-from gemini_portfolio import answer, get_all_education, get_all_experience, get_all_projects, get_all_skills, get_profile
+# Select the answer pipeline: "gemini" (structured data + Gemini) or "rag" (FAISS + Gemini/local Qwen)
+ANSWER_PIPELINE = os.getenv("ANSWER_PIPELINE", "gemini").lower()
+
+if ANSWER_PIPELINE == "rag":
+    from rag import answer, answer_with_path, answer_uncached, prepare_batch, finish_batch_item, stream_answer, response_cache, semantic_cache, query_embeddings, stage_stats, token_usage, warmup_steps, get_all_education, get_all_experience, get_all_projects, get_all_skills, get_profile
+else:
+    # Import the Gemini-based system
+    from gemini_portfolio import answer, answer_with_path, answer_uncached, prepare_batch, finish_batch_item, stream_answer, response_cache, semantic_cache, query_embeddings, token_usage, warmup_steps, get_all_education, get_all_experience, get_all_projects, get_all_skills, get_profile
+    # The Gemini pipeline has no retrieval stage
+    stage_stats = None
+import components
+import metrics
+import self_test
+from batch import BATCH_MAX_QUESTIONS, run_batch
+from gemini_client import gemini_client
+from health import DeepCheck
+from http_cache import STATIC_CACHE_TTL, ask_cache_control, cache_control, cached_json
+from tracing import Trace, traced
+from worker_pool import answer_pool, PoolSaturated
 
 app = FastAPI(
     title="Mayank's Portfolio API", 
@@ -37,38 +58,227 @@ app.add_middleware(
     allow_origins=ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],
-    allow_headers=["Content-Type", "Authorization", "Accept"],
+    allow_headers=["Content-Type", "Authorization", "Accept", "If-None-Match"],
     expose_headers=["*"]
 )
 
+HEALTH_QUESTION = "What is Mayank's current role?"
+
+def run_health_question():
+    """Answer the health question through the full pipeline (not the response cache)"""
+    response, path = answer_uncached(HEALTH_QUESTION)
+    healthy = "glidecloud" in response.lower() or "ai engineer" in response.lower()
+    return healthy, path
+
+deep_check = DeepCheck(run_health_question)
+
+@app.on_event("startup")
+async def start_warmup():
+    """
+    Load the heavy components in the background when WARMUP is enabled, and
+    start the deep health check schedule (first run right away with WARMUP,
+    otherwise after one interval so startup stays lazy)
+    """
+    if components.WARMUP:
+        components.warmup.start(warmup_steps())
+    deep_check.start(first_delay=0 if components.WARMUP else None)
+
 class ChatRequest(BaseModel):
     question: str
 
+class BatchRequest(BaseModel):
+    questions: List[str] = Field(..., min_length=1)
+
 class DirectAccessRequest(BaseModel):
     section: str
 
+def explain_report(trace: Trace, path: str) -> dict:
+    """The ?explain=1 part of a response: answer path, stage timings and what the stages found"""
+    return {"path": path, "timings_ms": trace.timings_ms(), **trace.details}
+
 @app.post("/chat", response_model=dict)
-async def chat(req: ChatRequest):
+async def chat(req: ChatRequest, response: Response, explain: bool = False):
     """
     Endpoint to answer questions about Mayank's portfolio.
     Uses the Gemini AI system with structured portfolio data.
+
+    Stage timings are sent in a Server-Timing header; ?explain=1 also
+    returns the answer path, retrieved documents and token counts.
     """
+    trace = Trace(explain)
+    path = "error"
     try:
-        response = answer(req.question)
-        return {
-            "answer": response,
+        answer_text, path = await answer_pool.run(traced, trace, answer_with_path, req.question)
+        response.headers["Server-Timing"] = trace.server_timing()
+        content = {
+            "answer": answer_text,
             "success": True,
-            "system": "gemini"
+            "system": ANSWER_PIPELINE
         }
+        if explain:
+            content["explain"] = explain_report(trace, path)
+        return content
+    except PoolSaturated as e:
+        path = "busy"
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is busy right now. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         print(f"Error in chat endpoint: {str(e)}")
         raise HTTPException(
             status_code=500,
             detail="I encountered an error processing your question. Please try again."
         )
+    finally:
+        metrics.request_seconds.observe(time.perf_counter() - trace.created, "/chat", path)
+
+@app.post("/chat/batch", response_model=dict)
+async def chat_batch(req: BatchRequest):
+    """
+    Answer a list of questions in one request.
+
+    Duplicates are answered once. Structured answers and refusals are ready
+    right away (the questions needing retrieval share one embedding call and
+    one index search); the rest go to Gemini / the local model, at most
+    BATCH_CONCURRENCY at a time. Results are in input order, each with a
+    status ("ok", "error" or "busy"), its answer path and seconds until ready.
+    """
+    if len(req.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch"
+        )
+    try:
+        report = await run_batch(req.questions, prepare_batch, finish_batch_item, answer_pool)
+    except PoolSaturated as e:
+        metrics.request_seconds.observe(0.0, "/chat/batch", "busy")
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is busy right now. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        print(f"Error in chat batch endpoint: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail="I encountered an error processing your questions. Please try again."
+        )
+    # One observation per question, with the seconds until its answer was ready
+    for item in report["results"]:
+        metrics.request_seconds.observe(item["seconds"], "/chat/batch", item["path"] or item["status"])
+    return {
+        "success": True,
+        "system": ANSWER_PIPELINE,
+        **report
+    }
+
+@app.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Stream the answer to a question as Server-Sent Events.
+
+    Events:
+    - token: {"text": ...} a piece of a generated answer, append it
+    - answer: {"text": ...} a complete answer (refusals and structured responses)
+    - retract: {"text": ...} the streamed text failed validation, replace it with this text
+    - error: {"text": ...} the answer could not be generated
+    - done: {} the stream is finished
+    """
+    start = time.perf_counter()
+    try:
+        events = answer_pool.stream(stream_answer, req.question)
+    except PoolSaturated as e:
+        metrics.request_seconds.observe(time.perf_counter() - start, "/chat/stream", "busy")
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is busy right now. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+
+    async def event_source():
+        path, first = "error", None
+        try:
+            async for event in events:
+                if event["event"] == "path":
+                    path = event["path"]
+                    continue
+                if first is None:
+                    first = time.perf_counter()
+                    metrics.time_to_first_token.observe(first - start)
+                data = {k: v for k, v in event.items() if k != "event"}
+                yield f"event: {event['event']}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            print(f"Error in chat stream endpoint: {str(e)}")
+            data = {"text": "I encountered an error processing your question. Please try again."}
+            yield f"event: error\ndata: {json.dumps(data)}\n\n"
+        finally:
+            metrics.request_seconds.observe(time.perf_counter() - start, "/chat/stream", path)
+        yield "event: done\ndata: {}\n\n"
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/ask", response_model=dict)
+async def ask(request: Request, q: str = Query(..., min_length=1), explain: bool = False):
+    """
+    GET variant of /chat that browsers and CDNs can cache.
+
+    Cache-Control depends on how the question was answered: a long max-age
+    for structured answers and refusals, a short one (ASK_LLM_TTL) for
+    Gemini and local model answers, none for errors. ?explain=1 responses
+    are never stored.
+    """
+    trace = Trace(explain)
+    try:
+        response, path = await answer_pool.run(traced, trace, answer_with_path, q)
+    except PoolSaturated as e:
+        metrics.request_seconds.observe(time.perf_counter() - trace.created, "/ask", "busy")
+        raise HTTPException(
+            status_code=503,
+            detail="The assistant is busy right now. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        print(f"Error in ask endpoint: {str(e)}")
+        metrics.request_seconds.observe(time.perf_counter() - trace.created, "/ask", "error")
+        raise HTTPException(
+            status_code=500,
+            detail="I encountered an error processing your question. Please try again."
+        )
+
+    content = {
+        "answer": response,
+        "success": True,
+        "system": ANSWER_PIPELINE,
+        "path": path
+    }
+    if explain:
+        content["explain"] = explain_report(trace, path)
+        result = JSONResponse(content, headers={"Cache-Control": "no-store"})
+    else:
+        result = cached_json(request, content, ask_cache_control(path))
+    result.headers["Server-Timing"] = trace.server_timing()
+    metrics.request_seconds.observe(time.perf_counter() - trace.created, "/ask", path)
+    return result
+
+SECTION_CONTENT = {
+    "education": get_all_education,
+    "experience": get_all_experience,
+    "projects": get_all_projects,
+    "skills": get_all_skills,
+    "profile": get_profile
+}
+
+# The portfolio data is loaded once at import, so each section is rendered once
+_section_cache = {}
 
 @app.get("/sections/{section_name}", response_model=dict)
-async def get_section(section_name: str):
+async def get_section(section_name: str, request: Request):
     """
     Direct access to specific portfolio sections.
     Available sections: education, experience, projects, skills, profile
@@ -76,27 +286,19 @@ async def get_section(section_name: str):
     try:
         section_name = section_name.lower().strip()
         
-        if section_name == "education":
-            content = get_all_education()
-        elif section_name == "experience":
-            content = get_all_experience()
-        elif section_name == "projects":
-            content = get_all_projects()
-        elif section_name == "skills":
-            content = get_all_skills()
-        elif section_name == "profile":
-            content = get_profile()
-        else:
+        if section_name not in SECTION_CONTENT:
             raise HTTPException(
                 status_code=404,
                 detail=f"Section '{section_name}' not found. Available sections: education, experience, projects, skills, profile"
             )
+        if section_name not in _section_cache:
+            _section_cache[section_name] = SECTION_CONTENT[section_name]()
         
-        return {
+        return cached_json(request, {
             "section": section_name,
-            "content": content,
+            "content": _section_cache[section_name],
             "success": True
-        }
+        }, cache_control(STATIC_CACHE_TTL))
         
     except HTTPException:
         raise
@@ -105,87 +307,158 @@ async def get_section(section_name: str):
         raise HTTPException(status_code=500, detail="Error retrieving section data")
 
 @app.get("/test", response_model=dict)
-async def test_endpoint():
-    """Test endpoint to verify the system is working"""
-    test_queries = [
-        "What is Mayank's education?",
-        "Tell me about Mayank's experience",
-        "Does Mayank speak German?",
-        "What projects has Mayank worked on?",
-        "What skills does Mayank have?"
-    ]
-    
-    results = []
-    for query in test_queries:
+async def test_endpoint(
+    suite: str = Query("default", pattern="^(default|full)$"),
+    concurrency: int = Query(self_test.TEST_CONCURRENCY, ge=1, le=32),
+    timeout: float = Query(self_test.TEST_TIMEOUT, gt=0, le=300)
+):
+    """
+    Test endpoint to verify the system is working.
+
+    Runs the built-in queries (or TEST_SUITE_FILE with suite=full)
+    concurrently on the answer pool and reports each answer's status, path
+    and latency plus a summary.
+    """
+    if suite == "full":
         try:
-            result = answer(query)
-            
-            # Check for key indicators
-            status = "PASS"
-            if "not available" in str(result).lower() and "german" not in query.lower():
-                status = "WARNING: Missing data"
-            elif "error" in str(result).lower():
-                status = "ERROR"
-            
-            results.append({
-                "query": query,
-                "result_preview": str(result)[:150] + "..." if len(str(result)) > 150 else str(result),
-                "status": status,
-                "length": len(str(result))
-            })
-        except Exception as e:
-            results.append({
-                "query": query,
-                "error": str(e),
-                "status": "ERROR"
-            })
-    
+            items = self_test.load_suite()
+        except (OSError, ValueError) as e:
+            raise HTTPException(status_code=500, detail=f"Could not load test suite: {e}")
+    else:
+        items = [{"query": query} for query in self_test.DEFAULT_QUERIES]
+
+    report = await self_test.run_suite(
+        items,
+        lambda query: answer_pool.run(answer_with_path, query),
+        concurrency=concurrency,
+        timeout=timeout
+    )
     return {
-        "system": "gemini",
+        "system": ANSWER_PIPELINE,
         "status": "operational",
-        "tests": results,
+        "suite": suite,
+        **report,
         "note": "Testing key portfolio queries"
     }
 
 @app.get("/health", response_model=dict)
 async def health_check():
-    """Health check endpoint for monitoring"""
-    # Quick test to ensure system is working
-    try:
-        test_response = answer("What is Mayank's current role?")
-        is_healthy = "glidecloud" in test_response.lower() or "ai engineer" in test_response.lower()
-        
-        return {
-            "status": "healthy" if is_healthy else "degraded",
-            "service": "portfolio-api",
-            "version": "2.0.0",
-            "system": "gemini",
-            "timestamp": os.getenv("DEPLOYMENT_TIME", "unknown"),
-            "quick_test": "passed" if is_healthy else "failed"
-        }
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "service": "portfolio-api",
-            "error": str(e),
-            "system": "gemini"
+    """
+    Health check endpoint for monitoring.
+
+    Serves the last result of the deep check, which answers a real question
+    every HEALTH_CHECK_INTERVAL seconds in the background, so a probe never
+    waits for (or spends) a Gemini call.
+    """
+    check = deep_check.status()
+    status = {"passed": "healthy", "failed": "degraded", "error": "unhealthy"}.get(check["outcome"], "unknown")
+    return {
+        "status": status,
+        "service": "portfolio-api",
+        "version": "2.0.0",
+        "system": ANSWER_PIPELINE,
+        "timestamp": os.getenv("DEPLOYMENT_TIME", "unknown"),
+        "quick_test": check["outcome"],
+        "deep_check": check,
+        "pool": answer_pool.stats()
+    }
+
+@app.get("/livez")
+async def liveness():
+    """Liveness: the process is up and its event loop responds (no models or upstreams involved)"""
+    return {"alive": True}
+
+@app.get("/readyz")
+async def readiness():
+    """
+    Readiness for the load balancer, with which components are loaded.
+
+    Components load on first use, so the service is ready right away unless
+    WARMUP is enabled; then it is ready once the warmup has loaded what the
+    pipeline needs ("degraded": only optional steps are still being retried).
+    """
+    warmup = components.warmup.status()
+    ready = warmup["state"] in ("disabled", "done", "degraded")
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "system": ANSWER_PIPELINE,
+            "warmup": warmup,
+            "components": components.status()
         }
+    )
+
+@app.get("/stats", response_model=dict)
+async def get_stats():
+    """Worker pool queue depth, in-flight counts, cache hit rates and the Gemini client's circuit state"""
+    stats = {
+        "pool": answer_pool.stats(),
+        "response_cache": response_cache.stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "query_embeddings": query_embeddings.stats(),
+        "gemini_tokens": token_usage.stats(),
+        "gemini_client": gemini_client.get().stats()
+    }
+    if stage_stats is not None:
+        stats["stages"] = stage_stats.stats()
+    return stats
+
+# ---------- METRICS ----------
+# Read from the pool and caches at scrape time, so they cost nothing per request
+CACHES = {"response": response_cache, "semantic": semantic_cache, "query_embeddings": query_embeddings}
+
+def cache_stat(key: str):
+    return lambda: [((name,), cache.stats()[key]) for name, cache in CACHES.items()]
+
+metrics.Collected("portfolio_pool_queue_depth", "Answers waiting for a worker", "gauge", (),
+                  lambda: [((), answer_pool.stats()["queue_depth"])])
+metrics.Collected("portfolio_pool_in_flight", "Answers being computed by a worker", "gauge", (),
+                  lambda: [((), answer_pool.stats()["in_flight"])])
+metrics.Collected("portfolio_pool_rejected_total", "Requests rejected with 503 because the queue was full", "counter", (),
+                  lambda: [((), answer_pool.stats()["rejected"])])
+metrics.Collected("portfolio_cache_hits_total", "Cache hits", "counter", ("cache",), cache_stat("hits"))
+metrics.Collected("portfolio_cache_misses_total", "Cache misses", "counter", ("cache",), cache_stat("misses"))
+metrics.Collected("portfolio_cache_hit_ratio", "Cache hits / lookups since start", "gauge", ("cache",), cache_stat("hit_ratio"))
+metrics.Collected("portfolio_cache_entries", "Cached entries", "gauge", ("cache",), cache_stat("entries"))
+metrics.Collected("portfolio_gemini_tokens_total", "Gemini tokens used, by kind", "counter", ("kind",),
+                  lambda: [((kind,), token_usage.stats()[f"{kind}_tokens"]) for kind in ("prompt", "cached", "output")])
+metrics.Collected("portfolio_gemini_retries_total", "Gemini calls retried after a timeout, connection error, 429 or 5xx", "counter", (),
+                  lambda: [((), gemini_client.get().stats()["retries"])])
+metrics.Collected("portfolio_gemini_circuit_open", "1 while the Gemini circuit breaker is open or probing", "gauge", (),
+                  lambda: [((), int(gemini_client.get().breaker.state != "closed"))])
+
+@app.get("/metrics")
+async def get_metrics():
+    """
+    Prometheus metrics: request latency by endpoint and answer path, Gemini /
+    local model call durations and errors, streaming time to first token,
+    worker pool depth, cache hit ratios and process memory
+    """
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/info", response_model=dict)
-async def get_info():
+async def get_info(request: Request):
     """Get API information and available endpoints"""
     endpoints = {
         "POST /chat": "Ask questions about Mayank's portfolio",
+        "POST /chat/stream": "Ask a question and stream the answer as Server-Sent Events",
+        "POST /chat/batch": "Ask a list of questions in one request",
+        "GET /ask?q=": "Ask a question with a cacheable GET request",
         "GET /sections/{section}": "Direct access to portfolio sections",
-        "GET /test": "Test the system with sample queries",
-        "GET /health": "Health check",
+        "GET /test": "Test the system with sample queries (suite=full for TEST_SUITE_FILE)",
+        "GET /health": "Last result of the background deep health check",
+        "GET /livez": "Liveness (in-process only)",
+        "GET /readyz": "Readiness and which models/indexes are loaded",
+        "GET /stats": "Worker pool, cache and Gemini token usage statistics",
+        "GET /metrics": "Prometheus metrics",
         "GET /info": "This information",
         "GET /": "Root endpoint"
     }
     
     sections = ["education", "experience", "projects", "skills", "profile"]
     
-    return {
+    return cached_json(request, {
         "message": "Mayank's Portfolio API",
         "version": "2.0.0",
         "system": "gemini-ai",
@@ -200,12 +473,12 @@ async def get_info():
             "CORS-enabled for web apps",
             "Out-of-context filtering"
         ]
-    }
+    }, cache_control(STATIC_CACHE_TTL))
 
 @app.get("/", response_model=dict)
-async def root():
+async def root(request: Request):
     """Root endpoint with API information"""
-    return {
+    return cached_json(request, {
         "message": "Welcome to Mayank's Portfolio API",
         "description": "This API provides information about Mayank D. Kulkarni's portfolio using Gemini AI",
         "quick_start": "POST to /chat with {\"question\": \"your question here\"}",
@@ -218,7 +491,7 @@ async def root():
         ],
         "documentation": "Visit /info for complete API details",
         "health_check": "Visit /health to check system status"
-    }
+    }, cache_control(STATIC_CACHE_TTL))
 
 # Optional: Add request logging middleware
 from fastapi import Request
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+from typing import Callable, List
+
+from answer_cache import canonicalize
+from worker_pool import AnswerPool, PoolSaturated
+
+# Most questions accepted by POST /chat/batch, and how many of its
+# Gemini / local model answers run at once
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+
+class BatchJob:
+    """A batch question that still needs Gemini or the local model"""
+
+    __slots__ = ("query", "context", "embedding", "state")
+
+    def __init__(self, query: str, context: str, embedding, state=None):
+        self.query = query
+        self.context = context
+        self.embedding = embedding
+        # Anything else the pipeline carries from prepare_batch to finish_batch_item
+        self.state = state
+
+
+async def run_batch(questions: List[str], prepare_batch: Callable, finish_batch_item: Callable,
+                    pool: AnswerPool, concurrency: int = BATCH_CONCURRENCY) -> dict:
+    """
+    Answer a list of questions.
+
+    Questions are deduplicated on the same normalized form as the response
+    cache. prepare_batch(unique_questions) runs once on the pool and returns,
+    per question, either a final (answer, path) or a BatchJob; the jobs are
+    then finished with finish_batch_item(job) -> (answer, path), at most
+    `concurrency` at a time. Results come back in input order with a status
+    and the seconds from the start of the batch until the answer was ready.
+    Raises PoolSaturated if the batch cannot be admitted at all.
+    """
+    start = time.perf_counter()
+
+    unique, first_index, positions = [], {}, []
+    for i, question in enumerate(questions):
+        key = canonicalize(question)
+        if key not in first_index:
+            first_index[key] = len(unique)
+            unique.append((i, question))
+        positions.append(first_index[key])
+
+    prepared = await pool.run(prepare_batch, [question for _, question in unique])
+    prepared_seconds = round(time.perf_counter() - start, 3)
+
+    items = [None] * len(unique)
+    for n, result in enumerate(prepared):
+        if not isinstance(result, BatchJob):
+            items[n] = {"answer": result[0], "path": result[1], "status": "ok", "seconds": prepared_seconds}
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def finish(n: int, job: BatchJob):
+        async with semaphore:
+            try:
+                answer, path = await pool.run(finish_batch_item, job)
+                items[n] = {"answer": answer, "path": path, "status": "error" if path == "error" else "ok"}
+            except PoolSaturated:
+                items[n] = {"answer": None, "path": None, "status": "busy"}
+            except Exception as e:
+                print(f"Error in batch question: {str(e)}")
+                items[n] = {"answer": None, "path": None, "status": "error"}
+            items[n]["seconds"] = round(time.perf_counter() - start, 3)
+
+    jobs = [finish(n, result) for n, result in enumerate(prepared) if isinstance(result, BatchJob)]
+    await asyncio.gather(*jobs)
+
+    results = []
+    for i, question in enumerate(questions):
+        item = dict(items[positions[i]], question=question)
+        original = unique[positions[i]][0]
+        if original != i:
+            item["duplicate_of"] = original
+        results.append(item)
+
+    paths, statuses = {}, {}
+    for item in items:
+        paths[item["path"]] = paths.get(item["path"], 0) + 1
+        statuses[item["status"]] = statuses.get(item["status"], 0) + 1
+
+    return {
+        "results": results,
+        "summary": {
+            "total": len(questions),
+            "unique": len(unique),
+            "llm": len(jobs),
+            "by_path": paths,
+            "by_status": statuses,
+            "prepared_seconds": prepared_seconds,
+            "seconds": round(time.perf_counter() - start, 3)
+        }
+    }
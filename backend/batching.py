@@ -0,0 +1,398 @@
+import inspect
+import threading
+from collections import deque
+from concurrent.futures import Future, InvalidStateError
+from typing import List
+
+import torch
+import torch.nn.functional as F
+from transformers import RepetitionPenaltyLogitsProcessor
+
+try:
+    from transformers import DynamicCache
+except ImportError:
+    DynamicCache = None
+
+
+def _to_legacy(past_key_values):
+    if hasattr(past_key_values, "to_legacy_cache"):
+        return past_key_values.to_legacy_cache()
+    return past_key_values
+
+
+def _from_legacy(legacy):
+    if DynamicCache is not None:
+        return DynamicCache.from_legacy_cache(legacy)
+    return legacy
+
+
+def _last_logits_kwargs(model) -> dict:
+    """Ask the model for the last position's logits only, where it supports it (as generate() does)"""
+    parameters = inspect.signature(model.forward).parameters
+    for name in ("logits_to_keep", "num_logits_to_keep"):
+        if name in parameters:
+            return {name: 1}
+    return {}
+
+
+class _Sequence:
+    __slots__ = ("token_ids", "prompt_length", "ngram_size", "ngrams", "inputs", "future", "streamer")
+
+    def __init__(self, inputs, future, streamer, ngram_size: int):
+        self.inputs = inputs
+        self.token_ids = inputs["input_ids"][0].tolist()
+        self.prompt_length = len(self.token_ids)
+        self.future = future
+        self.streamer = streamer
+
+        # (n-1)-token prefix -> tokens that followed it, kept up to date as
+        # tokens are appended instead of rescanning the history every step
+        self.ngram_size = ngram_size
+        self.ngrams = {}
+        for end in range(ngram_size, len(self.token_ids) + 1):
+            self._add_ngram(end)
+
+    def _add_ngram(self, end: int):
+        ngram = self.token_ids[end - self.ngram_size:end]
+        self.ngrams.setdefault(tuple(ngram[:-1]), set()).add(ngram[-1])
+
+    def append(self, token: int):
+        self.token_ids.append(token)
+        if len(self.token_ids) >= self.ngram_size:
+            self._add_ngram(len(self.token_ids))
+
+    def banned_tokens(self):
+        """Tokens that would repeat an n-gram (same rule as no_repeat_ngram_size)"""
+        if len(self.token_ids) + 1 < self.ngram_size:
+            return ()
+        return self.ngrams.get(tuple(self.token_ids[len(self.token_ids) + 1 - self.ngram_size:]), ())
+
+    @property
+    def generated(self) -> List[int]:
+        return self.token_ids[self.prompt_length:]
+
+
+class BatchEngine:
+    """
+    Continuous (iteration-level) batching for greedy generation.
+
+    Requests are prefilled one at a time as they arrive (prefill is
+    compute-bound, so batching it buys nothing on CPU) and then join a
+    shared decode loop: every step feeds the last token of each running
+    sequence through the model as one batch. The per-sequence key/value
+    caches are left-padded to a common length and padding is hidden with
+    the attention mask; position ids are passed explicitly so every
+    sequence keeps its own positions. Finished sequences leave the batch
+    after the step that completed them and waiting ones join before the
+    next step, so a long answer never holds up a short one.
+
+    Decoding matches generate() with do_sample=False, repetition_penalty
+    and no_repeat_ngram_size, applied to each sequence's own tokens.
+
+    An error only fails the sequence it belongs to: a failed prefill fails
+    that request, and if a batched decode step fails, the step is re-run one
+    sequence at a time so only the sequences it fails for are dropped.
+    Cancelling a request's future (e.g. its stream consumer went away)
+    removes it from the batch before the next step.
+    """
+
+    def __init__(
+        self,
+        model,
+        eos_token_id: int,
+        max_new_tokens: int = 150,
+        repetition_penalty: float = 1.2,
+        no_repeat_ngram_size: int = 3,
+        max_batch_size: int = 8,
+    ):
+        self.model = model
+        self.eos_token_id = eos_token_id
+        self.max_new_tokens = max_new_tokens
+        self.max_batch_size = max_batch_size
+        self.no_repeat_ngram_size = no_repeat_ngram_size
+        self._repetition_penalty = RepetitionPenaltyLogitsProcessor(repetition_penalty)
+        # Prefill only needs the next-token logits; with a large vocabulary
+        # the logits for every prompt position cost more than the layers
+        self._prefill_kwargs = _last_logits_kwargs(model)
+
+        self._pending = deque()
+        self._cond = threading.Condition()
+        # Running sequences and their batched cache, one row per sequence
+        self._active: List[_Sequence] = []
+        self._keys = []
+        self._values = []
+        self._mask = None
+
+        self.steps = 0
+        self.tokens_generated = 0
+        self.batched_tokens = 0
+        self.completed = 0
+
+        # The decode loop thread starts with the first request, so a process
+        # that only loads the model (serve.py's parent) can fork safely
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # ---------- PUBLIC API ----------
+    def submit(self, inputs, streamer=None) -> Future:
+        """
+        Queue a prompt for generation.
+
+        `inputs` holds input_ids (and optionally past_key_values for a cached
+        prompt prefix). The returned future resolves to the generated token
+        ids. A transformers streamer receives the tokens as they are produced.
+        Cancel the future to stop generating for a request nobody waits for.
+        """
+        future = Future()
+        self._ensure_started()
+        if streamer is not None:
+            streamer.put(inputs["input_ids"].cpu())
+        with self._cond:
+            self._pending.append(_Sequence(inputs, future, streamer, self.no_repeat_ngram_size))
+            self._cond.notify()
+        return future
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="qwen-batching", daemon=True)
+                    self._thread.start()
+
+    def generate(self, inputs) -> List[int]:
+        """Blocking helper around submit()"""
+        return self.submit(inputs).result()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "active": len(self._active),
+                "pending": len(self._pending),
+                "max_batch_size": self.max_batch_size,
+                "decode_steps": self.steps,
+                "tokens_generated": self.tokens_generated,
+                "avg_batch_size": round(self.batched_tokens / self.steps, 2) if self.steps else 0.0,
+                "completed": self.completed,
+            }
+
+    # ---------- SCHEDULER LOOP ----------
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._active:
+                    self._cond.wait()
+                joining = []
+                while self._pending and len(self._active) + len(joining) < self.max_batch_size:
+                    seq = self._pending.popleft()
+                    if not seq.future.cancelled():
+                        joining.append(seq)
+
+            with torch.no_grad():
+                for seq in joining:
+                    try:
+                        self._prefill(seq)
+                    except Exception as e:
+                        self._finish(seq, e)
+                self._drop_cancelled()
+                if self._active:
+                    try:
+                        self._decode_step()
+                    except Exception as e:
+                        # Batch bookkeeping itself failed; the cache can no longer be trusted
+                        self._fail(e)
+
+    def _fail(self, error):
+        for seq in self._active:
+            if not seq.future.done():
+                self._finish(seq, error)
+        with self._cond:
+            self._active = []
+            self._keys, self._values, self._mask = [], [], None
+
+    def _drop_cancelled(self):
+        keep = [row for row, seq in enumerate(self._active) if not seq.future.cancelled()]
+        if len(keep) < len(self._active):
+            for seq in self._active:
+                if seq.future.cancelled():
+                    self._finish(seq)
+            self._leave(keep)
+
+    # ---------- PREFILL / DECODE ----------
+    def _prefill(self, seq: _Sequence):
+        device = self.model.device
+        input_ids = seq.inputs["input_ids"].to(device)
+        past_key_values = seq.inputs.get("past_key_values")
+
+        # With a cached prompt prefix only the remaining tokens are prefilled
+        past_length = 0
+        if past_key_values is not None:
+            past_length = _to_legacy(past_key_values)[0][0].shape[2]
+
+        outputs = self.model(
+            input_ids=input_ids[:, past_length:],
+            attention_mask=torch.ones_like(input_ids),
+            past_key_values=past_key_values,
+            use_cache=True,
+            **self._prefill_kwargs
+        )
+        seq.inputs = None
+
+        if self._append_token(seq, outputs.logits[:, -1, :]):
+            self._finish(seq)
+            return
+        self._join(seq, _to_legacy(outputs.past_key_values))
+
+    def _forward(self, rows: List[int]):
+        """One decode step for some rows of the batch; returns their (logits, keys, values, mask)"""
+        device = self.model.device
+        sequences = [self._active[row] for row in rows]
+        keys, values, mask = self._keys, self._values, self._mask
+        if len(rows) < len(self._active):
+            index = torch.tensor(rows, device=mask.device)
+            keys = [k.index_select(0, index) for k in keys]
+            values = [v.index_select(0, index) for v in values]
+            mask = mask.index_select(0, index)
+
+        input_ids = torch.tensor([[seq.token_ids[-1]] for seq in sequences], device=device)
+        position_ids = torch.tensor([[len(seq.token_ids) - 1] for seq in sequences], device=device)
+        mask = torch.cat([mask, torch.ones(len(rows), 1, dtype=mask.dtype, device=device)], dim=1)
+
+        outputs = self.model(
+            input_ids=input_ids,
+            attention_mask=mask,
+            position_ids=position_ids,
+            past_key_values=_from_legacy(tuple(zip(keys, values))),
+            use_cache=True
+        )
+        legacy = _to_legacy(outputs.past_key_values)
+        return outputs.logits[:, -1, :], [layer[0] for layer in legacy], [layer[1] for layer in legacy], mask
+
+    def _forward_each(self, error):
+        """
+        Re-run a failed batched step one row at a time; fails the sequences
+        it still fails for and returns (rows, logits, keys, values, mask) of the rest
+        """
+        if len(self._active) == 1:
+            self._finish(self._active[0], error)
+            return [], None, None, None, None
+
+        rows, results = [], []
+        for row, seq in enumerate(self._active):
+            try:
+                results.append(self._forward([row]))
+                rows.append(row)
+            except Exception as e:
+                self._finish(seq, e)
+        if not rows:
+            return [], None, None, None, None
+        logits, keys, values, mask = zip(*results)
+        return (
+            rows,
+            torch.cat(logits),
+            [torch.cat(layer) for layer in zip(*keys)],
+            [torch.cat(layer) for layer in zip(*values)],
+            torch.cat(mask)
+        )
+
+    def _decode_step(self):
+        rows = list(range(len(self._active)))
+        try:
+            logits, keys, values, mask = self._forward(rows)
+        except Exception as e:
+            rows, logits, keys, values, mask = self._forward_each(e)
+
+        with self._cond:
+            self._active = [self._active[row] for row in rows]
+            self._keys, self._values, self._mask = (keys, values, mask) if rows else ([], [], None)
+        if not rows:
+            return
+
+        self.steps += 1
+        self.batched_tokens += len(rows)
+
+        keep = []
+        for row, seq in enumerate(self._active):
+            try:
+                finished = self._append_token(seq, logits[row:row + 1])
+            except Exception as e:
+                self._finish(seq, e)
+                continue
+            if finished:
+                self._finish(seq)
+            else:
+                keep.append(row)
+
+        if len(keep) < len(self._active):
+            self._leave(keep)
+
+    def _append_token(self, seq: _Sequence, logits) -> bool:
+        """Pick the next token of a sequence; returns True when the sequence is finished"""
+        history = torch.tensor([seq.token_ids], device=logits.device)
+        scores = self._repetition_penalty(history, logits.float())
+        banned = seq.banned_tokens()
+        if banned:
+            scores[0, list(banned)] = -float("inf")
+        token = int(torch.argmax(scores, dim=-1)[0])
+
+        seq.append(token)
+        self.tokens_generated += 1
+        if seq.streamer is not None:
+            seq.streamer.put(torch.tensor([token]))
+
+        return token == self.eos_token_id or len(seq.generated) >= self.max_new_tokens
+
+    def _finish(self, seq: _Sequence, error=None):
+        if seq.streamer is not None:
+            seq.streamer.end()
+        try:
+            if error is not None:
+                seq.future.set_exception(error)
+            else:
+                seq.future.set_result(seq.generated)
+                self.completed += 1
+        except InvalidStateError:
+            # Cancelled by the caller
+            pass
+
+    # ---------- BATCH MEMBERSHIP ----------
+    def _join(self, seq: _Sequence, legacy):
+        keys = [layer[0] for layer in legacy]
+        values = [layer[1] for layer in legacy]
+        length = keys[0].shape[2]
+        mask = torch.ones(1, length, dtype=torch.long, device=keys[0].device)
+
+        with self._cond:
+            if not self._active:
+                self._keys, self._values, self._mask = keys, values, mask
+            else:
+                # Left-pad the shorter side so all rows share one cache length
+                batch_length = self._mask.shape[1]
+                if length < batch_length:
+                    pad = batch_length - length
+                    keys = [F.pad(k, (0, 0, pad, 0)) for k in keys]
+                    values = [F.pad(v, (0, 0, pad, 0)) for v in values]
+                    mask = F.pad(mask, (pad, 0))
+                elif length > batch_length:
+                    pad = length - batch_length
+                    self._keys = [F.pad(k, (0, 0, pad, 0)) for k in self._keys]
+                    self._values = [F.pad(v, (0, 0, pad, 0)) for v in self._values]
+                    self._mask = F.pad(self._mask, (pad, 0))
+                self._keys = [torch.cat([a, b]) for a, b in zip(self._keys, keys)]
+                self._values = [torch.cat([a, b]) for a, b in zip(self._values, values)]
+                self._mask = torch.cat([self._mask, mask])
+            self._active.append(seq)
+
+    def _leave(self, keep: List[int]):
+        with self._cond:
+            self._active = [self._active[row] for row in keep]
+            if not keep:
+                self._keys, self._values, self._mask = [], [], None
+                return
+
+            rows = torch.tensor(keep, device=self._mask.device)
+            mask = self._mask.index_select(0, rows)
+            # Drop leading columns that are padding for every remaining row
+            start = int(torch.nonzero(mask.sum(dim=0))[0])
+            self._mask = mask[:, start:]
+            self._keys = [k.index_select(0, rows)[:, :, start:] for k in self._keys]
+            self._values = [v.index_select(0, rows)[:, :, start:] for v in self._values]
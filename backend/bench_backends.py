@@ -0,0 +1,112 @@
+# bench_backends.py
+# Compares the local model backends (QWEN_BACKEND) on the same questions:
+# load time, generate_answer latency, tokens/sec and resident memory.
+# Each backend runs in its own process so memory numbers do not mix.
+#
+#   python bench_backends.py                  # fp32 bf16 int8 onnx
+#   python bench_backends.py fp32 int8        # a subset
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import torch
+
+DEFAULT_BACKENDS = ["fp32", "bf16", "int8", "onnx"]
+
+QUESTIONS = [
+    "How does Mayank's AI experience connect to his projects?",
+    "What did Mayank do at GlideCloud?",
+    "Which technologies did Mayank use in PhishGuard?",
+    "What was Mayank's role at CSI VIT Pune?",
+]
+
+
+def memory_mb() -> dict:
+    """Current and peak resident set size of this process"""
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, amount = line.split(":")
+                values[key] = int(amount.split()[0]) / 1024
+    return {"rss_mb": round(values.get("VmRSS", 0), 1), "peak_rss_mb": round(values.get("VmHWM", 0), 1)}
+
+
+def run_backend(backend: str):
+    """Benchmark one backend in this process and print the result as JSON"""
+    os.environ["QWEN_BACKEND"] = backend
+    # One request at a time, so every backend runs the same generate() path
+    os.environ["QWEN_BATCHING"] = "false"
+
+    start = time.perf_counter()
+    import model as qwen
+    qwen.load()
+    load_time = time.perf_counter() - start
+
+    with open("texts.json", "r", encoding="utf-8") as f:
+        documents = json.load(f)
+    context = "\n\n".join(doc["content"] for doc in documents[:5])
+
+    # Warm up once so lazy initialisation is not timed
+    qwen.generate_answer(context, QUESTIONS[0])
+
+    latencies = []
+    tokens = 0
+    answers = []
+    for question in QUESTIONS:
+        inputs = qwen._prepare_inputs(context, question)
+        start = time.perf_counter()
+        answer = qwen.generate_answer(context, question)
+        latencies.append(time.perf_counter() - start)
+        answers.append(answer)
+
+        # Count generated tokens with the same inputs (not timed)
+        with torch.no_grad():
+            outputs = qwen.model.generate(**inputs, **qwen.GENERATION_KWARGS)
+        tokens += outputs.shape[1] - inputs["input_ids"].shape[1]
+
+    print(json.dumps({
+        "backend": qwen.backend.name,
+        "load_seconds": round(load_time, 2),
+        "median_latency": round(statistics.median(latencies), 3),
+        "tokens_per_second": round(tokens / sum(latencies), 1),
+        "answers": answers,
+        **memory_mb(),
+    }))
+
+
+def main(backends):
+    print("Local model backend benchmark")
+    print("=" * 80)
+    results = []
+    for backend in backends:
+        proc = subprocess.run(
+            [sys.executable, __file__, "--run", backend],
+            capture_output=True,
+            text=True
+        )
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            error = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+            print(f"{backend:<6} failed: {error}")
+            continue
+        results.append(json.loads(lines[-1]))
+
+    print(f"\n{'backend':<8} {'load':>7} {'latency':>9} {'tokens/s':>9} {'rss':>9} {'peak rss':>9}  answers")
+    reference = results[0]["answers"] if results else None
+    for r in results:
+        same = "same as first" if r["answers"] == reference else "differ"
+        print(
+            f"{r['backend']:<8} {r['load_seconds']:>6.2f}s {r['median_latency']:>8.3f}s "
+            f"{r['tokens_per_second']:>9.1f} {r['rss_mb']:>7.0f}MB {r['peak_rss_mb']:>7.0f}MB  {same}"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--run":
+        run_backend(sys.argv[2])
+    else:
+        main(sys.argv[1:] or DEFAULT_BACKENDS)
@@ -0,0 +1,77 @@
+# bench_batching.py
+# Compares local generation throughput: one model.generate per request
+# (one after another) vs. the continuous batching engine under concurrency.
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+import model as qwen
+from batching import BatchEngine
+
+qwen.load()
+
+with open("texts.json", "r", encoding="utf-8") as f:
+    documents = json.load(f)
+
+QUESTIONS = [
+    "How does Mayank's AI experience connect to his projects?",
+    "What did Mayank do at GlideCloud?",
+    "Which technologies did Mayank use in PhishGuard?",
+    "What is Mayank's favorite color?",
+    "How did Mayank build the Part Number Recognition system?",
+    "What was Mayank's role at CSI VIT Pune?",
+    "What does Mayank focus on in his work?",
+    "How does Mayank's education relate to his experience?",
+]
+CONCURRENCY = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+
+requests = [
+    ("\n\n".join(doc["content"] for doc in documents[i % len(documents):][:3]), QUESTIONS[i % len(QUESTIONS)])
+    for i in range(CONCURRENCY)
+]
+
+
+def sequential():
+    outputs = []
+    for context, question in requests:
+        inputs = qwen._prepare_inputs(context, question)
+        with torch.no_grad():
+            generated = qwen.model.generate(**inputs, **qwen.GENERATION_KWARGS)
+        outputs.append(generated[0][inputs["input_ids"].shape[1]:].tolist())
+    return outputs
+
+
+def batched(engine):
+    with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+        futures = [pool.submit(lambda r: engine.generate(qwen._prepare_inputs(*r)), r) for r in requests]
+        return [future.result() for future in futures]
+
+
+print(f"Continuous batching benchmark ({CONCURRENCY} concurrent requests)")
+print("=" * 80)
+
+start = time.perf_counter()
+reference = sequential()
+sequential_time = time.perf_counter() - start
+sequential_tokens = sum(len(tokens) for tokens in reference)
+
+engine = qwen.batch_engine or BatchEngine(
+    qwen.model,
+    eos_token_id=qwen.tokenizer.eos_token_id,
+    max_new_tokens=qwen.GENERATION_KWARGS["max_new_tokens"],
+    max_batch_size=CONCURRENCY
+)
+start = time.perf_counter()
+results = batched(engine)
+batched_time = time.perf_counter() - start
+batched_tokens = sum(len(tokens) for tokens in results)
+
+print(f"{'mode':<12} {'time':>8} {'tokens':>7} {'tokens/s':>9}")
+print(f"{'sequential':<12} {sequential_time:>7.2f}s {sequential_tokens:>7} {sequential_tokens / sequential_time:>9.1f}")
+print(f"{'batched':<12} {batched_time:>7.2f}s {batched_tokens:>7} {batched_tokens / batched_time:>9.1f}")
+print(f"\nSpeedup: {sequential_time / batched_time:.2f}x")
+print(f"Identical outputs: {sum(a == b for a, b in zip(reference, results))}/{len(requests)}")
+print(f"Engine: {engine.stats()}")
@@ -0,0 +1,50 @@
+# bench_encoder.py
+# Single-query and document-batch encode latency for each ENCODER_BACKEND.
+#
+#   python bench_encoder.py                  # torch int8 onnx onnx-int8
+#   python bench_encoder.py torch onnx-int8  # a subset
+import json
+import statistics
+import sys
+import time
+
+from encoder import load_encoder
+
+BACKENDS = sys.argv[1:] or ["torch", "int8", "onnx", "onnx-int8"]
+RUNS = 50
+
+QUESTIONS = [
+    "What did Mayank do at GlideCloud?",
+    "How does Mayank's AI experience connect to his projects?",
+    "Which technologies did Mayank use in PhishGuard?",
+    "Does Mayank speak German?",
+]
+
+with open("texts.json", "r", encoding="utf-8") as f:
+    texts = [doc["content"] for doc in json.load(f)]
+
+
+def timings(fn, runs):
+    values = []
+    for i in range(runs):
+        start = time.perf_counter()
+        fn(i)
+        values.append(time.perf_counter() - start)
+    values.sort()
+    return statistics.median(values), values[int(len(values) * 0.95) - 1]
+
+
+print("Query encoder benchmark")
+print("=" * 80)
+print(f"\n{'backend':<10} {'load':>7} {'query p50':>10} {'query p95':>10} {f'{len(texts)} docs':>9}")
+for backend in BACKENDS:
+    start = time.perf_counter()
+    encoder = load_encoder(backend)
+    load_time = time.perf_counter() - start
+
+    # Warm up so first-call allocation is not timed
+    encoder.encode(QUESTIONS[:1])
+
+    p50, p95 = timings(lambda i: encoder.encode([QUESTIONS[i % len(QUESTIONS)]]), RUNS)
+    docs, _ = timings(lambda i: encoder.encode(texts), 5)
+    print(f"{backend:<10} {load_time:>6.2f}s {p50 * 1000:>8.2f}ms {p95 * 1000:>8.2f}ms {docs * 1000:>7.1f}ms")
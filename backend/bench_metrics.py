@@ -0,0 +1,52 @@
+# bench_metrics.py
+# Cost of the /metrics instrumentation: one histogram observation (what every
+# answered request pays), the llm_call() wrapper, and rendering a scrape with
+# realistic label cardinality, single-threaded and with 8 threads recording
+# at once (the answer pool's threads share one lock per metric).
+#
+#   python bench_metrics.py
+import threading
+import time
+
+import metrics
+
+N = 200_000
+THREADS = 8
+ENDPOINTS = ["/chat", "/ask", "/chat/stream", "/chat/batch"]
+PATHS = ["structured", "refusal", "gemini", "local", "semantic_cache", "error", "busy"]
+
+
+def per_call_us(fn, n=N):
+    start = time.perf_counter()
+    fn(n)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def observe(n):
+    record = metrics.request_seconds.observe
+    for i in range(n):
+        record(0.0123, ENDPOINTS[i & 3], PATHS[i % 7])
+
+
+def wrapped(n):
+    for _ in range(n):
+        with metrics.llm_call("bench"):
+            pass
+
+
+def threaded(n):
+    threads = [threading.Thread(target=observe, args=(n // THREADS,)) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+if __name__ == "__main__":
+    print(f"observe():                 {per_call_us(observe):.2f} us")
+    print(f"observe(), {THREADS} threads:     {per_call_us(threaded):.2f} us (wall time per observation)")
+    print(f"with llm_call():           {per_call_us(wrapped):.2f} us")
+    start = time.perf_counter()
+    text = metrics.render()
+    print(f"render():                  {(time.perf_counter() - start) * 1000:.2f} ms "
+          f"({len(text.splitlines())} lines, {len(text) / 1024:.1f} KiB)")
@@ -0,0 +1,80 @@
+# bench_prefix_cache.py
+# Measures how much prefill time the cached SYSTEM_PREFIX key/values save.
+import json
+import statistics
+import time
+
+import torch
+
+import model as qwen
+
+qwen.load()
+
+with open("texts.json", "r", encoding="utf-8") as f:
+    documents = json.load(f)
+
+QUESTIONS = [
+    "How does Mayank's AI experience connect to his projects?",
+    "What did Mayank do at GlideCloud?",
+    "Which technologies did Mayank use in PhishGuard?",
+    "What is Mayank's favorite color?",
+]
+CONTEXT = "\n\n".join(doc["content"] for doc in documents[:5])
+RUNS = 5
+
+
+def time_call(fn, runs=RUNS):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def prefill_full(suffix_ids):
+    input_ids = torch.cat([qwen.prefix_ids, suffix_ids], dim=1)
+    with torch.no_grad():
+        qwen.model(input_ids, use_cache=True)
+
+
+def prefill_suffix(suffix_ids):
+    attention_mask = torch.ones(1, qwen.prefix_ids.shape[1] + suffix_ids.shape[1], dtype=torch.long)
+    with torch.no_grad():
+        qwen.model(
+            suffix_ids,
+            attention_mask=attention_mask.to(qwen.model.device),
+            past_key_values=qwen.fresh_prefix_cache(),
+            use_cache=True
+        )
+
+
+print("Prefix cache benchmark")
+print("=" * 80)
+print(f"Prefix tokens: {qwen.prefix_ids.shape[1]}")
+
+if qwen.prefix_cache is None:
+    qwen.prefix_cache = qwen.compute_prefix_cache()
+prefix_cache = qwen.prefix_cache
+
+print(f"\n{'question':<60} {'suffix':>6} {'full':>9} {'cached':>9}")
+for question in QUESTIONS:
+    suffix_ids = qwen.tokenizer(
+        qwen.build_prompt_suffix(CONTEXT, question),
+        return_tensors="pt",
+        add_special_tokens=False
+    )["input_ids"].to(qwen.model.device)
+
+    full, _ = time_call(lambda: prefill_full(suffix_ids))
+    cached, _ = time_call(lambda: prefill_suffix(suffix_ids))
+    print(f"{question[:60]:<60} {suffix_ids.shape[1]:>6} {full * 1000:>7.1f}ms {cached * 1000:>7.1f}ms")
+
+print("\nEnd-to-end generate_answer (median of 3)")
+print("-" * 80)
+for question in QUESTIONS:
+    qwen.prefix_cache = None
+    without_cache, answer_without = time_call(lambda: qwen.generate_answer(CONTEXT, question), runs=3)
+    qwen.prefix_cache = prefix_cache
+    with_cache, answer_with = time_call(lambda: qwen.generate_answer(CONTEXT, question), runs=3)
+    same = "same answer" if answer_with == answer_without else "ANSWERS DIFFER"
+    print(f"{question[:60]:<60} {without_cache:>6.2f}s -> {with_cache:>6.2f}s ({same})")
@@ -0,0 +1,69 @@
+# bench_query_guard.py
+# Per-question cost of the keyword checks: the previous substring scans
+# (reference copies in test_query_guard.py) against query_guard, with the
+# analysis cache cleared before every question (cold) and kept (warm).
+# "rag" is what the RAG pipeline runs per request (out-of-context filter plus
+# section detection in retrieve, postprocess and the refusal check), "gemini"
+# the out-of-context filter plus the structured-response routing.
+import random
+import statistics
+import time
+
+import query_guard
+import test_query_guard as ref
+from gemini_portfolio import format_specific_response
+
+QUESTIONS = ref.SAMPLE_QUESTIONS + list(ref.generate(random.Random(1), ref.reference_keywords() + ref.NOISE, 2000))
+RUNS = 5
+
+
+def old_rag(question):
+    if not ref.reference_rag_out_of_context(question):
+        for _ in range(3):
+            ref.reference_detect_section(question)
+
+
+def new_rag(question):
+    if not query_guard.rag_out_of_context(question):
+        for _ in range(3):
+            query_guard.detect_section(question)
+
+
+def old_gemini(question):
+    if not ref.reference_gemini_out_of_context(question):
+        ref.reference_format_specific_response(question)
+
+
+def new_gemini(question):
+    if not query_guard.gemini_out_of_context(question):
+        format_specific_response(question)
+
+
+def clear():
+    query_guard._analyze_text.cache_clear()
+    query_guard.detect_section.cache_clear()
+
+
+def per_question_us(fn, cold=False):
+    runs = []
+    for _ in range(RUNS):
+        elapsed = 0.0
+        for question in QUESTIONS:
+            if cold:
+                clear()
+            start = time.perf_counter()
+            fn(question)
+            elapsed += time.perf_counter() - start
+        runs.append(elapsed / len(QUESTIONS) * 1e6)
+    return statistics.median(runs)
+
+
+if __name__ == "__main__":
+    print(f"Query guard benchmark ({len(QUESTIONS)} questions, median of {RUNS} runs)")
+    print("=" * 80)
+    print(f"{'path':<8} {'previous':>10} {'cold':>10} {'warm':>10} {'speedup cold':>14} {'speedup warm':>14}")
+    for name, old, new in [("rag", old_rag, new_rag), ("gemini", old_gemini, new_gemini)]:
+        before = per_question_us(old)
+        cold = per_question_us(new, cold=True)
+        warm = per_question_us(new)
+        print(f"{name:<8} {before:>8.1f}µs {cold:>8.1f}µs {warm:>8.1f}µs {before / cold:>13.2f}x {before / warm:>13.2f}x")
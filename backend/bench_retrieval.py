@@ -0,0 +1,107 @@
+# bench_retrieval.py
+# Retrieval quality and latency of the rag retrievers side by side, on
+# labelled questions over texts.json: dense (FAISS), lexical (BM25), hybrid
+# (reciprocal rank fusion) and hybrid with the lexical fast path, which is
+# what retrieve_context does by default. All of them search the question's
+# section when it has one. Latency includes encoding the question.
+#
+#   python bench_retrieval.py
+import statistics
+import time
+
+import rag
+from encoder import encode
+from lexical_index import fuse
+
+K = 5
+RUNS = 20
+
+# Question -> text identifying each relevant document
+LABELLED = [
+    ("What is PhishGuard?", ["PhishGuard"]),
+    ("Which technologies were used in PhishGuard?", ["PhishGuard"]),
+    ("Tell me about YogAR", ["YogAR"]),
+    ("How does the Part Number Recognition system work?", ["Part Number Recognition"]),
+    ("Which project uses Vision Transformers?", ["Part Number Recognition"]),
+    ("What did Mayank do at GlideCloud?", ["GlideCloud"]),
+    ("What was his role at CSI VIT Pune?", ["Computer Society of India"]),
+    ("What did he do at Technobase?", ["Technobase"]),
+    ("Did he volunteer at Make A Difference?", ["Make A Difference"]),
+    ("Tell me about the TE AI Cup", ["TE AI Cup"]),
+    ("What is the Star of Nikalas award?", ["Star of Nikalas"]),
+    ("Does he have a Goethe certificate?", ["Goethe"]),
+    ("Which NVIDIA course did he complete?", ["NVIDIA"]),
+    ("Does he have an IBM certification?", ["IBM Data Engineering"]),
+    ("Where did he do his diploma?", ["Diploma in Computer Engineering"]),
+    ("Which school did he attend in Nagpur?", ["Somalwar"]),
+    ("What is he studying at Vishwakarma Institute?", ["BTech"]),
+    ("Which frontend frameworks does he know?", ["AI & ML:"]),
+    ("Has he worked with RAG pipelines and LLMs?", ["GlideCloud", "AI & ML:", "PhishGuard"]),
+    ("Which projects use PyTorch?", ["Part Number Recognition"]),
+    ("Where is Mayank based?", ["Name: Mayank"]),
+    ("What hackathons has he won?", ["TE AI Cup"]),
+    ("What web development experience does he have?", ["Web Development Secretary", "Web Development Intern"]),
+    ("Which mobile apps has he built?", ["YogAR", "PhishGuard"]),
+]
+
+
+def relevant_ids(markers):
+    return {i for i, doc in enumerate(rag.documents) if any(marker in doc["content"] for marker in markers)}
+
+
+def dense(query, section):
+    return list(rag.faiss_index.get().search(encode([query]).astype("float32"), K, section)[1][0])
+
+
+def lexical(query, section):
+    return [doc_id for doc_id, _ in rag.lexical_hits(query, K, section)]
+
+
+def hybrid(query, section):
+    return fuse(dense(query, section), rag.lexical_hits(query, K, section), K)
+
+
+def fast_path(query, section):
+    hits = rag.lexical_hits(query, K, section)
+    if rag.bm25_index.get().confident(query, hits):
+        return [doc_id for doc_id, _ in hits]
+    return fuse(dense(query, section), hits, K)
+
+
+def evaluate(retriever):
+    hit1, recall, mrr, times, skipped = [], [], [], [], 0
+    for query, markers in LABELLED:
+        relevant = relevant_ids(markers)
+        section = rag.detect_section(query)
+        ids = [i for i in retriever(query, section) if i >= 0]
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            retriever(query, section)
+            times.append((time.perf_counter() - start) * 1000)
+        hit1.append(1.0 if ids and ids[0] in relevant else 0.0)
+        recall.append(len(relevant & set(ids[:K])) / len(relevant))
+        mrr.append(next((1.0 / (rank + 1) for rank, i in enumerate(ids) if i in relevant), 0.0))
+        if retriever is fast_path:
+            hits = rag.lexical_hits(query, K, section)
+            skipped += rag.bm25_index.get().confident(query, hits)
+    return (statistics.mean(hit1), statistics.mean(recall), statistics.mean(mrr),
+            statistics.median(times), statistics.quantiles(times, n=20)[18], skipped)
+
+
+def main():
+    # Load the encoder and both indexes before timing
+    encode(["warmup"])
+    rag.faiss_index.get()
+    rag.bm25_index.get()
+
+    print(f"Retrieval over {len(rag.documents)} documents, {len(LABELLED)} labelled questions, k={K}")
+    print(f"{'retriever':<12} {'hit@1':>6} {'recall@k':>9} {'MRR':>6} {'p50 ms':>8} {'p95 ms':>8} {'no encoder':>11}")
+    for name, retriever in (("dense", dense), ("lexical", lexical), ("hybrid", hybrid), ("fast path", fast_path)):
+        hit1, recall, mrr, p50, p95, skipped = evaluate(retriever)
+        no_encoder = {"dense": 0, "hybrid": 0, "lexical": len(LABELLED)}.get(name, skipped)
+        print(f"{name:<12} {hit1:>6.2f} {recall:>9.2f} {mrr:>6.2f} {p50:>8.3f} {p95:>8.3f} "
+              f"{no_encoder:>5}/{len(LABELLED):<5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# bench_section_search.py
+# Section-restricted retrieval on synthetic corpora of growing size.
+# "over-fetch" is the old retrieve_context: k * 5 neighbours from the whole
+# index, filtered by section in Python and topped up with off-section
+# documents; "sub-index" is SectionIndex.search. Recall is against an exact
+# brute-force search of the section, "on-section" is the share of returned
+# documents that belong to it.
+#
+#   python bench_section_search.py               # 17, 1k, 10k, 100k documents
+#   python bench_section_search.py 1000 50000
+import statistics
+import sys
+import time
+
+import faiss
+import numpy as np
+
+from section_index import SectionIndex
+
+SIZES = [int(n) for n in sys.argv[1:]] or [17, 1_000, 10_000, 100_000]
+DIM = 384
+K = 5
+QUERIES = 200
+
+# Section shares of the current texts.json (17 documents)
+SHARES = {"experience": 4, "education": 3, "certifications": 3, "projects": 3, "awards": 2, "profile": 1, "skills": 1}
+
+
+def corpus(size, rng):
+    names = list(SHARES)
+    weights = np.array([SHARES[name] for name in names], dtype="float64")
+    counts = np.maximum(1, np.round(weights / weights.sum() * size)).astype(int)
+    sections = [name for name, count in zip(names, counts) for _ in range(count)]
+    centroids = rng.standard_normal((len(names), DIM)).astype("float32")
+    vectors = np.stack([centroids[names.index(s)] for s in sections]) + 0.8 * rng.standard_normal((len(sections), DIM))
+    return vectors.astype("float32"), sections, dict(zip(names, centroids))
+
+
+def old_search(index, sections, embedding, section):
+    _, indices = index.search(embedding, K * 5)
+    selected = [idx for idx in indices[0] if sections[idx] == section][:K]
+    for idx in indices[0]:
+        if len(selected) == K:
+            break
+        if idx not in selected:
+            selected.append(idx)
+    return selected
+
+
+def exact(vectors, labels, embedding, section):
+    ids = np.flatnonzero(labels == section)
+    distances = ((vectors[ids] - embedding[0]) ** 2).sum(axis=1)
+    return set(ids[np.argsort(distances, kind="stable")[:K]].tolist())
+
+
+def run(size, rng):
+    vectors, sections, centroids = corpus(size, rng)
+    labels = np.asarray(sections)
+    index = faiss.IndexFlatL2(DIM)
+    index.add(vectors)
+
+    start = time.perf_counter()
+    section_index = SectionIndex(index, sections)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # Questions about one section that read more or less like another one;
+    # the closer they lean to it, the more of the whole-index neighbours are
+    # off-section
+    names = list(centroids)
+    queries = []
+    for _ in range(QUERIES):
+        section, other = rng.choice(names, 2, replace=False)
+        weight = rng.uniform(0.3, 1.0)
+        embedding = weight * centroids[section] + (1 - weight) * centroids[other] + 0.5 * rng.standard_normal(DIM)
+        queries.append((embedding.astype("float32")[None, :], str(section)))
+
+    results = {}
+    for name, search in (("over-fetch", lambda e, s: old_search(index, sections, e, s)),
+                         ("sub-index", lambda e, s: [i for i in section_index.search(e, K, s)[1][0] if i >= 0])):
+        times, recall, on_section = [], [], []
+        for embedding, section in queries:
+            t = time.perf_counter()
+            hits = search(embedding, section)
+            times.append((time.perf_counter() - t) * 1e6)
+            truth = exact(vectors, labels, embedding, section)
+            recall.append(len(truth & set(hits)) / len(truth))
+            on_section.append(sum(sections[i] == section for i in hits) / max(1, len(hits)))
+        results[name] = (statistics.median(times), statistics.mean(recall), statistics.mean(on_section))
+    return build_ms, results
+
+
+def main():
+    rng = np.random.default_rng(0)
+    print(f"Section-restricted search, k={K}, {QUERIES} queries, dim {DIM}")
+    print(f"{'docs':>8} {'method':<11} {'p50 us':>9} {'recall@k':>9} {'on-section':>11}")
+    for size in SIZES:
+        build_ms, results = run(size, rng)
+        for name, (p50, recall, on_section) in results.items():
+            print(f"{size:>8} {name:<11} {p50:>9.1f} {recall:>9.3f} {on_section:>11.3f}")
+        print(f"{'':>8} sub-indexes built in {build_ms:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# bench_sections.py
+# Per-call cost of the rag section extractors. "parse" rebuilds the answer
+# from the document text on every call, as the extractors did before the
+# section records existed; "lookup" is the extractor as it is now.
+import statistics
+import time
+
+import rag
+from section_records import (Award, Education, Experience, Project, SectionRecords, parse_fields, render_awards,
+                             render_certifications, render_education, render_experience, render_project,
+                             render_projects, render_skills)
+
+TEXT_ONLY = [{"section": doc["section"], "content": doc["content"]} for doc in rag.documents]
+RUNS = 5
+CALLS = 2000
+
+EXTRACTORS = {
+    "education": lambda: rag.extract_education(""),
+    "experience": lambda: rag.extract_experience(""),
+    "projects": lambda: rag.extract_projects("", ""),
+    "project (PhishGuard)": lambda: rag.extract_projects("", "phishguard"),
+    "awards": lambda: rag.extract_awards(""),
+    "certifications": lambda: rag.extract_certifications(""),
+    "skills": lambda: rag.extract_skills(""),
+    "profile": lambda: rag.extract_profile(""),
+    "comprehensive": lambda: rag.extract_comprehensive_credentials(""),
+    "languages": lambda: rag.extract_languages("", "what languages does he speak"),
+}
+
+
+def parse(section, record=None):
+    """The section's records rebuilt from the "Key: value" text of its documents"""
+    fields = [parse_fields(section, doc["content"]) for doc in TEXT_ONLY if doc["section"] == section]
+    return [record(f) for f in fields] if record else fields
+
+
+def parse_education():
+    return render_education(sorted(parse("education", Education), key=lambda e: e.start_year, reverse=True))
+
+
+def parse_experience():
+    return render_experience(sorted(parse("experience", Experience), key=lambda e: e.start_year, reverse=True))
+
+
+def parse_skills():
+    return render_skills([f"{label}: {value}" for label, value in parse("skills")[0]["categories"].items()])
+
+
+def parse_project(query):
+    for proj in parse("projects", Project):
+        if query in proj.name.lower():
+            return render_project(proj)
+
+
+PARSE = {
+    "education": parse_education,
+    "experience": parse_experience,
+    "projects": lambda: render_projects(parse("projects", Project)),
+    "project (PhishGuard)": lambda: parse_project("phishguard"),
+    "awards": lambda: render_awards(parse("awards", Award)),
+    "certifications": lambda: render_certifications([f["certification"] for f in parse("certifications")]),
+    "skills": parse_skills,
+    "profile": lambda: "Mayank's Profile:\n\n" + TEXT_ONLY[0]["content"],
+    "comprehensive": lambda: (parse_education(), parse_experience(), parse("certifications"), parse_skills()),
+    "languages": lambda: "Mayank speaks: " + parse("profile")[0]["languages"],
+}
+
+
+def per_call_us(fn):
+    runs = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        for _ in range(CALLS):
+            fn()
+        runs.append((time.perf_counter() - start) / CALLS * 1e6)
+    return statistics.median(runs)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    SectionRecords(rag.documents)
+    print(f"Section extractor benchmark (building all records: {(time.perf_counter() - start) * 1e3:.2f}ms)")
+    print("=" * 80)
+    print(f"{'extractor':<22} {'parse':>10} {'lookup':>10} {'speedup':>10}")
+    for name, fn in EXTRACTORS.items():
+        parsed = per_call_us(PARSE[name])
+        lookup = per_call_us(fn)
+        print(f"{name:<22} {parsed:>8.1f}µs {lookup:>8.2f}µs {parsed / lookup:>9.0f}x")
@@ -0,0 +1,111 @@
+# bench_serve.py
+# Memory of N workers forked by serve.py from a preloaded launcher against N
+# independent uvicorn processes, after each has answered questions that load
+# the encoder, the FAISS index and (rag pipeline) the local model.
+#
+#   python bench_serve.py [workers]
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from serve import memory_report, smaps_rollup
+
+PORT = 7900
+QUESTIONS = [
+    "What is Mayank's education?",
+    "Which technologies did Mayank use in PhishGuard?",
+    "What motivates Mayank to build things?",
+]
+
+
+def request(port, path, payload=None, timeout=600):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data,
+                                 headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return json.loads(response.read())
+
+
+def wait_ready(port, proc, timeout=600):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"server on port {port} exited with {proc.returncode}")
+        try:
+            return request(port, "/livez", timeout=2)
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"server on port {port} did not start")
+
+
+def ask_all(port, rounds):
+    """Send every question `rounds` times concurrently (reworded so the answer cache misses)"""
+    questions = [f"{q} ({i})" if i else q for i in range(rounds) for q in QUESTIONS]
+    with ThreadPoolExecutor(max_workers=len(questions)) as pool:
+        list(pool.map(lambda q: request(port, "/chat", {"question": q}), questions))
+
+
+def child_pids(parent):
+    children = []
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    if int(f.read().rsplit(")", 1)[1].split()[1]) == parent:
+                        children.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    return sorted(children)
+
+
+def total_pss(pids):
+    return sum(smaps_rollup(pid)["pss"] for pid in pids) / 1024
+
+
+def run_forked(workers):
+    env = dict(os.environ, SERVE_WORKERS=str(workers), PORT=str(PORT), WARMUP="false", HEALTH_CHECK_INTERVAL="0")
+    proc = subprocess.Popen([sys.executable, "serve.py"], env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_ready(PORT, proc)
+        ask_all(PORT, workers)
+        pids = {"launcher": proc.pid}
+        pids.update({f"worker {i}": pid for i, pid in enumerate(child_pids(proc.pid))})
+        return memory_report(pids), total_pss(pids.values())
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def run_separate(workers):
+    env = dict(os.environ, WARMUP="false", HEALTH_CHECK_INTERVAL="0")
+    procs = [
+        subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(PORT + 1 + i)], env=env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for i in range(workers)
+    ]
+    try:
+        for i, proc in enumerate(procs):
+            wait_ready(PORT + 1 + i, proc)
+            ask_all(PORT + 1 + i, 1)
+        pids = {f"process {i}": proc.pid for i, proc in enumerate(procs)}
+        return memory_report(pids), total_pss(pids.values())
+    finally:
+        for proc in procs:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 2
+    print(f"Serving memory, {workers} workers, {os.getenv('ANSWER_PIPELINE', 'gemini')} pipeline")
+    print("=" * 80)
+    forked, forked_total = run_forked(workers)
+    print(f"\nserve.py (preload + fork)\n{forked}")
+    separate, separate_total = run_separate(workers)
+    print(f"\nindependent uvicorn processes\n{separate}")
+    print(f"\nTotal PSS: {forked_total:.1f} MB forked vs {separate_total:.1f} MB independent "
+          f"({separate_total / forked_total:.2f}x)")
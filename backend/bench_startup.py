@@ -0,0 +1,69 @@
+# bench_startup.py
+# Cold start of each answer pipeline in a fresh process: how long `import app`
+# takes, how long the first answer takes after that, and which components
+# had to be loaded for it.
+#
+#   python bench_startup.py                 # both pipelines
+#   python bench_startup.py rag             # one pipeline
+import json
+import os
+import subprocess
+import sys
+import time
+
+PIPELINES = ["gemini", "rag"]
+
+QUESTIONS = [
+    "What is Mayank's education?",
+    "Which technologies did Mayank use in PhishGuard?",
+]
+
+
+def run_pipeline():
+    """Time a cold start in this process and print the result as JSON"""
+    start = time.perf_counter()
+    import app
+    import_seconds = time.perf_counter() - start
+
+    import components
+    answers = []
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        app.answer(question)
+        answers.append({
+            "question": question,
+            "seconds": round(time.perf_counter() - start, 3),
+            "loaded": [name for name, s in components.status().items() if s["loaded"]],
+        })
+
+    print(json.dumps({"import_seconds": round(import_seconds, 3), "answers": answers}))
+
+
+def main(pipelines):
+    print("Startup benchmark")
+    print("=" * 80)
+    for pipeline in pipelines:
+        env = dict(os.environ, ANSWER_PIPELINE=pipeline, WARMUP="false")
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, __file__, "--run"], env=env, capture_output=True, text=True)
+        total = time.perf_counter() - start
+        lines = [line for line in proc.stdout.splitlines() if line.startswith("{")]
+        if proc.returncode != 0 or not lines:
+            error = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+            print(f"\n{pipeline}: failed: {error}")
+            continue
+
+        result = json.loads(lines[-1])
+        print(f"\n{pipeline} pipeline (process total {total:.2f}s)")
+        print(f"  import app: {result['import_seconds']:.2f}s")
+        for i, item in enumerate(result["answers"]):
+            label = "first answer" if i == 0 else "next answer"
+            loaded = ", ".join(item["loaded"]) or "nothing"
+            print(f"  {label:<13} {item['seconds']:>6.2f}s  {item['question'][:45]:<45} loaded: {loaded}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--run"]:
+        run_pipeline()
+    else:
+        main(sys.argv[1:] or PIPELINES)
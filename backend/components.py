@@ -0,0 +1,131 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, List
+
+# Load heavy components in a background thread right after startup
+WARMUP = os.getenv("WARMUP", "false").lower() == "true"
+
+# Seconds after a failed load (e.g. model weights unreachable offline) before it is tried again;
+# until then get() fails at once with the same error
+COMPONENT_RETRY_SECONDS = float(os.getenv("COMPONENT_RETRY_SECONDS", "60"))
+
+
+class LoadFailed(RuntimeError):
+    """Raised by Component.get() while a recent load failure is cached"""
+
+
+class Component:
+    """A heavy dependency (model, index, SDK client) created on first use"""
+
+    def __init__(self, name: str, loader: Callable):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self.loaded = False
+        self.load_seconds = None
+        self.error = None
+        self._failed_at = None
+
+    def get(self):
+        if self.loaded:
+            return self._value
+        with self._lock:
+            if not self.loaded:
+                if self._failed_at is not None and time.monotonic() - self._failed_at < COMPONENT_RETRY_SECONDS:
+                    raise LoadFailed(f"{self.name} failed to load: {self.error}")
+                start = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    self.error = str(e)
+                    self._failed_at = time.monotonic()
+                    raise
+                self.load_seconds = round(time.perf_counter() - start, 3)
+                self.error = None
+                self.loaded = True
+        return self._value
+
+    def status(self) -> dict:
+        return {"loaded": self.loaded, "load_seconds": self.load_seconds, "error": self.error}
+
+
+_components: Dict[str, Component] = {}
+
+
+def register(name: str, loader: Callable) -> Component:
+    """Register a lazily loaded component (registering a name twice returns the first one)"""
+    if name not in _components:
+        _components[name] = Component(name, loader)
+    return _components[name]
+
+
+def status() -> dict:
+    return {name: component.status() for name, component in _components.items()}
+
+
+def preload(names: List[str]) -> List[str]:
+    """Load the named components that this pipeline registered; returns their names"""
+    loaded = []
+    for name in names:
+        if name in _components:
+            _components[name].get()
+            loaded.append(name)
+    return loaded
+
+
+def optional(step: Callable) -> Callable:
+    """Mark a warmup step the pipeline can serve without (its failure only degrades the warmup)"""
+    def run():
+        return step()
+    run.optional = True
+    return run
+
+
+class Warmup:
+    """
+    Runs the pipeline's warmup steps in a background thread. Steps that fail
+    are tried again every COMPONENT_RETRY_SECONDS until they succeed; while
+    only optional steps are failing the state is "degraded", not "failed".
+    """
+
+    def __init__(self):
+        self.state = "disabled"
+        self.seconds = None
+        self.error = None
+        self.attempts = 0
+        self._thread = None
+
+    def start(self, steps: List[Callable]):
+        if self._thread is not None:
+            return
+        self.state = "running"
+        self._thread = threading.Thread(target=self._run, args=(steps,), name="warmup", daemon=True)
+        self._thread.start()
+
+    def _run(self, steps):
+        start = time.perf_counter()
+        while steps:
+            self.attempts += 1
+            failed = []
+            for step in steps:
+                try:
+                    step()
+                except Exception as e:
+                    print(f"Warmup step failed (retrying in {COMPONENT_RETRY_SECONDS:g}s): {e}")
+                    self.error = str(e)
+                    failed.append(step)
+            self.seconds = round(time.perf_counter() - start, 3)
+            if failed:
+                self.state = "degraded" if all(getattr(step, "optional", False) for step in failed) else "failed"
+                time.sleep(COMPONENT_RETRY_SECONDS)
+            steps = failed
+        self.state = "done"
+        self.error = None
+
+    def status(self) -> dict:
+        return {"state": self.state, "seconds": self.seconds, "error": self.error, "attempts": self.attempts}
+
+
+warmup = Warmup()
@@ -0,0 +1,59 @@
+import hashlib
+import os
+from typing import Callable, List, Tuple
+
+import numpy as np
+
+# Where ingest.py keeps the document embeddings between runs
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", "embedding_cache")
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk document embeddings keyed by content hash, one file per encoder.
+
+    Vectors from different encoders (or backends of the same encoder) are
+    never mixed: the encoder id is part of the file name. save() keeps only
+    the documents of the last run, so the file does not grow with every
+    edit.
+    """
+
+    def __init__(self, encoder_id: str, directory: str = EMBEDDING_CACHE_DIR):
+        self.encoder_id = encoder_id
+        self.path = os.path.join(directory, encoder_id.replace("/", "--").replace("@", "__") + ".npz")
+        self._vectors = {}
+        self._hashes = []
+        if os.path.exists(self.path):
+            with np.load(self.path) as data:
+                self._vectors = dict(zip(data["hashes"].tolist(), data["vectors"]))
+
+    def embed(self, texts: List[str], encode: Callable[[List[str]], np.ndarray]) -> Tuple[np.ndarray, int]:
+        """
+        Embeddings for `texts` in order; only texts not in the cache are
+        passed to `encode` (in one call). Returns (embeddings, number computed).
+        """
+        hashes = [content_hash(text) for text in texts]
+        text_by_hash = dict(zip(hashes, texts))
+        missing = [h for h in text_by_hash if h not in self._vectors]
+        if missing:
+            computed = np.asarray(encode([text_by_hash[h] for h in missing]), dtype="float32")
+            self._vectors.update(zip(missing, computed))
+
+        self._hashes = hashes
+        if not hashes:
+            return np.zeros((0, 0), dtype="float32"), 0
+        return np.stack([self._vectors[h] for h in hashes]).astype("float32"), len(missing)
+
+    def save(self):
+        """Write the embeddings of the last embed() call"""
+        hashes = list(dict.fromkeys(self._hashes))
+        if not hashes:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, hashes=np.array(hashes), vectors=np.stack([self._vectors[h] for h in hashes]))
+        os.replace(tmp_path, self.path)
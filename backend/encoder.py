@@ -0,0 +1,140 @@
+import os
+import sys
+from typing import List
+
+import numpy as np
+
+from components import register
+
+ENCODER_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+ENCODER_BACKENDS = ("torch", "int8", "onnx", "onnx-int8")
+
+# torch: the SentenceTransformer as before
+# int8: the same model with dynamically quantized linear layers
+# onnx / onnx-int8: an ONNX Runtime export (optionally int8-quantized),
+# written to ENCODER_ONNX_DIR once and reused on later starts
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")
+ENCODER_ONNX_DIR = os.getenv("ENCODER_ONNX_DIR", "onnx_cache")
+
+# all-MiniLM-L6-v2 truncates inputs to 256 word pieces
+MAX_SEQ_LENGTH = 256
+
+
+class OnnxEncoder:
+    """
+    MiniLM on ONNX Runtime with the same pooling as the SentenceTransformer:
+    mean over non-padding tokens followed by L2 normalisation.
+    """
+
+    def __init__(self, path: str, file_name: str = "model.onnx"):
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+
+        self.tokenizer = AutoTokenizer.from_pretrained(path)
+        self.model = ORTModelForFeatureExtraction.from_pretrained(path, file_name=file_name)
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        import torch
+
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            inputs = self.tokenizer(
+                list(texts[start:start + batch_size]),
+                padding=True,
+                truncation=True,
+                max_length=MAX_SEQ_LENGTH,
+                return_tensors="pt"
+            )
+            with torch.no_grad():
+                token_embeddings = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(token_embeddings.dtype)
+            pooled = (token_embeddings * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            batches.append(torch.nn.functional.normalize(pooled, p=2, dim=1).numpy())
+        if not batches:
+            return np.zeros((0, 384), dtype="float32")
+        return np.concatenate(batches).astype("float32")
+
+
+def onnx_encoder_dir() -> str:
+    return os.path.join(ENCODER_ONNX_DIR, ENCODER_MODEL.replace("/", "--"))
+
+
+def export_onnx(quantize: bool = False) -> str:
+    """Export the encoder to ONNX (and an int8 copy if asked); returns the model file name"""
+    try:
+        from optimum.onnxruntime import ORTModelForFeatureExtraction
+        from transformers import AutoTokenizer
+    except ImportError as e:
+        raise RuntimeError("ENCODER_BACKEND=onnx needs `pip install optimum[onnxruntime]`") from e
+
+    path = onnx_encoder_dir()
+    if not os.path.exists(os.path.join(path, "model.onnx")):
+        print(f"Exporting {ENCODER_MODEL} to ONNX in {path} (one time)...")
+        model = ORTModelForFeatureExtraction.from_pretrained(ENCODER_MODEL, export=True)
+        model.save_pretrained(path)
+        AutoTokenizer.from_pretrained(ENCODER_MODEL).save_pretrained(path)
+
+    if not quantize:
+        return "model.onnx"
+
+    if not os.path.exists(os.path.join(path, "model_quantized.onnx")):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        print(f"Quantizing {ENCODER_MODEL} to int8 (one time)...")
+        quantize_dynamic(
+            os.path.join(path, "model.onnx"),
+            os.path.join(path, "model_quantized.onnx"),
+            weight_type=QuantType.QInt8
+        )
+    return "model_quantized.onnx"
+
+
+def encoder_id(backend: str = None) -> str:
+    """Model, backend and runtime version; embeddings with different ids are not interchangeable"""
+    from importlib.metadata import PackageNotFoundError, version
+
+    backend = (backend or ENCODER_BACKEND).lower()
+    runtime = "onnxruntime" if backend.startswith("onnx") else "sentence-transformers"
+    try:
+        runtime_version = version(runtime)
+    except PackageNotFoundError:
+        runtime_version = "unknown"
+    return f"{ENCODER_MODEL}@{backend}-{runtime}-{runtime_version}"
+
+
+def load_encoder(backend: str = None):
+    """Load the sentence encoder; every backend exposes encode(texts) -> float32 array"""
+    backend = (backend or ENCODER_BACKEND).lower()
+    if backend not in ENCODER_BACKENDS:
+        raise ValueError(f"Unknown ENCODER_BACKEND {backend!r}, expected one of {', '.join(ENCODER_BACKENDS)}")
+
+    if backend in ("onnx", "onnx-int8"):
+        file_name = export_onnx(quantize=backend == "onnx-int8")
+        return OnnxEncoder(onnx_encoder_dir(), file_name)
+
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    encoder = SentenceTransformer(ENCODER_MODEL, device="cpu" if backend == "int8" else None)
+    if backend == "int8":
+        encoder = torch.ao.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+    return encoder
+
+
+# Shared query encoder, loaded on first use
+encoder_component = register("encoder", load_encoder)
+
+
+def encode(texts: List[str]) -> np.ndarray:
+    """Embed texts with the shared encoder"""
+    return encoder_component.get().encode(texts)
+
+
+if __name__ == "__main__":
+    # python encoder.py export   -> build both ONNX files ahead of time
+    if sys.argv[1:] == ["export"]:
+        export_onnx(quantize=True)
+        print(f"✅ ONNX encoder ready in {onnx_encoder_dir()}")
+    else:
+        print("Usage: python encoder.py export")
@@ -1,13 +1,9 @@
-import os
-import google.generativeai as genai
-
-genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+from gemini_client import gemini_client
+from token_usage import TokenUsage
 
 MODEL_NAME = "gemini-2.5-flash"
 
-model = genai.GenerativeModel(
-    model_name=MODEL_NAME,
-    system_instruction="""
+SYSTEM_INSTRUCTION = """
 You are an assistant that answers ONLY questions about Mayank Kulkarni's portfolio.
 
 RULES:
@@ -17,13 +13,17 @@ RULES:
   "This information is not available in Mayank's portfolio."
 - Do NOT hallucinate degrees, universities, companies, or awards
 """
-)
 
-def ask_gemini(question: str, context: str) -> str:
-    """
-    Ask Gemini with RAG context injected.
-    """
-    prompt = f"""
+# Input/output token counts of every Gemini call
+token_usage = TokenUsage()
+
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "maxOutputTokens": 300
+}
+
+def build_prompt(question: str, context: str) -> str:
+    return f"""
 Portfolio Context:
 {context}
 
@@ -33,12 +33,32 @@ Question:
 Answer strictly based on the portfolio context above.
 """
 
-    response = model.generate_content(
-        prompt,
-        generation_config={
-            "temperature": 0.2,
-            "max_output_tokens": 300
-        }
+def ask_gemini(question: str, context: str) -> str:
+    """
+    Ask Gemini with RAG context injected.
+    """
+    response = gemini_client.get().generate_content(
+        MODEL_NAME,
+        build_prompt(question, context),
+        system_instruction=SYSTEM_INSTRUCTION,
+        generation_config=GENERATION_CONFIG
+    )
+    token_usage.record(response)
+
+    return response.text.strip()
+
+def stream_gemini(question: str, context: str):
+    """
+    Ask Gemini with RAG context injected, yielding text chunks as they arrive.
+    """
+    response = gemini_client.get().stream_content(
+        MODEL_NAME,
+        build_prompt(question, context),
+        system_instruction=SYSTEM_INSTRUCTION,
+        generation_config=GENERATION_CONFIG
     )
 
-    return response.text.strip() if response.text else ""
+    for chunk in response:
+        if chunk.text:
+            yield chunk.text
+    token_usage.record(response)
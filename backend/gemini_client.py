@@ -0,0 +1,425 @@
+"""
+Shared Gemini client for gemini.py (rag) and gemini_portfolio.py.
+
+Calls the Gemini REST API with one httpx.AsyncClient on a background event
+loop, so every worker thread reuses the same pool of keep-alive connections.
+Each call:
+- has a deadline (GEMINI_TIMEOUT seconds, retries included; for streams,
+  until the first chunk and then between chunks), after which it is
+  cancelled and the worker thread is released
+- is retried at most GEMINI_MAX_RETRIES times with full-jitter exponential
+  backoff, only on timeouts, connection errors, 429 and 5xx
+- waits for one of GEMINI_MAX_CONCURRENCY slots (the bulkhead), so a slow
+  upstream cannot tie up every worker
+
+After GEMINI_BREAKER_FAILURES calls in a row fail on the upstream, the
+circuit opens: calls raise GeminiUnavailable at once for
+GEMINI_BREAKER_COOLDOWN seconds, so the pipelines go straight to their
+structured / local model fallbacks. Then a single probe call decides
+whether it closes again.
+
+GEMINI_API_BASE points the client at another server, e.g. the local stub
+in test_gemini_client.py.
+"""
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Optional
+
+import httpx
+
+from components import register
+
+# Gemini REST API root (set to a local stub server for tests)
+GEMINI_API_BASE = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+# Deadline of a call in seconds, retries and bulkhead wait included
+GEMINI_TIMEOUT = float(os.getenv("GEMINI_TIMEOUT", "20"))
+# Retries of a call that failed on the upstream (timeout, connection error, 429, 5xx)
+GEMINI_MAX_RETRIES = int(os.getenv("GEMINI_MAX_RETRIES", "2"))
+# Retry n waits a random 0..GEMINI_RETRY_BACKOFF * 2**n seconds (at least the upstream's Retry-After)
+GEMINI_RETRY_BACKOFF = float(os.getenv("GEMINI_RETRY_BACKOFF", "0.5"))
+# Concurrent Gemini calls per process (the bulkhead; also the connection pool size)
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+# Consecutive upstream failures that open the circuit, and seconds it stays open
+GEMINI_BREAKER_FAILURES = int(os.getenv("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_COOLDOWN = float(os.getenv("GEMINI_BREAKER_COOLDOWN", "30"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_END = object()
+
+
+async def _next(iterator):
+    """Next item of an async iterator, or _END (a plain coroutine, for run_coroutine_threadsafe/wait_for)"""
+    try:
+        return await iterator.__anext__()
+    except StopAsyncIteration:
+        return _END
+
+
+class GeminiError(Exception):
+    """A Gemini call failed; `upstream` is set when the service was unreachable, slow or overloaded"""
+
+    def __init__(self, message: str, status: Optional[int] = None, upstream: bool = False,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+class GeminiUnavailable(GeminiError):
+    """Raised without calling Gemini: the circuit is open"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Gemini circuit is open, retry after {retry_after:.0f}s", upstream=True,
+                         retry_after=retry_after)
+
+
+class CircuitBreaker:
+    """Closed -> open after `failures` upstream failures in a row -> one probe after `cooldown` seconds"""
+
+    def __init__(self, failures: int = GEMINI_BREAKER_FAILURES, cooldown: float = GEMINI_BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._consecutive = 0
+        self._opened_at = None
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            return "half_open" if time.monotonic() - self._opened_at >= self.cooldown else "open"
+
+    def allow(self):
+        """Raise GeminiUnavailable unless a call may go to the upstream now"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited >= self.cooldown and not self._probing:
+                self._probing = True
+                return
+            self.rejected += 1
+            raise GeminiUnavailable(max(self.cooldown - waited, 1.0))
+
+    def success(self):
+        with self._lock:
+            self._consecutive = 0
+            self._opened_at = None
+            self._probing = False
+
+    def failure(self):
+        with self._lock:
+            self._consecutive += 1
+            if self._probing or (self._opened_at is None and self._consecutive >= self.failures):
+                self._opened_at = time.monotonic()
+                self.opened += 1
+            self._probing = False
+
+    def abandon(self):
+        """A call ended without a verdict (it was cancelled); let the next call probe instead"""
+        with self._lock:
+            self._probing = False
+
+
+class GeminiResponse:
+    """A generateContent response, with the `text` and `usage_metadata` the SDK response had"""
+
+    def __init__(self, data: dict):
+        self.data = data
+        candidates = data.get("candidates") or [{}]
+        parts = (candidates[0].get("content") or {}).get("parts") or []
+        self.text = "".join(part.get("text", "") for part in parts)
+        usage = data.get("usageMetadata") or {}
+        self.usage_metadata = SimpleNamespace(
+            prompt_token_count=usage.get("promptTokenCount", 0),
+            cached_content_token_count=usage.get("cachedContentTokenCount", 0),
+            candidates_token_count=usage.get("candidatesTokenCount", 0)
+        )
+
+
+class GeminiStream:
+    """Iterate for GeminiResponse chunks; afterwards usage_metadata is that of the whole answer"""
+
+    def __init__(self, client: "GeminiClient", path: str, body: dict):
+        self._client = client
+        self._path = path
+        self._body = body
+        self.usage_metadata = None
+
+    def __iter__(self):
+        loop = self._client._ensure_started()
+        chunks = self._client._stream(self._path, self._body)
+        try:
+            while True:
+                chunk = asyncio.run_coroutine_threadsafe(_next(chunks), loop).result()
+                if chunk is _END:
+                    return
+                if chunk.data.get("usageMetadata"):
+                    self.usage_metadata = chunk.usage_metadata
+                yield chunk
+        finally:
+            # Also when the consumer stops early: frees the connection and the bulkhead slot
+            asyncio.run_coroutine_threadsafe(chunks.aclose(), loop).result()
+
+
+class GeminiClient:
+    def __init__(self, api_key: Optional[str] = None, base_url: str = GEMINI_API_BASE,
+                 timeout: float = GEMINI_TIMEOUT, max_retries: int = GEMINI_MAX_RETRIES,
+                 backoff: float = GEMINI_RETRY_BACKOFF, max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_concurrency = max_concurrency
+        self.breaker = breaker or CircuitBreaker()
+
+        self._loop = None
+        self._http = None
+        self._slots = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self.deadline_exceeded = 0
+        self.in_use = 0
+
+    # ---------- EVENT LOOP ----------
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._start_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="gemini-client", daemon=True).start()
+                    asyncio.run_coroutine_threadsafe(self._setup(), loop).result()
+                    self._loop = loop
+        return self._loop
+
+    async def _setup(self):
+        headers = {"x-goog-api-key": self.api_key} if self.api_key else {}
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            headers=headers,
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+        )
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+
+    def _run(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._ensure_started()).result()
+
+    def close(self):
+        if self._loop is not None:
+            self._run(self._http.aclose())
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop = None
+
+    # ---------- BLOCKING API (worker threads) ----------
+    def generate_content(self, model: str, prompt: str, system_instruction: Optional[str] = None,
+                         generation_config: Optional[dict] = None,
+                         cached_content: Optional[str] = None) -> GeminiResponse:
+        body = self._body(prompt, system_instruction, generation_config, cached_content)
+        return GeminiResponse(self._run(self._call(f"/models/{model}:generateContent", body)))
+
+    def stream_content(self, model: str, prompt: str, system_instruction: Optional[str] = None,
+                       generation_config: Optional[dict] = None,
+                       cached_content: Optional[str] = None) -> GeminiStream:
+        body = self._body(prompt, system_instruction, generation_config, cached_content)
+        return GeminiStream(self, f"/models/{model}:streamGenerateContent?alt=sse", body)
+
+    def create_cached_content(self, model: str, system_instruction: str, ttl_seconds: int) -> str:
+        """Store a system instruction as provider-side cached content; returns its name"""
+        body = {
+            "model": f"models/{model}",
+            "systemInstruction": {"parts": [{"text": system_instruction}]},
+            "ttl": f"{ttl_seconds}s"
+        }
+        return self._run(self._call("/cachedContents", body))["name"]
+
+    # ---------- ASYNC API ----------
+    async def agenerate_content(self, model: str, prompt: str, **kwargs) -> GeminiResponse:
+        """generate_content() for callers on an event loop (the call itself runs on the client's loop)"""
+        body = self._body(prompt, kwargs.get("system_instruction"), kwargs.get("generation_config"),
+                          kwargs.get("cached_content"))
+        future = asyncio.run_coroutine_threadsafe(self._call(f"/models/{model}:generateContent", body),
+                                                  self._ensure_started())
+        return GeminiResponse(await asyncio.wrap_future(future))
+
+    @staticmethod
+    def _body(prompt, system_instruction, generation_config, cached_content) -> dict:
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        if system_instruction:
+            body["systemInstruction"] = {"parts": [{"text": system_instruction}]}
+        if generation_config:
+            body["generationConfig"] = generation_config
+        if cached_content:
+            body["cachedContent"] = cached_content
+        return body
+
+    # ---------- CALLS (client loop) ----------
+    def _count(self, name: str, amount: int = 1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    async def _call(self, path: str, body: dict) -> dict:
+        self.breaker.allow()
+        self._count("calls")
+        try:
+            data = await self._retrying(self._post, path, body)
+        except BaseException as e:
+            self._record_failure(e)
+            raise
+        self.breaker.success()
+        return data
+
+    async def _stream(self, path: str, body: dict):
+        """Async generator of the GeminiResponse chunks of a streamed answer"""
+        self.breaker.allow()
+        self._count("calls")
+        try:
+            response = await self._retrying(self._open_stream, path, body)
+        except BaseException as e:
+            self._record_failure(e)
+            raise
+        # The upstream answered; a stall or a malformed chunk later on still counts as a failure
+        self.breaker.success()
+        try:
+            lines = response.aiter_lines()
+            while True:
+                line = await self._bounded(time.monotonic() + self.timeout, _next(lines))
+                if line is _END:
+                    break
+                if line.startswith("data:"):
+                    yield GeminiResponse(json.loads(line[5:]))
+        except Exception as e:
+            # Not GeneratorExit: a consumer that stops reading is no upstream failure
+            self._record_failure(e)
+            raise
+        finally:
+            await response.aclose()
+            self._release()
+
+    def _record_failure(self, error: BaseException):
+        """Settle the breaker for a call that raised, so a half-open probe always gets a verdict"""
+        if not isinstance(error, Exception):
+            # Cancelled (e.g. the agenerate_content() caller went away)
+            self.breaker.abandon()
+            return
+        self._count("failures")
+        if isinstance(error, GeminiError) and not error.upstream:
+            # The upstream answered (e.g. 400 or 403), it is not unhealthy
+            self.breaker.success()
+        else:
+            # Upstream errors, and anything unexpected such as a malformed response body
+            self.breaker.failure()
+
+    async def _retrying(self, attempt_fn, *args):
+        """Run attempt_fn(deadline, *args) until it succeeds, fails for good or the deadline passes"""
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            try:
+                return await attempt_fn(deadline, *args)
+            except GeminiError as e:
+                error = e
+            if not error.upstream or attempt >= self.max_retries:
+                raise error
+            delay = random.uniform(0, self.backoff * 2 ** attempt)
+            if error.retry_after:
+                delay = max(delay, error.retry_after)
+            if time.monotonic() + delay >= deadline:
+                raise error
+            attempt += 1
+            self._count("retries")
+            await asyncio.sleep(delay)
+
+    async def _bounded(self, deadline: float, coroutine):
+        """Await within the deadline, turning timeouts and connection errors into upstream GeminiErrors"""
+        try:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                coroutine.close()
+                raise asyncio.TimeoutError
+            return await asyncio.wait_for(coroutine, remaining)
+        except asyncio.TimeoutError:
+            self._count("deadline_exceeded")
+            raise GeminiError(f"Gemini did not answer within {self.timeout:g}s", upstream=True)
+        except httpx.TransportError as e:
+            raise GeminiError(f"Gemini connection error: {e!r}", upstream=True)
+
+    async def _acquire(self, deadline: float):
+        await self._bounded(deadline, self._slots.acquire())
+        self._count("in_use")
+
+    def _release(self):
+        self._count("in_use", -1)
+        self._slots.release()
+
+    async def _post(self, deadline: float, path: str, body: dict) -> dict:
+        await self._acquire(deadline)
+        try:
+            response = await self._bounded(deadline, self._http.post(path, json=body))
+        finally:
+            self._release()
+        _raise_for_status(response.status_code, response.headers, response.text)
+        return response.json()
+
+    async def _open_stream(self, deadline: float, path: str, body: dict) -> httpx.Response:
+        """Send a streaming request and wait for its status; the slot stays taken until _stream() ends"""
+        await self._acquire(deadline)
+        try:
+            request = self._http.build_request("POST", path, json=body)
+            response = await self._bounded(deadline, self._http.send(request, stream=True))
+            if response.status_code != 200:
+                text = (await response.aread()).decode("utf-8", "replace")
+                await response.aclose()
+                _raise_for_status(response.status_code, response.headers, text)
+        except BaseException:
+            self._release()
+            raise
+        return response
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "state": self.breaker.state,
+                "calls": self.calls,
+                "retries": self.retries,
+                "failures": self.failures,
+                "deadline_exceeded": self.deadline_exceeded,
+                "circuit_opened": self.breaker.opened,
+                "rejected_open": self.breaker.rejected,
+                "max_concurrency": self.max_concurrency,
+                "in_use": self.in_use,
+            }
+
+
+def _raise_for_status(status: int, headers, text: str):
+    if status == 200:
+        return
+    retry_after = headers.get("retry-after")
+    raise GeminiError(
+        f"Gemini returned HTTP {status}: {text[:200]}",
+        status=status,
+        upstream=status in RETRYABLE_STATUS,
+        retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+    )
+
+
+def create_client() -> GeminiClient:
+    """The shared client (its event loop and connections start on the first call)"""
+    return GeminiClient(api_key=os.getenv("GEMINI_API_KEY"))
+
+gemini_client = register("gemini", create_client)
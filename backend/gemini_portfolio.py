@@ -1,9 +1,20 @@
 import json
-from typing import Dict, List, Optional
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 from datetime import datetime
+from answer_cache import QueryEmbeddingCache, ResponseCache, SemanticCache
+from batch import BatchJob
+from components import optional
+from encoder import encode
+from gemini_client import gemini_client
+from metrics import llm_call
+import query_guard
+from token_usage import TokenUsage
+from tracing import note, span
 
 load_dotenv()
 
@@ -11,21 +22,48 @@ load_dotenv()
 with open("data/rag_knowledge.json", "r", encoding="utf-8") as f:
     PORTFOLIO_DATA = json.load(f)
 
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
+MODEL_NAME = "gemini-2.5-flash"
 
-# Initialize model
-model = genai.GenerativeModel('gemini-2.5-flash')
+# Optional provider-side caching of the system instruction
+GEMINI_CONTEXT_CACHE = os.getenv("GEMINI_CONTEXT_CACHE", "false").lower() == "true"
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+# Seconds before creating the cached content is tried again after it failed
+GEMINI_CONTEXT_CACHE_RETRY = float(os.getenv("GEMINI_CONTEXT_CACHE_RETRY", "60"))
 
-# Create system prompt with the portfolio data
-SYSTEM_PROMPT = f"""
+# Final answers for repeated questions, checked before anything else
+response_cache = ResponseCache()
+
+# Query embeddings of recent questions (the encoder loads on first use)
+query_embeddings = QueryEmbeddingCache(encode)
+
+# Gemini answers, reused for paraphrased questions
+semantic_cache = SemanticCache(query_embeddings.embed)
+
+def compact_portfolio_json(data) -> str:
+    """Serialize the portfolio without indentation or [SECTION] tags to keep the prompt small"""
+    def strip_tags(value):
+        if isinstance(value, dict):
+            return {k: strip_tags(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [strip_tags(v) for v in value]
+        if isinstance(value, str):
+            return re.sub(r"^\[[A-Z ]+\]\s*", "", value)
+        return value
+
+    return json.dumps(strip_tags(data), separators=(",", ":"), ensure_ascii=False)
+
+def build_system_prompt() -> str:
+    """
+    System prompt with the portfolio data; it is sent once as the model's
+    system instruction instead of being repeated in every prompt
+    """
+    return f"""
 You are Mayank's Portfolio Assistant, an AI assistant that provides information about Mayank D. Kulkarni's portfolio. 
 You ONLY answer questions based on the following structured data. If information is not in this data, respond with: 
 "This information is not available in Mayank's portfolio."
 
 === PORTFOLIO DATA ===
-{json.dumps(PORTFOLIO_DATA, indent=2)}
+{compact_portfolio_json(PORTFOLIO_DATA)}
 === END PORTFOLIO DATA ===
 
 IMPORTANT RULES:
@@ -52,99 +90,87 @@ RESPONSE FORMAT:
 - Always reference Mayank by name in responses
 """
 
+# Input/output token counts of every Gemini call
+token_usage = TokenUsage()
+
+_system_prompt = None
+_cached_content = None
+# When to create the cached content next: shortly before it expires, or
+# GEMINI_CONTEXT_CACHE_RETRY seconds after a failed attempt
+_cached_content_refresh_at = 0.0
+_cached_content_lock = threading.Lock()
+
+def model_settings() -> dict:
+    """
+    How to send prompts to the model: with the system instruction, or, with
+    GEMINI_CONTEXT_CACHE enabled, with the name of provider-side cached
+    content holding it, re-created shortly before it expires (if that fails
+    the plain system instruction is used until the next attempt)
+    """
+    global _system_prompt, _cached_content, _cached_content_refresh_at
+    if _system_prompt is None:
+        _system_prompt = build_system_prompt()
+    if not GEMINI_CONTEXT_CACHE:
+        return {"system_instruction": _system_prompt}
+
+    with _cached_content_lock:
+        if time.time() > _cached_content_refresh_at:
+            try:
+                _cached_content = gemini_client.get().create_cached_content(
+                    MODEL_NAME, _system_prompt, GEMINI_CONTEXT_CACHE_TTL
+                )
+                _cached_content_refresh_at = time.time() + GEMINI_CONTEXT_CACHE_TTL - 60
+            except Exception as e:
+                print(f"Gemini context cache unavailable, using the plain system instruction: {e}")
+                _cached_content = None
+                _cached_content_refresh_at = time.time() + GEMINI_CONTEXT_CACHE_RETRY
+        if _cached_content is None:
+            return {"system_instruction": _system_prompt}
+        return {"cached_content": _cached_content}
+
 def is_out_of_context(query: str) -> bool:
     """Check if query is unrelated to Mayank's portfolio"""
-    query_lower = query.lower()
-    
-    # Out-of-context topics
-    out_of_context_topics = [
-        "weather", "cricket", "football", "sports", "movie", "music",
-        "news", "politics", "stock", "market", "recipe", "cooking",
-        "travel", "holiday", "health", "medical", "doctor",
-        "physics", "chemistry", "biology", "math", "history",
-        "world cup", "tournament", "match", "game", "player",
-        "president", "prime minister", "government", "election",
-        "religion", "philosophy"
-    ]
-    
-    # Check for general knowledge questions without Mayank reference
-    if any(topic in query_lower for topic in out_of_context_topics):
-        return True
-    
-    # Check for "who is" questions not about Mayank
-    if query_lower.startswith("who is "):
-        topic = query_lower[7:].strip()
-        if not any(name in topic for name in ["mayank", "kulkarni"]):
-            return True
-    
-    # Check for "what is" questions about general topics
-    if query_lower.startswith("what is ") and "mayank" not in query_lower:
-        topic = query_lower[8:].strip()
-        # Allow if it's about portfolio-related terms
-        portfolio_terms = [
-            "ai", "ml", "machine learning", "artificial intelligence",
-            "rag", "llm", "vision transformer", "phishing",
-            "data science", "computer engineering", "diploma", "btech"
-        ]
-        if not any(term in topic for term in portfolio_terms):
-            return True
-    
-    # Check for "tell me about" without Mayank reference
-    if query_lower.startswith("tell me about "):
-        topic = query_lower[14:].strip()
-        portfolio_sections = [
-            "mayank", "his", "education", "experience", "projects",
-            "skills", "background", "work", "portfolio", "certifications",
-            "awards", "languages", "contact", "email"
-        ]
-        if not any(section in topic for section in portfolio_sections):
-            return True
-    
-    return False
+    return query_guard.gemini_out_of_context(query)
+
+LANGUAGE_RESPONSES = {
+    "german": "Mayank's German proficiency: Intermediate (A2 certified)",
+    "english": "Mayank's English proficiency: Fluent",
+    "hindi": "Mayank's Hindi proficiency: Native",
+    "marathi": "Mayank's Marathi proficiency: Native",
+}
 
 def format_specific_response(query: str) -> Optional[str]:
     """Handle specific query types with structured responses"""
-    query_lower = query.lower()
-    
-    # Language queries
-    language_queries = {
-        "german": "Mayank's German proficiency: Intermediate (A2 certified)",
-        "english": "Mayank's English proficiency: Fluent",
-        "hindi": "Mayank's Hindi proficiency: Native",
-        "marathi": "Mayank's Marathi proficiency: Native",
-    }
-    
-    for lang, response in language_queries.items():
-        if f"speak {lang}" in query_lower or f"know {lang}" in query_lower or f"{lang} proficiency" in query_lower:
-            return response
-    
+    projects = PORTFOLIO_DATA["projects"]
+    intent = query_guard.specific_intent(query, projects=bool(projects))
+    if intent is None:
+        return None
+    kind, key = intent
+
+    if kind == "language":
+        return LANGUAGE_RESPONSES[key]
+
     # What languages does Mayank speak?
-    if "what language" in query_lower or "languages does" in query_lower:
+    if kind == "languages":
         languages = PORTFOLIO_DATA["profile"]["languages"]
         return f"Mayank speaks: {', '.join(languages)}"
-    
-    # Specific project queries
-    projects = PORTFOLIO_DATA["projects"]
-    for project in projects:
-        project_name = project["name"].lower()
-        if "phishguard" in query_lower or "phishing" in query_lower:
-            return format_project_response(project) if "phishguard" in project_name else None
-        elif "part number" in query_lower:
-            return format_project_response(project) if "part number" in project_name else None
-        elif "yogar" in query_lower or "yoga" in query_lower:
-            return format_project_response(project) if "yogar" in project_name else None
-    
+
+    # Specific project queries (decided by the first project)
+    if kind == "project":
+        project = projects[0]
+        return format_project_response(project) if key in project["name"].lower() else None
+
     # Education list
-    if "education" in query_lower or "degree" in query_lower or "study" in query_lower:
+    if kind == "education":
         education = PORTFOLIO_DATA["education"]
         response = ["Mayank's Education:"]
         for edu in education:
             degree = edu["degree"].replace("[EDUCATION] ", "")
             response.append(f"• {degree} at {edu['institution']} ({edu['year']})")
         return "\n".join(response)
-    
+
     # Experience list
-    if "experience" in query_lower or "work" in query_lower or "job" in query_lower:
+    if kind == "experience":
         experience = PORTFOLIO_DATA["experience"]
         response = ["Mayank's Work Experience (most recent first):"]
         for exp in experience:
@@ -157,9 +183,9 @@ def format_specific_response(query: str) -> Optional[str]:
             if 'technologies' in exp:
                 response.append(f"  Technologies: {', '.join(exp['technologies'])}")
         return "\n".join(response)
-    
+
     # Skills
-    if "skill" in query_lower or "technical" in query_lower:
+    if kind == "skills":
         skills = PORTFOLIO_DATA["skills"]
         response = ["Mayank's Technical Skills:"]
         response.append("\nAI & ML:")
@@ -171,13 +197,10 @@ def format_specific_response(query: str) -> Optional[str]:
         response.append("\nSoft Skills:")
         response.extend([f"  • {skill}" for skill in skills["soft_skills"]])
         return "\n".join(response)
-    
+
     # Contact/email
-    if "contact" in query_lower or "email" in query_lower or "reach" in query_lower:
-        profile = PORTFOLIO_DATA["profile"]
-        return f"Mayank can be contacted at: {profile['email']}\nLocation: {profile['location']}\nAvailability: {profile['availability']}"
-    
-    return None
+    profile = PORTFOLIO_DATA["profile"]
+    return f"Mayank can be contacted at: {profile['email']}\nLocation: {profile['location']}\nAvailability: {profile['availability']}"
 
 def format_project_response(project: Dict) -> str:
     """Format detailed project response"""
@@ -202,35 +225,233 @@ def format_project_response(project: Dict) -> str:
     
     return "\n".join(response)
 
+OUT_OF_CONTEXT_RESPONSE = "This information is not available in Mayank's portfolio. Please ask about Mayank's background, skills, projects, experience, or education."
+
+ERROR_RESPONSE = "I apologize, but I'm having trouble accessing the portfolio information. Please try again or ask about specific sections like education, experience, or projects."
+
+NOT_AVAILABLE_RESPONSE = "This information is not available in Mayank's portfolio."
+
+def build_prompt(query: str) -> str:
+    """Build the Gemini prompt for a free-form portfolio question (the portfolio data is in the system instruction)"""
+    return f"""
+        User Question: {query}
+        
+        Answer based ONLY on the portfolio data. If the information is not in the data, say "This information is not available in Mayank's portfolio."
+        
+        Important: Be precise about language proficiency (German is Intermediate/A2, not fluent or native).
+        """
+
+def validate_answer(text: str) -> str:
+    """Enforce the hard rules of the system prompt on a finished Gemini answer"""
+    text_lower = text.lower()
+
+    # Rule 5: no universities that are not in the data
+    forbidden_institutions = ["indian institute of technology", "iit ", "university of mumbai", "mumbai university"]
+    if any(institution in text_lower for institution in forbidden_institutions):
+        return NOT_AVAILABLE_RESPONSE
+
+    # Rule 4: German is Intermediate (A2), never fluent or native
+    for sentence in text_lower.split("."):
+        if "german" in sentence and ("fluent" in sentence or "native" in sentence):
+            if "not fluent" not in sentence and "not native" not in sentence:
+                return "Mayank's German proficiency: Intermediate (A2 certified)"
+
+    return text
+
 def answer(query: str) -> str:
     """Main function to answer queries about Mayank's portfolio"""
+    return answer_with_path(query)[0]
+
+def answer_with_path(query: str) -> Tuple[str, str]:
+    """
+    Answer a query and report which path produced the answer:
+    "refusal", "structured", "gemini", "semantic_cache" or "error"
+    """
+    with span("response_cache"):
+        cached = response_cache.get_entry(query)
+    if cached is not None:
+        note("response_cache", "hit")
+        return cached
+
+    result, path = answer_uncached(query)
+    if path != "error":
+        response_cache.put(query, result, path)
+    return result, path
+
+def answer_uncached(query: str) -> Tuple[str, str]:
+    """Answer a query without consulting the exact-match response cache; returns (answer, path)"""
     # First check for out-of-context queries
-    if is_out_of_context(query):
-        return "This information is not available in Mayank's portfolio. Please ask about Mayank's background, skills, projects, experience, or education."
+    with span("guard"):
+        refused = is_out_of_context(query)
+    if refused:
+        return OUT_OF_CONTEXT_RESPONSE, "refusal"
     
     # Try to get a structured response first
-    structured_response = format_specific_response(query)
+    with span("structured"):
+        structured_response = format_specific_response(query)
     if structured_response:
-        return structured_response
+        return structured_response, "structured"
+    return generate_answer(query)
+
+def semantic_lookup(query: str, section: Optional[str], embedding=None):
+    """
+    semantic_cache.lookup(), embedding the query first if needed; returns
+    (answer, embedding). Any failure, e.g. an encoder that cannot load
+    offline, is a miss with no embedding, so the question goes to Gemini.
+    """
+    if not semantic_cache.enabled:
+        return None, None
+    try:
+        if embedding is None:
+            with span("embed"):
+                embedding = query_embeddings.embed([query])[0]
+        with span("semantic_cache"):
+            return semantic_cache.lookup(query, section, embedding)
+    except Exception as e:
+        print(f"Semantic cache unavailable: {e}")
+        return None, None
+
+def semantic_store(embedding, query: str, answer: str, section: Optional[str]):
+    """semantic_cache.store() that never fails the answer"""
+    try:
+        semantic_cache.store(embedding, query, answer, section)
+    except Exception as e:
+        print(f"Semantic cache store failed: {e}")
+
+def generate_answer(query: str, embedding=None) -> Tuple[str, str]:
+    """The LLM part of answer_uncached(): semantic cache, then Gemini"""
+    section = query_guard.detect_section(query)
+    cached_answer, embedding = semantic_lookup(query, section, embedding)
+    if cached_answer is not None:
+        return cached_answer, "semantic_cache"
     
     # For complex or synthesis queries, use Gemini
     try:
-        prompt = f"""
-        {SYSTEM_PROMPT}
-        
-        User Question: {query}
-        
-        Answer based ONLY on the portfolio data. If the information is not in the data, say "This information is not available in Mayank's portfolio."
-        
-        Important: Be precise about language proficiency (German is Intermediate/A2, not fluent or native).
-        """
-        
-        response = model.generate_content(prompt)
-        return response.text
+        with span("gemini"), llm_call("gemini"):
+            response = gemini_client.get().generate_content(MODEL_NAME, build_prompt(query), **model_settings())
+        token_usage.record(response)
+        with span("verify"):
+            validated = validate_answer(response.text)
+        semantic_store(embedding, query, validated, section)
+        return validated, "gemini"
         
     except Exception as e:
         print(f"Gemini error: {e}")
-        return "I apologize, but I'm having trouble accessing the portfolio information. Please try again or ask about specific sections like education, experience, or projects."
+        return ERROR_RESPONSE, "error"
+
+def prepare_batch(queries: List[str]) -> list:
+    """
+    Everything in answering a batch of questions that does not need Gemini.
+
+    Returns, per question, (answer, path) or a BatchJob for
+    finish_batch_item(). The questions left for Gemini are embedded for the
+    semantic cache in one encode() call.
+    """
+    results = [None] * len(queries)
+    pending = []
+    for i, query in enumerate(queries):
+        cached = response_cache.get_entry(query)
+        if cached is not None:
+            results[i] = cached
+        elif is_out_of_context(query):
+            response_cache.put(query, OUT_OF_CONTEXT_RESPONSE, "refusal")
+            results[i] = (OUT_OF_CONTEXT_RESPONSE, "refusal")
+        else:
+            structured_response = format_specific_response(query)
+            if structured_response:
+                response_cache.put(query, structured_response, "structured")
+                results[i] = (structured_response, "structured")
+            else:
+                pending.append(i)
+
+    embeddings = None
+    if pending and semantic_cache.enabled:
+        try:
+            embeddings = query_embeddings.embed([queries[i] for i in pending])
+        except Exception as e:
+            print(f"Semantic cache unavailable: {e}")
+    for row, i in enumerate(pending):
+        results[i] = BatchJob(queries[i], None, embeddings[row] if embeddings is not None else None)
+    return results
+
+def finish_batch_item(job) -> Tuple[str, str]:
+    """Answer a batch question with Gemini; returns (answer, path)"""
+    result, path = generate_answer(job.query, job.embedding)
+    if path != "error":
+        response_cache.put(job.query, result, path)
+    return result, path
+
+def stream_answer(query: str):
+    """
+    Stream the answer to a query as a sequence of events.
+
+    Refusals and structured responses are sent as a single "answer" event.
+    Gemini answers are sent as "token" events while they are generated; if
+    the finished text fails validation a "retract" event follows, whose text
+    replaces everything streamed so far. The last event is "path", the
+    answer path for metrics; it is not sent to the client.
+    """
+    cached = response_cache.get_entry(query)
+    if cached is not None:
+        yield {"event": "answer", "text": cached[0]}
+        yield {"event": "path", "path": cached[1]}
+        return
+
+    if is_out_of_context(query):
+        response_cache.put(query, OUT_OF_CONTEXT_RESPONSE, "refusal")
+        yield {"event": "answer", "text": OUT_OF_CONTEXT_RESPONSE}
+        yield {"event": "path", "path": "refusal"}
+        return
+
+    structured_response = format_specific_response(query)
+    if structured_response:
+        response_cache.put(query, structured_response, "structured")
+        yield {"event": "answer", "text": structured_response}
+        yield {"event": "path", "path": "structured"}
+        return
+
+    section = query_guard.detect_section(query)
+    cached_answer, embedding = semantic_lookup(query, section)
+    if cached_answer is not None:
+        response_cache.put(query, cached_answer, "semantic_cache")
+        yield {"event": "answer", "text": cached_answer}
+        yield {"event": "path", "path": "semantic_cache"}
+        return
+
+    parts = []
+    try:
+        with llm_call("gemini"):
+            response = gemini_client.get().stream_content(MODEL_NAME, build_prompt(query), **model_settings())
+            for chunk in response:
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield {"event": "token", "text": chunk.text}
+        token_usage.record(response)
+    except Exception as e:
+        print(f"Gemini error: {e}")
+        yield {"event": "retract" if parts else "answer", "text": ERROR_RESPONSE}
+        yield {"event": "path", "path": "error"}
+        return
+
+    streamed = "".join(parts)
+    validated = validate_answer(streamed)
+    if validated != streamed:
+        yield {"event": "retract", "text": validated}
+    semantic_store(embedding, query, validated, section)
+    response_cache.put(query, validated, "gemini")
+    yield {"event": "path", "path": "gemini"}
+
+def warmup_steps():
+    """
+    Steps of the optional background warmup: one embedding (optional, the
+    encoder only serves the semantic cache) and the Gemini client (no test
+    request is sent, it would use API quota)
+    """
+    return [
+        optional(lambda: encode(["What is Mayank's current role?"])),
+        gemini_client.get,
+        model_settings,
+    ]
 
 # Direct access functions
 def get_all_education() -> str:
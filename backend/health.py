@@ -0,0 +1,66 @@
+import os
+import threading
+import time
+from typing import Callable, Tuple
+
+# Seconds between deep checks (0 disables them)
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "300"))
+
+
+class DeepCheck:
+    """
+    Runs a real question through the answer pipeline on a schedule.
+
+    /health serves the result of the last run instead of answering a
+    question on every probe. `check` returns (healthy, path).
+    """
+
+    def __init__(self, check: Callable[[], Tuple[bool, str]], interval: float = HEALTH_CHECK_INTERVAL):
+        self.check = check
+        self.interval = interval
+        self.runs = 0
+        self.failures = 0
+        self._result = {"outcome": "pending", "path": None, "latency_seconds": None, "checked_at": None, "error": None}
+        self._thread = None
+        self._stop = threading.Event()
+
+    def start(self, first_delay: float = None):
+        """Start the schedule; the first check runs after `first_delay` seconds (default: one interval)"""
+        if self._thread is not None or self.interval <= 0:
+            return
+        delay = self.interval if first_delay is None else first_delay
+        self._thread = threading.Thread(target=self._loop, args=(delay,), name="deep-check", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, delay: float):
+        while not self._stop.wait(delay):
+            self.run_once()
+            delay = self.interval
+
+    def run_once(self) -> dict:
+        start = time.perf_counter()
+        path, error = None, None
+        try:
+            healthy, path = self.check()
+            outcome = "passed" if healthy else "failed"
+        except Exception as e:
+            print(f"Deep health check failed: {e}")
+            outcome, error = "error", str(e)
+
+        self.runs += 1
+        if outcome != "passed":
+            self.failures += 1
+        self._result = {
+            "outcome": outcome,
+            "path": path,
+            "latency_seconds": round(time.perf_counter() - start, 3),
+            "checked_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "error": error
+        }
+        return self._result
+
+    def status(self) -> dict:
+        return dict(self._result, runs=self.runs, failures=self.failures, interval_seconds=self.interval)
@@ -0,0 +1,54 @@
+import hashlib
+import os
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+
+# Cache lifetimes (seconds) sent to browsers and CDNs for GET responses:
+# the fixed endpoints (/, /info, /sections), /ask answers that did not need
+# an LLM (structured answers and refusals), and /ask answers from Gemini,
+# the local model or the semantic cache (0 = revalidate with the ETag every time)
+STATIC_CACHE_TTL = int(os.getenv("STATIC_CACHE_TTL", "3600"))
+ASK_STRUCTURED_TTL = int(os.getenv("ASK_STRUCTURED_TTL", "86400"))
+ASK_LLM_TTL = int(os.getenv("ASK_LLM_TTL", "0"))
+
+DETERMINISTIC_PATHS = ("structured", "refusal")
+
+
+def ask_cache_control(path: str) -> str:
+    """Cache-Control for a /ask answer, by the path that produced it"""
+    if path == "error":
+        return "no-store"
+    if path in DETERMINISTIC_PATHS:
+        return cache_control(ASK_STRUCTURED_TTL)
+    return cache_control(ASK_LLM_TTL)
+
+
+def cache_control(max_age: int) -> str:
+    if max_age <= 0:
+        return "no-cache"
+    return f"public, max-age={max_age}"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match check (weak comparison, so W/"x" matches "x")"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def cached_json(request: Request, content, cache_control_value: str) -> Response:
+    """
+    JSON response with a content-hash ETag and Cache-Control; an empty 304
+    when the client already has this exact body.
+    """
+    response = JSONResponse(content=content)
+    etag = '"' + hashlib.sha256(response.body).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": cache_control_value}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return response
@@ -0,0 +1,88 @@
+import os
+
+import torch
+from transformers import AutoModelForCausalLM
+
+BACKENDS = ("auto", "fp32", "bf16", "fp16", "int8", "onnx")
+
+# Exported ONNX models are written here once and reused on later starts
+ONNX_CACHE_DIR = os.getenv("QWEN_ONNX_DIR", "onnx_cache")
+
+
+class InferenceBackend:
+    """
+    A loaded causal LM plus what it can do.
+
+    Every backend supports model.generate(). `supports_kv_reuse` says whether
+    the model also accepts transformers cache objects and explicit position
+    ids in a plain forward call, which the system prefix cache and the
+    continuous batching engine rely on.
+    """
+
+    def __init__(self, name: str, model, supports_kv_reuse: bool):
+        self.name = name
+        self.model = model
+        self.supports_kv_reuse = supports_kv_reuse
+
+    def __repr__(self):
+        return f"InferenceBackend({self.name!r}, supports_kv_reuse={self.supports_kv_reuse})"
+
+
+def resolve_backend(name: str) -> str:
+    """Map `auto` to fp16 on a GPU and fp32 on CPU (half precision is emulated there)"""
+    name = name.lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown QWEN_BACKEND {name!r}, expected one of {', '.join(BACKENDS)}")
+    if name == "auto":
+        return "fp16" if torch.cuda.is_available() else "fp32"
+    return name
+
+
+def _load_torch(model_name: str, dtype) -> torch.nn.Module:
+    kwargs = {"torch_dtype": dtype}
+    if torch.cuda.is_available():
+        kwargs["device_map"] = "auto"
+    model = AutoModelForCausalLM.from_pretrained(model_name, **kwargs)
+    model.eval()
+    return model
+
+
+def _load_int8(model_name: str) -> torch.nn.Module:
+    # Linear weights are stored as int8 and activations quantized per batch
+    model = _load_torch(model_name, torch.float32).to("cpu")
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def onnx_model_dir(model_name: str) -> str:
+    return os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "--"))
+
+
+def _load_onnx(model_name: str):
+    try:
+        from optimum.onnxruntime import ORTModelForCausalLM
+    except ImportError as e:
+        raise RuntimeError("QWEN_BACKEND=onnx needs `pip install optimum[onnxruntime]`") from e
+
+    path = onnx_model_dir(model_name)
+    if os.path.exists(os.path.join(path, "model.onnx")):
+        return ORTModelForCausalLM.from_pretrained(path, use_cache=True)
+
+    print(f"Exporting {model_name} to ONNX in {path} (one time)...")
+    model = ORTModelForCausalLM.from_pretrained(model_name, export=True, use_cache=True)
+    model.save_pretrained(path)
+    return model
+
+
+def load_backend(model_name: str, name: str = "auto") -> InferenceBackend:
+    """Load `model_name` with the requested backend"""
+    name = resolve_backend(name)
+    if name == "fp32":
+        return InferenceBackend(name, _load_torch(model_name, torch.float32), True)
+    if name == "bf16":
+        return InferenceBackend(name, _load_torch(model_name, torch.bfloat16), True)
+    if name == "fp16":
+        return InferenceBackend(name, _load_torch(model_name, torch.float16), True)
+    if name == "int8":
+        return InferenceBackend(name, _load_int8(model_name), True)
+    # ONNX Runtime keeps its own key/value tensors between steps
+    return InferenceBackend(name, _load_onnx(model_name), False)
@@ -1,19 +1,21 @@
 import json
 import faiss
 import numpy as np
-from sentence_transformers import SentenceTransformer
-
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+from embedding_cache import EmbeddingCache
+from encoder import encoder_id, load_encoder
+from lexical_index import BM25Index
 
 with open("data/rag_knowledge.json", "r", encoding="utf-8") as f:
     data = json.load(f)
 
 documents = []
 
-def add_doc(section: str, content: str):
+def add_doc(section: str, content: str, fields: dict):
+    """Add a document; `fields` keeps the structured values the text was built from"""
     documents.append({
         "section": section,
-        "content": content.strip()
+        "content": content.strip(),
+        "fields": fields
     })
 
 # ---------- PROFILE ----------
@@ -29,7 +31,17 @@ Availability: {profile['availability']}
 Focus Areas: {", ".join(profile['focus'])}
 Languages Spoken: {", ".join(profile['languages'])}
 Interests: {", ".join(profile['interests'])}
-"""
+""",
+    {
+        "name": profile["name"],
+        "title": profile["title"],
+        "location": profile["location"],
+        "bio": profile["bio"],
+        "availability": profile["availability"],
+        "focus": profile["focus"],
+        "languages": profile["languages"],
+        "interests": profile["interests"]
+    }
 )
 
 # ---------- EXPERIENCE ----------
@@ -43,7 +55,15 @@ Period: {exp['period']}
 Description: {exp['description']}
 Achievements: {", ".join(exp.get("achievements", []))}
 Technologies: {", ".join(exp['technologies'])}
-"""
+""",
+        {
+            "role": exp["role"],
+            "company": exp["company"],
+            "period": exp["period"],
+            "description": exp["description"],
+            "achievements": exp.get("achievements", []),
+            "technologies": exp["technologies"]
+        }
     )
 
 # ---------- EDUCATION ----------
@@ -54,7 +74,8 @@ for edu in data["education"]:
 Degree: {edu['degree']}
 Institution: {edu['institution']}
 Years: {edu['year']}
-"""
+""",
+        {"degree": edu["degree"], "institution": edu["institution"], "years": edu["year"]}
     )
 
 # ---------- CERTIFICATIONS ----------
@@ -63,7 +84,8 @@ for cert in data["certifications"]:
         "certifications",
         f"""
 Certification: {cert}
-"""
+""",
+        {"certification": cert}
     )
 
 # ---------- AWARDS ----------
@@ -73,7 +95,8 @@ for award in data["awards"]:
         f"""
 Award Title: {award['title']}
 Description: {award['description']}
-"""
+""",
+        {"title": award["title"], "description": award["description"]}
     )
 
 # ---------- SKILLS ----------
@@ -85,7 +108,16 @@ AI & ML: {", ".join(skills['ai_ml'])}
 Development: {", ".join(skills['development'])}
 Backend & Databases: {", ".join(skills['backend_database'])}
 Soft Skills: {", ".join(skills['soft_skills'])}
-"""
+""",
+    {
+        # Category label -> skills, in the order of the text
+        "categories": {
+            "AI & ML": skills["ai_ml"],
+            "Development": skills["development"],
+            "Backend & Databases": skills["backend_database"],
+            "Soft Skills": skills["soft_skills"]
+        }
+    }
 )
 
 # ---------- PROJECTS ----------
@@ -99,19 +131,36 @@ Features: {", ".join(proj.get('features', []))}
 Technologies: {", ".join(proj['technologies'])}
 Role: {proj['role']}
 Timeline: {proj['timeline']}
-"""
+""",
+        {
+            "name": proj["name"],
+            "description": proj["description"],
+            "features": proj.get("features", []),
+            "technologies": proj["technologies"],
+            "role": proj["role"],
+            "timeline": proj["timeline"]
+        }
     )
 
 # ---------- CREATE EMBEDDINGS ----------
+# Documents must be embedded by the same encoder backend that embeds queries.
+# Unchanged documents reuse their cached embedding; the encoder is only
+# loaded when something has to be embedded.
 texts = [doc["content"] for doc in documents]
-embeddings = embedder.encode(texts)
-embeddings = np.array(embeddings).astype("float32")
+cache = EmbeddingCache(encoder_id())
+embeddings, computed = cache.embed(texts, lambda missing: load_encoder().encode(missing))
+cache.save()
+print(f"Embeddings: {len(texts) - computed} reused, {computed} computed ({cache.path})")
 
 index = faiss.IndexFlatL2(embeddings.shape[1])
 index.add(embeddings)
 
 faiss.write_index(index, "portfolio.index")
 
+# BM25 inverted index over the same documents, for exact names and the
+# lexical fast path
+BM25Index.build(texts).save("portfolio_bm25.json")
+
 with open("texts.json", "w", encoding="utf-8") as f:
     json.dump(documents, f, indent=2)
 
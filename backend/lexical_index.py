@@ -0,0 +1,121 @@
+import json
+import math
+import os
+import re
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+# How rag retrieval combines the FAISS and BM25 results: "hybrid"
+# (reciprocal rank fusion), "dense" (FAISS only) or "lexical" (BM25 only,
+# no query encoding)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+# Reciprocal rank fusion: score = 1 / (RRF_K + dense rank) + LEXICAL_WEIGHT / (RRF_K + BM25 rank)
+RRF_K = int(os.getenv("RRF_K", "60"))
+LEXICAL_WEIGHT = float(os.getenv("LEXICAL_WEIGHT", "1.0"))
+# Retrieve with BM25 alone, without encoding the query, when the best
+# document contains a query term found in at most LEXICAL_FAST_PATH_MAX_DF
+# documents (a name such as "PhishGuard") and scores at least
+# LEXICAL_FAST_PATH_MARGIN times the runner-up
+LEXICAL_FAST_PATH = os.getenv("LEXICAL_FAST_PATH", "true").lower() == "true"
+LEXICAL_FAST_PATH_MAX_DF = int(os.getenv("LEXICAL_FAST_PATH_MAX_DF", "1"))
+LEXICAL_FAST_PATH_MARGIN = float(os.getenv("LEXICAL_FAST_PATH_MARGIN", "1.5"))
+
+STOPWORDS = frozenset("""
+a an and are as at be by can could did do does for from had has have he her him his how i in is it its
+me my of on or she tell that the their them there they this to was what when where which who whom why
+will with would you your about any all also know show give list please mayank mayanks s
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords, with a plural "s" removed"""
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class BM25Index:
+    """
+    Okapi BM25 over the texts.json documents, as an inverted index.
+
+    ingest.py builds it next to portfolio.index; document ids are positions
+    in texts.json, like the FAISS ids.
+    """
+
+    def __init__(self, postings: dict, doc_lengths: List[int], k1: float = 1.5, b: float = 0.75):
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        n = len(doc_lengths)
+        average = (sum(doc_lengths) / n) if n else 0.0
+        self.idf = {term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in postings.items()}
+        # The length part of the BM25 denominator, per document
+        self._norm = [k1 * (1 - b + b * length / average) if average else k1 for length in doc_lengths]
+
+    @classmethod
+    def build(cls, texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        postings, doc_lengths = {}, []
+        for doc_id, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lengths.append(len(tokens))
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, tf in counts.items():
+                postings.setdefault(token, []).append([doc_id, tf])
+        return cls(postings, doc_lengths, k1, b)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["postings"], data["doc_lengths"], data["k1"], data["b"])
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "doc_lengths": self.doc_lengths, "postings": self.postings}, f)
+
+    def search(self, query: str, k: int, ids: Optional[Iterable[int]] = None) -> List[Tuple[int, float]]:
+        """Up to k (doc id, score) pairs with a positive score, best first, within `ids` if given"""
+        allowed = None if ids is None else set(int(i) for i in ids)
+        scores = {}
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = self.idf[term]
+            for doc_id, tf in docs:
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + self._norm[doc_id])
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    def confident(self, query: str, hits: List[Tuple[int, float]],
+                  max_df: int = LEXICAL_FAST_PATH_MAX_DF, margin: float = LEXICAL_FAST_PATH_MARGIN) -> bool:
+        """Whether the best hit of search(query) stands out enough to skip dense retrieval"""
+        if not hits or (len(hits) > 1 and hits[0][1] < margin * hits[1][1]):
+            return False
+        best = hits[0][0]
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term, [])
+            if 0 < len(docs) <= max_df and any(doc_id == best for doc_id, _ in docs):
+                return True
+        return False
+
+
+def fuse(dense_ids: Sequence[int], lexical_hits: List[Tuple[int, float]], k: int,
+         rrf_k: int = RRF_K, lexical_weight: float = LEXICAL_WEIGHT) -> List[int]:
+    """Reciprocal rank fusion of FAISS ids (-1 = none) and BM25 hits; the k best ids"""
+    scores = {}
+    for rank, doc_id in enumerate(i for i in dense_ids if i >= 0):
+        scores[int(doc_id)] = 1.0 / (rrf_k + rank + 1)
+    for rank, (doc_id, _) in enumerate(lexical_hits):
+        scores[doc_id] = scores.get(doc_id, 0.0) + lexical_weight / (rrf_k + rank + 1)
+    return [doc_id for doc_id, _ in sorted(scores.items(), key=lambda item: -item[1])[:k]]
@@ -0,0 +1,176 @@
+"""
+Prometheus metrics in the text exposition format, without a client library.
+
+Request and LLM call metrics are recorded as they happen (a bisect and a
+locked increment each); gauges such as queue depth, cache hit ratios and
+memory are read from their owners only when /metrics is scraped.
+"""
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Sequence, Tuple
+
+# Starlette appends "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Seconds; answers range from sub-millisecond cache hits to multi-second generations
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_metrics = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Sequence[str], values: Sequence, le: str = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _value(value) -> str:
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        _metrics.append(self)
+
+    def inc(self, *labels, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_value(value)}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+        _metrics.append(self)
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_labels(self.label_names, labels, bound)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, labels)} {_value(total)}"
+            yield f"{self.name}_count{_labels(self.label_names, labels)} {cumulative}"
+
+
+class Collected:
+    """A gauge or counter whose values are read from `read()` -> [(label values, value)] at scrape time"""
+
+    def __init__(self, name: str, help_text: str, kind: str, labels: Sequence[str],
+                 read: Callable[[], Iterable[Tuple[tuple, float]]]):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.label_names = tuple(labels)
+        self.read = read
+        _metrics.append(self)
+
+    def render(self) -> Iterable[str]:
+        try:
+            values = list(self.read())
+        except Exception as e:
+            print(f"Metric {self.name} failed: {e}")
+            return
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in values:
+            yield f"{self.name}{_labels(self.label_names, labels)} {_value(value)}"
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ---------- REQUEST AND LLM METRICS ----------
+request_seconds = Histogram(
+    "portfolio_request_duration_seconds",
+    "Answer request latency by endpoint and answer path",
+    ("endpoint", "path")
+)
+time_to_first_token = Histogram(
+    "portfolio_stream_time_to_first_token_seconds",
+    "Time from a /chat/stream request to its first token or answer event"
+)
+llm_call_seconds = Histogram(
+    "portfolio_llm_call_duration_seconds",
+    "Duration of Gemini and local model calls, including failed ones",
+    ("backend",)
+)
+llm_call_errors = Counter(
+    "portfolio_llm_call_errors_total",
+    "Gemini and local model calls that raised",
+    ("backend",)
+)
+
+
+@contextmanager
+def llm_call(backend: str):
+    """Time a Gemini ("gemini") or local model ("local") call and count it as an error if it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        llm_call_errors.inc(backend)
+        raise
+    finally:
+        llm_call_seconds.observe(time.perf_counter() - start, backend)
+
+
+# ---------- PROCESS ----------
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _memory():
+    try:
+        with open("/proc/self/statm") as f:
+            size, resident = f.read().split()[:2]
+    except OSError:
+        return []
+    return [(("resident",), int(resident) * _PAGE_SIZE), (("virtual",), int(size) * _PAGE_SIZE)]
+
+
+Collected("process_memory_bytes", "Process memory (Linux /proc/self/statm)", "gauge", ("kind",), _memory)
+Collected("process_cpu_seconds_total", "User and system CPU time of the process", "counter", (),
+          lambda: [((), time.process_time())])
@@ -1,71 +1,44 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM
+from transformers import AutoTokenizer, StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+from threading import Event, Lock, Thread
+import copy
+import os
 import torch
+from batching import BatchEngine
+import query_guard
+from inference_backends import load_backend
+from tracing import note
 
 MODEL_NAME = "Qwen/Qwen2.5-0.5B-Instruct"
 
-tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
-model = AutoModelForCausalLM.from_pretrained(
-    MODEL_NAME,
-    device_map="auto",
-    torch_dtype=torch.float16
-)
-
-model.eval()
-
-# List of portfolio-related keywords that questions MUST contain
-PORTFOLIO_KEYWORDS = [
-    "mayank", "portfolio", "profile", "education", "experience",
-    "skill", "project", "award", "certification", "work", "job",
-    "contact", "location", "available", "hire", "background",
-    "degree", "college", "university", "school", "study",
-    "role", "position", "company", "employ", "technical",
-    "technology", "programming", "code", "ai", "ml", 
-    "machine learning", "artificial intelligence", "develop",
-    "build", "create", "design", "system", "certificate",
-    "certified", "honor", "recognition", "language", "speak",
-    "german", "english", "hindi", "marathi", "interests",
-    "hobby", "passion", "focus", "area", "credentials",
-    "qualification", "achievement", "accomplishment"
-]
+# fp32 / bf16 / fp16 / int8 / onnx, or auto (fp16 on a GPU, fp32 on CPU)
+QWEN_BACKEND = os.getenv("QWEN_BACKEND", "auto")
+
+# Reuse the key/value cache of SYSTEM_PREFIX across generations
+QWEN_PREFIX_CACHE = os.getenv("QWEN_PREFIX_CACHE", "true").lower() == "true"
+
+# Run concurrent local generations in one shared decode loop (bench_batching.py measured
+# 1.6x the throughput of one generate() per request at 8 concurrent requests on CPU)
+QWEN_BATCHING = os.getenv("QWEN_BATCHING", "true").lower() == "true"
+QWEN_MAX_BATCH = int(os.getenv("QWEN_MAX_BATCH", "8"))
+
+# Set by load() the first time the local model is needed
+tokenizer = None
+backend = None
+model = None
+prefix_ids = None
+prefix_cache = None
+batch_engine = None
+GENERATION_KWARGS = None
+_loaded = False
+_load_lock = Lock()
 
 def is_portfolio_question(question: str) -> bool:
     """Check if question is about the portfolio"""
-    question_lower = question.lower()
-    
-    # Check for explicit portfolio references
-    if "mayank" in question_lower or "portfolio" in question_lower:
-        return True
-    
-    # Check for portfolio keywords
-    for keyword in PORTFOLIO_KEYWORDS:
-        if keyword in question_lower:
-            return True
-    
-    # Questions starting with "what" about work/education/skills
-    if question_lower.startswith("what"):
-        what_topics = ["what does", "what is", "what are", "what was", "what were"]
-        if any(topic in question_lower for topic in what_topics):
-            # Check if it's about Mayank's attributes
-            mayank_attributes = ["his", "mayank's", "he", "him"]
-            if any(attr in question_lower for attr in mayank_attributes):
-                return True
-    
-    # Questions starting with "where", "when", "how" about Mayank
-    if question_lower.startswith(("where", "when", "how")):
-        mayank_attributes = ["his", "mayank", "he", "does mayank"]
-        if any(attr in question_lower for attr in mayank_attributes):
-            return True
-    
-    return False
+    return query_guard.is_portfolio_question(question)
 
-def build_prompt(context: str, question: str):
-    """Build prompt with strict instructions"""
-    
-    # First check if this is a portfolio question
-    if not is_portfolio_question(question):
-        return "REJECT: This is not a portfolio-related question."
-    
-    return f"""<|im_start|>system
+# Static start of every prompt. Its key/value cache is computed once at
+# startup so each request only prefills the context and question tokens.
+SYSTEM_PREFIX = """<|im_start|>system
 You are an AI assistant that ONLY answers questions about Mayank Kulkarni's portfolio.
 
 CRITICAL RULES:
@@ -95,7 +68,11 @@ INVALID TOPICS (do NOT answer these):
 - Other people's information
 - Any topic not specifically about Mayank's portfolio
 
-Context:
+"""
+
+def build_prompt_suffix(context: str, question: str) -> str:
+    """Build the per-request part of the prompt that follows SYSTEM_PREFIX"""
+    return f"""Context:
 {context}
 
 Question: {question}
@@ -104,25 +81,52 @@ Remember: If the answer is not EXACTLY in the context above, say "This informati
 <|im_start|>assistant
 """
 
-def generate_answer(context: str, question: str):
-    """Generate answer with strict validation"""
+def build_prompt(context: str, question: str):
+    """Build prompt with strict instructions"""
     
-    # Check if this is a portfolio question before even using the model
+    # First check if this is a portfolio question
     if not is_portfolio_question(question):
-        return "This information is not available in Mayank's portfolio. Please ask about Mayank's background, skills, projects, experience, education, or other portfolio-related topics."
-    
-    prompt = build_prompt(context, question)
-    
-    # If prompt starts with REJECT, return the rejection message
-    if prompt.startswith("REJECT:"):
-        return "This information is not available in Mayank's portfolio. Please ask about Mayank's background, skills, projects, experience, education, or other portfolio-related topics."
+        return "REJECT: This is not a portfolio-related question."
     
-    inputs = tokenizer(prompt, return_tensors="pt")
-    inputs = {k: v.to(model.device) for k, v in inputs.items()}
+    return SYSTEM_PREFIX + build_prompt_suffix(context, question)
 
+def compute_prefix_cache():
+    """Run the model over SYSTEM_PREFIX once and return its past key/values"""
     with torch.no_grad():
-        outputs = model.generate(
-            **inputs,
+        past_key_values = model(prefix_ids, use_cache=True).past_key_values
+    if isinstance(past_key_values, tuple):
+        try:
+            from transformers import DynamicCache
+            past_key_values = DynamicCache.from_legacy_cache(past_key_values)
+        except ImportError:
+            pass
+    return past_key_values
+
+def fresh_prefix_cache():
+    """Copy of the prefix cache for one generation (generate() extends the cache it is given)"""
+    if prefix_cache is None:
+        return None
+    if isinstance(prefix_cache, tuple):
+        # Legacy tuples are never modified in place
+        return prefix_cache
+    return copy.deepcopy(prefix_cache)
+
+REJECTION_RESPONSE = "This information is not available in Mayank's portfolio. Please ask about Mayank's background, skills, projects, experience, education, or other portfolio-related topics."
+
+def load():
+    """Load the tokenizer and model, then the prefix cache and batching engine (once)"""
+    global tokenizer, backend, model, prefix_ids, prefix_cache, batch_engine, GENERATION_KWARGS, _loaded
+    if _loaded:
+        return
+    with _load_lock:
+        if _loaded:
+            return
+
+        tokenizer = AutoTokenizer.from_pretrained(MODEL_NAME)
+        backend = load_backend(MODEL_NAME, QWEN_BACKEND)
+        print(f"Local model backend: {backend.name}")
+
+        GENERATION_KWARGS = dict(
             max_new_tokens=150,  # Reduced to prevent rambling
             temperature=0.01,     # Lower temperature for more deterministic output
             do_sample=False,      # Use greedy decoding for more consistent responses
@@ -133,15 +137,55 @@ def generate_answer(context: str, question: str):
             eos_token_id=tokenizer.eos_token_id
         )
 
-    full_output = tokenizer.decode(outputs[0], skip_special_tokens=True)
+        prefix_ids = tokenizer(SYSTEM_PREFIX, return_tensors="pt")["input_ids"].to(backend.model.device)
+        model = backend.model
+        if QWEN_PREFIX_CACHE and backend.supports_kv_reuse:
+            prefix_cache = compute_prefix_cache()
+
+        if QWEN_BATCHING and backend.supports_kv_reuse:
+            batch_engine = BatchEngine(
+                model,
+                eos_token_id=tokenizer.eos_token_id,
+                max_new_tokens=GENERATION_KWARGS["max_new_tokens"],
+                repetition_penalty=GENERATION_KWARGS["repetition_penalty"],
+                no_repeat_ngram_size=GENERATION_KWARGS["no_repeat_ngram_size"],
+                max_batch_size=QWEN_MAX_BATCH
+            )
+        _loaded = True
+
+def _prepare_inputs(context: str, question: str):
+    """Tokenize the prompt, or return None if the question must be rejected"""
+    # Check if this is a portfolio question before even using the model
+    if not is_portfolio_question(question):
+        return None
+    load()
     
+    # Tokenize the suffix on its own so the prompt starts with exactly the
+    # cached prefix tokens
+    suffix_ids = tokenizer(
+        build_prompt_suffix(context, question),
+        return_tensors="pt",
+        add_special_tokens=False
+    )["input_ids"].to(model.device)
+    input_ids = torch.cat([prefix_ids, suffix_ids], dim=1)
+
+    inputs = {
+        "input_ids": input_ids,
+        "attention_mask": torch.ones_like(input_ids)
+    }
+    if prefix_cache is not None:
+        inputs["past_key_values"] = fresh_prefix_cache()
+    return inputs
+
+def postprocess_answer(answer_text: str, question: str) -> str:
+    """Enforce the strict portfolio rules on generated text"""
     # Extract only the assistant's response
-    if "<|im_start|>assistant" in full_output:
-        answer_text = full_output.split("<|im_start|>assistant")[-1].strip()
+    if "<|im_start|>assistant" in answer_text:
+        answer_text = answer_text.split("<|im_start|>assistant")[-1].strip()
         # Clean up any remaining tags
         answer_text = answer_text.replace("<|im_end|>", "").strip()
     else:
-        answer_text = full_output.strip()
+        answer_text = answer_text.strip()
     
     # Post-process to enforce strict rules
     answer_lower = answer_text.lower()
@@ -172,4 +216,94 @@ def generate_answer(context: str, question: str):
     if "not available" in answer_lower or "not in the portfolio" in answer_lower:
         return "This information is not available in Mayank's portfolio."
     
-    return answer_text.strip()
\ No newline at end of file
+    return answer_text.strip()
+
+def generate_answer(context: str, question: str):
+    """Generate answer with strict validation"""
+    inputs = _prepare_inputs(context, question)
+    if inputs is None:
+        return REJECTION_RESPONSE
+
+    if batch_engine is not None:
+        generated = batch_engine.generate(inputs)
+    else:
+        with torch.no_grad():
+            outputs = model.generate(**inputs, **GENERATION_KWARGS)
+        # Decode only the generated tokens, not the echoed prompt
+        generated = outputs[0][inputs["input_ids"].shape[1]:]
+
+    note("local_tokens", {
+        "prompt_tokens": int(inputs["input_ids"].shape[1]),
+        "cached_tokens": int(prefix_ids.shape[1]) if prefix_cache is not None else 0,
+        "output_tokens": len(generated)
+    })
+    full_output = tokenizer.decode(generated, skip_special_tokens=True)
+    return postprocess_answer(full_output, question)
+
+class _StopWhenSet(StoppingCriteria):
+    """Stops model.generate() once the event is set"""
+
+    def __init__(self, event: Event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.event.is_set()
+
+def stream_answer(context: str, question: str):
+    """
+    Yield the raw answer text piece by piece as it is generated.
+
+    The pieces are not post-processed; callers join them and run
+    postprocess_answer() on the result once the stream is finished.
+    Closing the generator early (the client disconnected) stops the
+    generation instead of decoding the rest for nobody.
+    """
+    inputs = _prepare_inputs(context, question)
+    if inputs is None:
+        yield REJECTION_RESPONSE
+        return
+
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+
+    if batch_engine is not None:
+        future = batch_engine.submit(inputs, streamer=streamer)
+        finished = False
+        try:
+            for text in streamer:
+                if text:
+                    yield text
+            finished = True
+        finally:
+            if not finished:
+                future.cancel()
+        # Surface generation errors
+        future.result()
+        return
+
+    stop = Event()
+    errors = []
+
+    def run():
+        try:
+            with torch.no_grad():
+                model.generate(
+                    **inputs, **GENERATION_KWARGS, streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([_StopWhenSet(stop)])
+                )
+        except Exception as e:
+            # generate() only ends the streamer when it finishes
+            errors.append(e)
+            streamer.end()
+
+    thread = Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        for text in streamer:
+            if text:
+                yield text
+    finally:
+        stop.set()
+    thread.join()
+    # Surface generation errors
+    if errors:
+        raise errors[0]
@@ -0,0 +1,435 @@
+"""
+Keyword checks on incoming questions.
+
+The local model's portfolio check and the RAG pipeline's out-of-context
+filter and section detection ask "does the question contain X" for a few
+hundred keywords. Instead of one substring scan per keyword, every keyword
+found in a question is collected by a single regex pass (analyze()) and
+those checks become set lookups. The decisions are the same as the chains
+of `x in question` they replace (see test_query_guard.py).
+
+Each check reads its keywords from the tables declared next to it, and the
+matcher at the bottom is compiled from the same tables. The Gemini
+pipeline's out-of-context filter and structured-response routing keep
+early-exit substring scans over their tables: they run once per question
+the response cache has not seen, where the full scan measured 0.6x the
+scans (bench_query_guard.py).
+"""
+import re
+from functools import lru_cache
+from itertools import chain
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+
+class KeywordMatcher:
+    """Finds every keyword that occurs in a text (as a substring) in one pass"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords = frozenset(k for k in keywords if k)
+
+        # The keywords as a trie-shaped regex inside a lookahead: it is tried
+        # at every position and captures the longest keyword starting there
+        self._pattern = re.compile("(?=(" + _trie_pattern(self.keywords) + "))")
+
+        # Every other keyword starting at that position is a prefix of the
+        # longest one, so each keyword maps to all keywords that prefix it
+        self._prefixes = {
+            keyword: frozenset(keyword[:end] for end in range(1, len(keyword) + 1) if keyword[:end] in self.keywords)
+            for keyword in self.keywords
+        }
+
+    def find(self, text: str, start: int = 0) -> FrozenSet[str]:
+        """The keywords in text[start:]"""
+        longest = self._pattern.findall(text, start)
+        if not longest:
+            return frozenset()
+        return frozenset().union(*[self._prefixes[keyword] for keyword in set(longest)])
+
+
+def _trie_pattern(keywords) -> str:
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = None
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # A keyword ends here: prefer the longer continuation, else stop
+        return f"(?:{body})?" if "" in node else body
+
+    return build(trie)
+
+
+class Query:
+    """A lowercased question with the keywords it contains"""
+
+    __slots__ = ("text", "hits")
+
+    def __init__(self, text: str, hits: FrozenSet[str]):
+        self.text = text
+        self.hits = hits
+
+    def has(self, keyword: str) -> bool:
+        return keyword in self.hits
+
+    def has_any(self, keywords) -> bool:
+        return not self.hits.isdisjoint(keywords)
+
+    def topic(self, start: int) -> "Query":
+        """The question after its first `start` characters (e.g. "explain "), without a second cache entry"""
+        return Query(self.text[start:].strip(), _matcher.find(self.text, start))
+
+
+# ---------- LOCAL MODEL: PORTFOLIO QUESTIONS ----------
+# Questions must contain one of these to reach the local model
+PORTFOLIO_KEYWORDS = (
+    "mayank", "portfolio", "profile", "education", "experience",
+    "skill", "project", "award", "certification", "work", "job",
+    "contact", "location", "available", "hire", "background",
+    "degree", "college", "university", "school", "study",
+    "role", "position", "company", "employ", "technical",
+    "technology", "programming", "code", "ai", "ml",
+    "machine learning", "artificial intelligence", "develop",
+    "build", "create", "design", "system", "certificate",
+    "certified", "honor", "recognition", "language", "speak",
+    "german", "english", "hindi", "marathi", "interests",
+    "hobby", "passion", "focus", "area", "credentials",
+    "qualification", "achievement", "accomplishment"
+)
+# "What ..." and "where/when/how ..." questions about Mayank
+WHAT_QUESTIONS = ("what does", "what is", "what are", "what was", "what were")
+WHAT_ABOUT_HIM = ("his", "mayank's", "he", "him")
+WHERE_ABOUT_HIM = ("his", "mayank", "he", "does mayank")
+
+
+def is_portfolio_question(question: str) -> bool:
+    """Check if question is about the portfolio"""
+    q = analyze(question)
+
+    # Explicit portfolio references and portfolio keywords
+    if q.has_any(PORTFOLIO_KEYWORDS):
+        return True
+
+    # Questions starting with "what" about Mayank's attributes
+    if q.text.startswith("what"):
+        if q.has_any(WHAT_QUESTIONS) and q.has_any(WHAT_ABOUT_HIM):
+            return True
+
+    # Questions starting with "where", "when", "how" about Mayank
+    if q.text.startswith(("where", "when", "how")):
+        if q.has_any(WHERE_ABOUT_HIM):
+            return True
+
+    return False
+
+
+# ---------- RAG PIPELINE: SECTIONS ----------
+GENERAL_AI = ("ai in general", "artificial intelligence in general")
+WHAT_IS_AI = ("what is ai", "what is artificial intelligence")
+MAYANK = ("mayank",)
+WHO_ABOUT_HIM = ("mayank", "his", "he")
+
+# Questions combining several sections
+COMBINATION_WORDS = ("and", "both", "also")
+COMBINED_SECTIONS = (("education", "experience"), ("education", "work"), ("study", "work"))
+PORTFOLIO_SECTIONS = ("education", "experience", "projects", "skills",
+                      "background", "work", "career", "achievements")
+
+# Synthesis questions, only when they are about Mayank's portfolio
+SYNTHESIS_WORDS = ("connect", "relate", "relationship", "impact", "influence", "how does", "how do")
+SYNTHESIS_ABOUT_HIM = ("mayank", "his", "he", "portfolio")
+
+COMPREHENSIVE_KEYWORDS = ("credential", "qualification", "background")
+SPOKEN_LANGUAGES = ("german", "english", "hindi", "marathi", "french", "spanish")
+SPOKEN_LANGUAGE_WORDS = ("speak", "spoken", "language", "know", "proficiency")
+CODING_WORDS = ("programming", "coding", "code")
+PROGRAMMING_LANGUAGES = ("python", "javascript", "java", "c++", "c#", "php", "ruby", "go", "rust", "html", "css", "sql")
+LANGUAGE = ("language",)
+LANGUAGE_CODING_WORDS = ("programming", "code", "develop", "coding")
+LANGUAGE_SPEAKING_WORDS = ("speak", "spoken", "talk", "communicate", "proficiency")
+# "What does Mayank do?" goes to profile
+WHAT_DOES = ("what does",)
+WHAT_DOES_DO = ("do", "work as", "job")
+
+# The remaining sections, checked in order
+SECTION_KEYWORDS = (
+    ("profile", ("available", "hire", "contact", "where", "location", "interests")),
+    ("projects", ("project", "built", "developed")),
+    ("education", ("education", "degree", "college", "school", "study", "academic",
+                   "background", "student", "learn")),
+    ("experience", ("experience", "work", "intern", "job", "role", "position",
+                    "company", "employed")),
+    ("skills", ("skill", "technical", "programming", "technology", "expertise", "proficient")),
+    ("awards", ("award", "achievement", "prize", "winner", "recognition", "honor")),
+    ("certifications", ("certification", "certificate", "certified")),
+    ("profile", ("profile", "about", "bio", "who", "introduce", "background",
+                 "what does", "tell me about")),
+)
+
+
+@lru_cache(maxsize=4096)
+def detect_section(question: str) -> Optional[str]:
+    """Portfolio section a question is about (None if no section applies)"""
+    q = analyze(question)
+
+    # "AI in general" / "What is AI?" should not trigger any section
+    if q.has_any(GENERAL_AI):
+        return None
+    if q.has_any(WHAT_IS_AI) and not q.has_any(MAYANK):
+        return None
+
+    # "Who won" questions should not trigger any section
+    if q.text.startswith(("who won", "who is the", "who are the")):
+        if not q.has_any(WHO_ABOUT_HIM):
+            return None
+
+    # ---------- COMBINATION QUERIES ----------
+    if q.has_any(COMBINATION_WORDS):
+        if any(q.hits.issuperset(pair) for pair in COMBINED_SECTIONS):
+            return "comprehensive"
+        if len(q.hits.intersection(PORTFOLIO_SECTIONS)) >= 2:
+            return "comprehensive"
+
+    # ---------- SYNTHESIS/REASONING QUERIES ----------
+    if q.has_any(SYNTHESIS_WORDS):
+        return "synthesis" if q.has_any(SYNTHESIS_ABOUT_HIM) else None
+
+    # ---------- HARD-LOCKED SECTIONS ----------
+    if q.has_any(COMPREHENSIVE_KEYWORDS):
+        return "comprehensive"
+
+    # Spoken languages
+    if q.has_any(SPOKEN_LANGUAGES) and q.has_any(SPOKEN_LANGUAGE_WORDS):
+        return "profile"
+
+    # Programming languages
+    if q.has_any(CODING_WORDS) or q.has_any(PROGRAMMING_LANGUAGES):
+        return "skills"
+
+    if q.has_any(LANGUAGE):
+        if q.has_any(LANGUAGE_CODING_WORDS):
+            return "skills"
+        if q.has_any(LANGUAGE_SPEAKING_WORDS):
+            return "profile"
+
+    if q.has_any(WHAT_DOES) and q.has_any(WHAT_DOES_DO):
+        return "profile"
+
+    for section, keywords in SECTION_KEYWORDS:
+        if q.has_any(keywords):
+            return section
+
+    return None
+
+
+# ---------- RAG PIPELINE: OUT OF CONTEXT ----------
+# Clearly out-of-context topics
+RAG_OFF_TOPIC = (
+    "weather", "cricket", "football", "sports", "movie", "music",
+    "news", "politics", "stock", "market", "recipe", "cooking",
+    "travel", "holiday", "health", "medical", "doctor",
+    "physics", "chemistry", "biology", "math", "history",
+    "world cup", "tournament", "match", "game", "player",
+    "president", "prime minister", "government", "height", "hobby", "election"
+)
+# "Tell me about X" / "explain X" / "what is X": X must be about Mayank or his portfolio
+GENERAL_QUESTION_PREFIXES = ("tell me about ", "explain ", "what is ")
+TOPIC_ABOUT_HIM = ("mayank", "his", "he", "him")
+RAG_PORTFOLIO_TOPICS = (
+    "portfolio", "ai", "ml", "machine learning", "artificial intelligence",
+    "education", "experience", "projects", "skills", "background",
+    "work", "job", "career", "certification", "award"
+)
+WHO_ABOUT_PORTFOLIO = ("mayank", "he", "his", "him", "portfolio")
+TELL_ME_ABOUT_SECTIONS = ("education", "experience", "projects", "skills", "background",
+                          "work", "job", "career", "achievements", "certifications")
+COMBINATION_PHRASES = (
+    "experience and education", "education and experience",
+    "projects and skills", "skills and projects",
+    "background and experience", "education and projects",
+    "work and education", "career and education"
+)
+# Portfolio keywords are in context unless asking about them "in general"
+RAG_PORTFOLIO_TERMS = (
+    "education", "experience", "projects", "skills", "background",
+    "work", "job", "career", "achievement", "award", "certification",
+    "degree", "college", "university", "school", "study", "intern",
+    "role", "position", "company", "technology", "programming",
+    "development", "design", "ai", "ml", "machine learning"
+)
+IN_GENERAL = ("in general", "generally")
+
+
+def rag_out_of_context(question: str) -> bool:
+    """Check if query is clearly unrelated to Mayank's portfolio (RAG pipeline rules)"""
+    q = analyze(question)
+
+    if q.has_any(RAG_OFF_TOPIC):
+        return True
+
+    # General knowledge questions
+    for prefix in GENERAL_QUESTION_PREFIXES:
+        if q.text.startswith(prefix):
+            topic = q.topic(len(prefix))
+            if topic.has_any(TOPIC_ABOUT_HIM):
+                return False
+            return not topic.has_any(RAG_PORTFOLIO_TOPICS)
+
+    # "who" questions that aren't about Mayank
+    if q.text.startswith("who "):
+        return not q.has_any(WHO_ABOUT_PORTFOLIO)
+
+    # "tell me about" (without a space) followed by a portfolio section
+    if q.text.startswith("tell me about"):
+        if q.has_any(TELL_ME_ABOUT_SECTIONS):
+            return False
+
+    # Combination queries (experience AND education, etc.)
+    if q.has_any(COMBINATION_PHRASES):
+        return False
+
+    if q.has_any(RAG_PORTFOLIO_TERMS):
+        return q.has_any(IN_GENERAL)
+
+    return False
+
+
+# ---------- GEMINI PIPELINE ----------
+# Checked by substring scans, not the matcher (see the module docstring)
+GEMINI_OFF_TOPIC = (
+    "weather", "cricket", "football", "sports", "movie", "music",
+    "news", "politics", "stock", "market", "recipe", "cooking",
+    "travel", "holiday", "health", "medical", "doctor",
+    "physics", "chemistry", "biology", "math", "history",
+    "world cup", "tournament", "match", "game", "player",
+    "president", "prime minister", "government", "election",
+    "religion", "philosophy"
+)
+# "Who is X": X must name Mayank
+WHO_IS_NAMES = ("mayank", "kulkarni")
+# "What is X" without Mayank: X must be a portfolio term
+WHAT_IS_TOPICS = (
+    "ai", "ml", "machine learning", "artificial intelligence",
+    "rag", "llm", "vision transformer", "phishing",
+    "data science", "computer engineering", "diploma", "btech"
+)
+# "Tell me about X": X must be a portfolio section
+TELL_ME_ABOUT_TOPICS = (
+    "mayank", "his", "education", "experience", "projects",
+    "skills", "background", "work", "portfolio", "certifications",
+    "awards", "languages", "contact", "email"
+)
+
+# Structured responses, checked in order
+LANGUAGE_INTENTS = (
+    ("german", ("speak german", "know german", "german proficiency")),
+    ("english", ("speak english", "know english", "english proficiency")),
+    ("hindi", ("speak hindi", "know hindi", "hindi proficiency")),
+    ("marathi", ("speak marathi", "know marathi", "marathi proficiency")),
+)
+LANGUAGES_INTENT = ("what language", "languages does")
+# Project name fragment -> keywords
+PROJECT_INTENTS = (
+    ("phishguard", ("phishguard", "phishing")),
+    ("part number", ("part number",)),
+    ("yogar", ("yogar", "yoga")),
+)
+SECTION_INTENTS = (
+    ("education", ("education", "degree", "study")),
+    ("experience", ("experience", "work", "job")),
+    ("skills", ("skill", "technical")),
+    ("contact", ("contact", "email", "reach")),
+)
+
+
+def _contains_any(text: str, keywords) -> bool:
+    for keyword in keywords:
+        if keyword in text:
+            return True
+    return False
+
+
+def gemini_out_of_context(question: str) -> bool:
+    """Check if query is unrelated to Mayank's portfolio (Gemini pipeline rules)"""
+    text = question.lower()
+
+    if _contains_any(text, GEMINI_OFF_TOPIC):
+        return True
+
+    # "who is" questions not about Mayank
+    if text.startswith("who is "):
+        topic = text[7:].strip()
+        if not _contains_any(topic, WHO_IS_NAMES):
+            return True
+
+    # "what is" questions about general topics
+    if text.startswith("what is ") and "mayank" not in text:
+        if not _contains_any(text[8:].strip(), WHAT_IS_TOPICS):
+            return True
+
+    # "tell me about" without a portfolio section
+    if text.startswith("tell me about "):
+        if not _contains_any(text[14:].strip(), TELL_ME_ABOUT_TOPICS):
+            return True
+
+    return False
+
+
+def specific_intent(question: str, projects: bool = True) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Which structured response answers a question, as (kind, key):
+    ("language", name), ("languages", None), ("project", name fragment),
+    ("education" / "experience" / "skills" / "contact", None), or None.
+    Project intents are skipped when there are no projects.
+    """
+    text = question.lower()
+
+    for language, phrases in LANGUAGE_INTENTS:
+        if _contains_any(text, phrases):
+            return "language", language
+
+    if _contains_any(text, LANGUAGES_INTENT):
+        return "languages", None
+
+    if projects:
+        for name, keywords in PROJECT_INTENTS:
+            if _contains_any(text, keywords):
+                return "project", name
+
+    for kind, keywords in SECTION_INTENTS:
+        if _contains_any(text, keywords):
+            return kind, None
+    return None
+
+
+# ---------- MATCHER ----------
+def _ordered(tables) -> Iterable[str]:
+    """The keywords of (key, keywords) tables"""
+    return chain.from_iterable(keywords for _, keywords in tables)
+
+
+# Every keyword the checks above look up, so analyze() finds all of them
+_matcher = KeywordMatcher(chain(
+    PORTFOLIO_KEYWORDS, WHAT_QUESTIONS, WHAT_ABOUT_HIM, WHERE_ABOUT_HIM,
+    GENERAL_AI, WHAT_IS_AI, MAYANK, WHO_ABOUT_HIM, COMBINATION_WORDS, chain.from_iterable(COMBINED_SECTIONS),
+    PORTFOLIO_SECTIONS, SYNTHESIS_WORDS, SYNTHESIS_ABOUT_HIM, COMPREHENSIVE_KEYWORDS, SPOKEN_LANGUAGES,
+    SPOKEN_LANGUAGE_WORDS, CODING_WORDS, PROGRAMMING_LANGUAGES, LANGUAGE, LANGUAGE_CODING_WORDS,
+    LANGUAGE_SPEAKING_WORDS, WHAT_DOES, WHAT_DOES_DO, _ordered(SECTION_KEYWORDS),
+    RAG_OFF_TOPIC, TOPIC_ABOUT_HIM, RAG_PORTFOLIO_TOPICS, WHO_ABOUT_PORTFOLIO, TELL_ME_ABOUT_SECTIONS,
+    COMBINATION_PHRASES, RAG_PORTFOLIO_TERMS, IN_GENERAL,
+))
+
+
+def analyze(question: str) -> Query:
+    """Lowercase a question and find every keyword it contains"""
+    return _analyze_text(question.lower())
+
+
+@lru_cache(maxsize=4096)
+def _analyze_text(text: str) -> Query:
+    return Query(text, _matcher.find(text))
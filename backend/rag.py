@@ -1,7 +1,18 @@
 import json
 import faiss
-from sentence_transformers import SentenceTransformer
-from model import generate_answer
+from components import register
+import query_guard
+from encoder import encode
+from gemini import ask_gemini as gemini_answer, stream_gemini, token_usage
+from answer_cache import QueryEmbeddingCache, ResponseCache, SemanticCache
+from section_records import SectionRecords
+from section_index import SectionIndex
+from lexical_index import BM25Index, LEXICAL_FAST_PATH, RETRIEVAL_MODE, fuse
+from batch import BatchJob
+from stage_stats import StageStats
+from metrics import llm_call
+from tracing import explaining, note, span
+import numpy as np
 import re
 import os
 from dotenv import load_dotenv
@@ -10,14 +21,51 @@ load_dotenv()
 
 USE_GEMINI = os.getenv("USE_GEMINI", "false").lower() == "true"
 
-# Load FAISS index
-index = faiss.read_index("portfolio.index")
-
 # Load documents with metadata
 with open("texts.json", "r", encoding="utf-8") as f:
     documents = json.load(f)
 
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
+# Typed section records and the pre-rendered section responses
+records = SectionRecords(documents)
+
+# FAISS index (with per-section sub-indexes), the query encoder (ENCODER_BACKEND picks PyTorch, int8 or
+# ONNX Runtime) and the local model are loaded on first use
+faiss_index = register(
+    "faiss_index",
+    lambda: SectionIndex(faiss.read_index("portfolio.index"), [doc["section"] for doc in documents])
+)
+
+def _load_bm25_index():
+    # A texts.json from before portfolio_bm25.json existed is indexed on load
+    if os.path.exists("portfolio_bm25.json"):
+        return BM25Index.load("portfolio_bm25.json")
+    return BM25Index.build([doc["content"] for doc in documents])
+
+bm25_index = register("bm25_index", _load_bm25_index)
+
+# Document ids (positions in texts.json) per section, for section-restricted BM25 search
+section_ids = {}
+for doc_id, doc in enumerate(documents):
+    section_ids.setdefault(doc["section"], []).append(doc_id)
+
+def _load_local_model():
+    import model
+    model.load()
+    return model
+
+local_model = register("qwen", _load_local_model)
+
+# Final answers for repeated questions, checked before anything else
+response_cache = ResponseCache()
+
+# Query embeddings of recent questions, shared by retrieval and the semantic cache
+query_embeddings = QueryEmbeddingCache(encode)
+
+# Answers from Gemini / the local model, reused for paraphrased questions
+semantic_cache = SemanticCache(query_embeddings.embed)
+
+# Per answer path, the retrievals, encoder passes and FAISS searches made
+stage_stats = StageStats()
 
 def is_valid_gemini_answer(answer: str, query: str) -> bool:
     answer_lower = answer.lower()
@@ -80,244 +128,97 @@ def is_valid_gemini_answer(answer: str, query: str) -> bool:
 
 # ---------- INTENT DETECTION ----------
 def detect_section(question: str):
-    q = question.lower()
-
-    # Keep out-of-context filtering first
-    # "AI in general" should not trigger profile section
-    if "ai in general" in q or "artificial intelligence in general" in q:
-        return None
-    
-    # "What is AI?" should not trigger any section
-    if ("what is ai" in q or "what is artificial intelligence" in q) and "mayank" not in q:
-        return None
-    
-    # "Who won" questions should not trigger any section
-    if q.startswith("who won") or q.startswith("who is the") or q.startswith("who are the"):
-        if "mayank" not in q and "his" not in q and "he" not in q:
-            return None
-
-    # ---------- COMBINATION QUERIES ----------
-    # Queries asking for multiple sections should go to comprehensive
-    if ("and" in q or "both" in q or "also" in q):
-        # Check for education + experience combinations
-        if ("education" in q and "experience" in q) or \
-           ("education" in q and "work" in q) or \
-           ("study" in q and "work" in q):
-            return "comprehensive"
-        
-        # Check for other combinations
-        sections_count = 0
-        portfolio_sections = ["education", "experience", "projects", "skills", 
-                             "background", "work", "career", "achievements"]
-        
-        for section in portfolio_sections:
-            if section in q:
-                sections_count += 1
-        
-        if sections_count >= 2:
-            return "comprehensive"
-
-    # ---------- SYNTHESIS/REASONING QUERIES ----------
-    synthesis_keywords = ["connect", "relate", "relationship", "impact", "influence", "how does", "how do"]
-    if any(keyword in q for keyword in synthesis_keywords):
-        # But ONLY if they're about Mayank's portfolio
-        if any(k in q for k in ["mayank", "his", "he", "portfolio"]):
-            return "synthesis"
-        else:
-            return None
-
-    # ---------- HARD-LOCKED SECTIONS ----------
-    # "Credentials" should go to education or a comprehensive response
-    if "credential" in q or "qualification" in q or "background" in q:
-        return "comprehensive"
-    
-    # First, check for specific spoken languages
-    spoken_languages = ["german", "english", "hindi", "marathi", "french", "spanish"]
-    if any(lang in q for lang in spoken_languages):
-        if "speak" in q or "spoken" in q or "language" in q or "know" in q or "proficiency" in q:
-            return "profile"
-    
-    # Check for programming language queries
-    if "programming" in q or "coding" in q or "code" in q:
-        return "skills"
-    
-    # Check for specific programming languages
-    programming_languages = ["python", "javascript", "java", "c++", "c#", "php", "ruby", "go", "rust", "html", "css", "sql"]
-    if any(lang in q for lang in programming_languages):
-        return "skills"
-    
-    if "language" in q:
-        # Distinguish between programming languages and spoken languages
-        if "programming" in q or "code" in q or "develop" in q or "coding" in q:
-            return "skills"
-        if "speak" in q or "spoken" in q or "talk" in q or "communicate" in q or "proficiency" in q:
-            return "profile"
-    
-    # "What does Mayank do?" should go to profile
-    if "what does" in q and ("do" in q or "work as" in q or "job" in q):
-        return "profile"
-    
-    # Profile-related queries
-    if ("available" in q or "hire" in q or "contact" in q or 
-        "where" in q or "location" in q or "interests" in q):
-        return "profile"
-    
-    if "project" in q or "built" in q or "developed" in q:
-        return "projects"
-    
-    if ("education" in q or "degree" in q or "college" in q or 
-        "school" in q or "study" in q or "academic" in q or 
-        "background" in q or "student" in q or "learn" in q):
-        return "education"
-    
-    if ("experience" in q or "work" in q or "intern" in q or 
-        "job" in q or "role" in q or "position" in q or 
-        "company" in q or "employed" in q):
-        return "experience"
-    
-    if ("skill" in q or "technical" in q or "programming" in q or 
-        "technology" in q or "expertise" in q or "proficient" in q):
-        return "skills"
-    
-    if ("award" in q or "achievement" in q or "prize" in q or 
-        "winner" in q or "recognition" in q or "honor" in q):
-        return "awards"
-    
-    if ("certification" in q or "certificate" in q or "certified" in q):
-        return "certifications"
-    
-    if ("profile" in q or "about" in q or "bio" in q or 
-        "who" in q or "introduce" in q or "background" in q or
-        "what does" in q or "tell me about" in q):
-        return "profile"
-    
-    return None
+    """Portfolio section a question is about (see query_guard.detect_section)"""
+    return query_guard.detect_section(question)
 
 # Add this function at the top of rag.py, right after detect_section()
 def is_out_of_context(query: str) -> bool:
     """Check if query is clearly unrelated to Mayank's portfolio"""
-    query_lower = query.lower()
-    
-    # Clearly out-of-context topics that should be rejected immediately
-    out_of_context_keywords = [
-        "weather", "cricket", "football", "sports", "movie", "music",
-        "news", "politics", "stock", "market", "recipe", "cooking",
-        "travel", "holiday", "health", "medical", "doctor",
-        "physics", "chemistry", "biology", "math", "history",
-        "world cup", "tournament", "match", "game", "player",
-        "president", "prime minister", "government", "height", "hobby", "election"
-    ]
-    
-    # FIRST: Check for specific out-of-context patterns
-    if any(keyword in query_lower for keyword in out_of_context_keywords):
-        return True
-    
-    # SECOND: Check for general knowledge questions
-    if query_lower.startswith(("tell me about ", "explain ", "what is ")):
-        # Extract the topic
-        for prefix in ["tell me about ", "explain ", "what is "]:
-            if query_lower.startswith(prefix):
-                topic = query_lower[len(prefix):].strip()
-                # Check if it's about Mayank or his portfolio
-                if any(term in topic for term in ["mayank", "his", "he", "him"]):
-                    return False  # It's about Mayank, so it's in context
-                
-                # Check if topic contains portfolio keywords
-                portfolio_terms = [
-                    "portfolio", "ai", "ml", "machine learning", "artificial intelligence",
-                    "education", "experience", "projects", "skills", "background",
-                    "work", "job", "career", "certification", "award"
-                ]
-                
-                if any(term in topic for term in portfolio_terms):
-                    return False  # It's portfolio-related
-                
-                # If no portfolio keywords, it's out of context
-                return True
-        return False
-    
-    # THIRD: Check for "who" questions that aren't about Mayank
-    if query_lower.startswith("who "):
-        # Allow "who is mayank" or "who is he" or questions about his background
-        if any(term in query_lower for term in ["mayank", "he", "his", "him", "portfolio"]):
-            return False
-        # Reject all other "who" questions
-        return True
-    
-    # FOURTH: Check for "tell me about" without Mayank reference but about portfolio
-    if query_lower.startswith("tell me about"):
-        # Check if it's about portfolio sections
-        portfolio_sections = [
-            "education", "experience", "projects", "skills", "background",
-            "work", "job", "career", "achievements", "certifications"
-        ]
-        if any(section in query_lower for section in portfolio_sections):
-            return False  # It's portfolio-related
-    
-    # FIFTH: Check for combination queries (experience AND education, etc.)
-    portfolio_combination_terms = [
-        "experience and education", "education and experience",
-        "projects and skills", "skills and projects",
-        "background and experience", "education and projects",
-        "work and education", "career and education"
-    ]
-    
-    if any(combo in query_lower for combo in portfolio_combination_terms):
-        return False  # Combination queries are in-context
-    
-    # SIXTH: Check for general questions without "Mayank" reference but about portfolio
-    portfolio_keywords = [
-        "education", "experience", "projects", "skills", "background",
-        "work", "job", "career", "achievement", "award", "certification",
-        "degree", "college", "university", "school", "study", "intern",
-        "role", "position", "company", "technology", "programming",
-        "development", "design", "ai", "ml", "machine learning"
-    ]
-    
-    # If query contains portfolio keywords, it's in context
-    if any(keyword in query_lower for keyword in portfolio_keywords):
-        # Additional check: make sure it's not asking about general topics
-        if "in general" in query_lower or "generally" in query_lower:
-            return True  # "AI in general" is out of context
-        return False  # Portfolio-related
-    
-    # Check for questions starting with portfolio-related question words
-    portfolio_question_patterns = [
-        "tell me about his", "what is his", "what are his",
-        "describe his", "explain his", "how is his"
-    ]
-    
-    if any(pattern in query_lower for pattern in portfolio_question_patterns):
-        return False  # Questions about "his" are in context
-    
-    return False  # Default: assume it's in context if not clearly out-of-context
+    return query_guard.rag_out_of_context(query)
 
 # ---------- RETRIEVAL ----------
+def lexical_hits(query: str, k: int, section):
+    """BM25 (doc id, score) hits within the section; the whole corpus if none of its documents match"""
+    hits = bm25_index.get().search(query, k, section_ids.get(section))
+    if not hits and section in section_ids:
+        hits = bm25_index.get().search(query, k)
+    return hits
+
+def lexical_retrieval(query: str, k: int, section):
+    """
+    BM25 hits for a query, within its section if it has one, and the
+    document ids to use when they are enough on their own (None when the
+    query still needs dense retrieval)
+    """
+    if RETRIEVAL_MODE == "dense":
+        return [], None
+    hits = lexical_hits(query, k, section)
+    if RETRIEVAL_MODE == "lexical" or (LEXICAL_FAST_PATH and bm25_index.get().confident(query, hits)):
+        return hits, [doc_id for doc_id, _ in hits]
+    return hits, None
+
+def retrieve_stage(states, k: int = 5):
+    """
+    The retrieve stage for one or more questions: BM25 first, then FAISS for
+    the questions the lexical fast path does not settle, with one encode()
+    call for all of them and one FAISS search per section. Sets each
+    state's context.
+    """
+    with span("lexical"):
+        lexical = [state.lexical(k) for state in states]
+    dense = [n for n, (_, ids) in enumerate(lexical) if ids is None]
+    fused = {n: ids for n, (_, ids) in enumerate(lexical) if ids is not None}
+    distances = indices = None
+    if dense:
+        embed_stage([states[n] for n in dense])
+        with span("search"):
+            distances, indices = faiss_index.get().search_many(np.stack([states[n].embedding for n in dense]), k,
+                                                               [states[n].section for n in dense])
+            for row, n in enumerate(dense):
+                states[n].faiss_searches += 1
+                fused[n] = fuse(indices[row], lexical[n][0], k)
+    for n, state in enumerate(states):
+        state.retrieved = True
+        state._context = select_context(fused[n], k)
+
+    if explaining() and len(states) == 1:
+        dense_hits = []
+        if dense:
+            dense_hits = [{"id": int(i), "distance": round(float(d), 4)}
+                          for d, i in zip(distances[0], indices[0]) if i >= 0]
+        note("retrieval", {
+            "mode": RETRIEVAL_MODE if dense or RETRIEVAL_MODE != "hybrid" else "lexical fast path",
+            "lexical": [{"id": doc_id, "score": round(score, 4)} for doc_id, score in lexical[0][0]],
+            "dense": dense_hits,
+            "documents": [{"id": int(i), "section": documents[i]["section"]} for i in fused[0] if i >= 0]
+        })
+
+def embed_stage(states):
+    """Query embeddings for the states that have none yet, in one encode() call for the uncached ones"""
+    missing = []
+    for state in states:
+        if state._embedding is None:
+            state._embedding = query_embeddings.get(state.query)
+            if state._embedding is None:
+                missing.append(state)
+    if missing:
+        with span("embed"):
+            vectors = query_embeddings.embed([state.query for state in missing])
+        for state, vector in zip(missing, vectors):
+            state._embedding = vector
+            state.encoder_calls += 1
+
 def retrieve_context(query: str, k: int = 5) -> str:
-    """Retrieve context with better handling for diverse queries"""
-    query_embedding = embedder.encode([query]).astype("float32")
-    _, indices = index.search(query_embedding, k * 5) 
-
-    target_section = detect_section(query)
-
-    selected = []
-    for idx in indices[0]:
-        doc = documents[idx]
-        if target_section is None or doc["section"] == target_section:
-            selected.append(doc["content"])
-        if len(selected) == k:
-            break
-    
-    # If we didn't get enough from target section, add from any section
-    if len(selected) < k:
-        for idx in indices[0]:
-            doc = documents[idx]
-            if doc["content"] not in selected:
-                selected.append(doc["content"])
-            if len(selected) == k:
-                break
+    """Retrieve the k best documents for the query, from its section if it names one"""
+    state = AnswerState(query)
+    retrieve_stage([state], k)
+    return state.context
+
+def select_context(indices, k: int = 5) -> str:
+    """Build the context from the retrieved document ids of a query (-1 marks a missing neighbour)"""
+    selected = [documents[idx]["content"] for idx in indices[:k] if idx >= 0]
 
-    # If STILL no context, add some default profile info
+    # If no context, add some default profile info
     if len(selected) == 0:
         for doc in documents:
             if doc["section"] == "profile":
@@ -330,361 +231,47 @@ def retrieve_context(query: str, k: int = 5) -> str:
 # ---------- DIRECT DOCUMENT ACCESS ----------
 def get_documents_by_section(section_name: str):
     """Get all documents for a specific section"""
-    return [doc for doc in documents if doc["section"] == section_name]
+    return records.documents.get(section_name, [])
 
 # ---------- IMPROVED STRUCTURED EXTRACTORS ----------
+# The section responses are rendered once from the typed records (see section_records.py)
 def extract_education(context: str) -> str:
-    """Extract all education entries from context"""
-    # Get education documents directly
-    edu_docs = get_documents_by_section("education")
-    
-    if not edu_docs:
-        return "Education information is not available in Mayank's portfolio."
-    
-    education_entries = []
-    
-    for doc in edu_docs:
-        lines = doc["content"].split("\n")
-        entry = {}
-        for line in lines:
-            line = line.strip()
-            if line.startswith("Degree:"):
-                degree = line.replace("Degree:", "").strip()
-                degree = degree.replace("[EDUCATION]", "").strip()
-                entry["degree"] = degree
-            elif line.startswith("Institution:"):
-                entry["institution"] = line.replace("Institution:", "").strip()
-            elif line.startswith("Years:"):
-                entry["years"] = line.replace("Years:", "").strip()
-        
-        if entry and "degree" in entry:
-            education_entries.append(entry)
-    
-    if not education_entries:
-        return "Education information is not available in Mayank's portfolio."
-    
-    # Sort by year (most recent first)
-    def get_start_year(years_str):
-        try:
-            # Extract first year (e.g., "2023" from "2023 – 2026")
-            year_part = years_str.split("–")[0].strip()
-            return int(year_part)
-        except:
-            return 0
-    
-    education_entries.sort(key=lambda x: get_start_year(x.get("years", "0")), reverse=True)
-    
-    response = ["Mayank's Education:"]
-    for edu in education_entries:
-        response.append(f"• {edu['degree']} at {edu['institution']} ({edu['years']})")
-    
-    return "\n".join(response)
+    """All education entries, most recent first"""
+    return records.responses["education"]
 
 def extract_experience(context: str) -> str:
-    """Extract all experience entries from context"""
-    # Get experience documents directly
-    exp_docs = get_documents_by_section("experience")
-    
-    if not exp_docs:
-        return "Experience information is not available in Mayank's portfolio."
-    
-    experience_entries = []
-    
-    for doc in exp_docs:
-        lines = doc["content"].split("\n")
-        entry = {}
-        for line in lines:
-            line = line.strip()
-            if line.startswith("Role:"):
-                role = line.replace("Role:", "").strip()
-                role = role.replace("[EXPERIENCE]", "").strip()
-                entry["role"] = role
-            elif line.startswith("Company:"):
-                entry["company"] = line.replace("Company:", "").strip()
-            elif line.startswith("Period:"):
-                entry["period"] = line.replace("Period:", "").strip()
-            elif line.startswith("Technologies:"):
-                entry["technologies"] = line.replace("Technologies:", "").strip()
-        
-        if entry and "role" in entry:
-            experience_entries.append(entry)
-    
-    if not experience_entries:
-        return "Experience information is not available in Mayank's portfolio."
-    
-    # Sort by period (most recent first)
-    def get_year(period_str):
-        try:
-            # Extract first year from period like "January 2026 – Present"
-            match = re.search(r'\d{4}', period_str)
-            return int(match.group()) if match else 0
-        except:
-            return 0
-    
-    experience_entries.sort(key=lambda x: get_year(x.get("period", "0")), reverse=True)
-    
-    response = ["Mayank's Work Experience:"]
-    for exp in experience_entries:
-        response.append(f"\n{exp['role']}")
-        response.append(f"  Company: {exp['company']}")
-        response.append(f"  Period: {exp['period']}")
-        if 'technologies' in exp and exp['technologies']:
-            response.append(f"  Technologies: {exp['technologies']}")
-    
-    return "\n".join(response)
+    """All experience entries, most recent first"""
+    return records.responses["experience"]
 
 def extract_projects(context: str, query: str = "") -> str:
-    """Extract project entries from context, with support for specific project queries"""
-    # Get project documents directly
-    proj_docs = get_documents_by_section("projects")
-    
-    if not proj_docs:
-        return "Project information is not available in Mayank's portfolio."
-    
-    project_entries = []
-    
-    for doc in proj_docs:
-        lines = doc["content"].split("\n")
-        entry = {}
-        for line in lines:
-            line = line.strip()
-            if line.startswith("Project Name:"):
-                name = line.replace("Project Name:", "").strip()
-                name = name.replace("[PROJECT]", "").strip()
-                entry["name"] = name
-                entry["original_name"] = name  # Keep original for matching
-            elif line.startswith("Description:"):
-                entry["description"] = line.replace("Description:", "").strip()
-            elif line.startswith("Technologies:"):
-                entry["technologies"] = line.replace("Technologies:", "").strip()
-            elif line.startswith("Role:"):
-                entry["role"] = line.replace("Role:", "").strip()
-            elif line.startswith("Timeline:"):
-                entry["timeline"] = line.replace("Timeline:", "").strip()
-            elif line.startswith("Features:"):
-                entry["features"] = line.replace("Features:", "").strip()
-        
-        if entry and "name" in entry:
-            project_entries.append(entry)
-    
-    if not project_entries:
-        return "Project information is not available in Mayank's portfolio."
-    
-    # Check if query asks for a specific project
-    query_lower = query.lower() if query else ""
-    
-    # Check for specific project mentions
-    specific_projects = {
-        "phishguard": ["phishguard", "phishing", "url detector"],
-        "yogar": ["yogar", "yoga", "augmented reality", "ar yoga"],
-        "part number": ["part number", "vision transformer", "machine vision"]
-    }
-    
-    for project_name, keywords in specific_projects.items():
-        if any(keyword in query_lower for keyword in keywords):
-            # Find the specific project
-            for proj in project_entries:
-                proj_lower = proj.get("original_name", "").lower()
-                if any(keyword in proj_lower for keyword in keywords):
-                    # Return only this project with detailed information
-                    response = [f"Mayank's Project: {proj['name']}"]
-                    
-                    if 'description' in proj and proj['description']:
-                        response.append(f"\nDescription: {proj['description']}")
-                    
-                    if 'features' in proj and proj['features']:
-                        response.append(f"\nFeatures: {proj['features']}")
-                    
-                    if 'technologies' in proj and proj['technologies']:
-                        response.append(f"\nTechnologies: {proj['technologies']}")
-                    
-                    if 'role' in proj and proj['role']:
-                        response.append(f"\nRole: {proj['role']}")
-                    
-                    if 'timeline' in proj and proj['timeline']:
-                        response.append(f"\nTimeline: {proj['timeline']}")
-                    
-                    return "\n".join(response)
-    
-    # If no specific project requested, show all projects
-    response = ["Mayank's Projects:"]
-    for proj in project_entries:
-        response.append(f"\n{proj['name']}")
-        if 'description' in proj and proj['description']:
-            response.append(f"  Description: {proj['description']}")
-        if 'technologies' in proj and proj['technologies']:
-            response.append(f"  Technologies: {proj['technologies']}")
-        if 'role' in proj and proj['role']:
-            response.append(f"  Role: {proj['role']}")
-        if 'timeline' in proj and proj['timeline']:
-            response.append(f"  Timeline: {proj['timeline']}")
-    
-    return "\n".join(response)
+    """All projects, or the details of one project when the query names it"""
+    return records.project_response(query) or records.responses["projects"]
 
 def extract_awards(context: str) -> str:
-    """Extract awards from context"""
-    # Get awards documents directly
-    awards_docs = get_documents_by_section("awards")
-    
-    if not awards_docs:
-        return "Awards information is not available in Mayank's portfolio."
-    
-    awards_entries = []
-    
-    for doc in awards_docs:
-        lines = doc["content"].split("\n")
-        entry = {}
-        for line in lines:
-            line = line.strip()
-            if line.startswith("Award Title:"):
-                entry["title"] = line.replace("Award Title:", "").strip()
-            elif line.startswith("Description:"):
-                entry["description"] = line.replace("Description:", "").strip()
-        
-        if entry and "title" in entry:
-            awards_entries.append(entry)
-    
-    if not awards_entries:
-        return "Awards information is not available in Mayank's portfolio."
-    
-    response = ["Mayank's Awards:"]
-    for award in awards_entries:
-        response.append(f"\n• {award['title']}")
-        if 'description' in award and award['description']:
-            response.append(f"  {award['description']}")
-    
-    return "\n".join(response)
+    """All awards"""
+    return records.responses["awards"]
 
 def extract_certifications(context: str) -> str:
-    """Extract certifications from context"""
-    # Get certifications documents directly
-    cert_docs = get_documents_by_section("certifications")
-    
-    if not cert_docs:
-        return "Certifications information is not available in Mayank's portfolio."
-    
-    certifications = []
-    
-    for doc in cert_docs:
-        lines = doc["content"].split("\n")
-        for line in lines:
-            line = line.strip()
-            if line.startswith("Certification:"):
-                cert = line.replace("Certification:", "").strip()
-                certifications.append(cert)
-    
-    if not certifications:
-        return "Certifications information is not available in Mayank's portfolio."
-    
-    response = ["Mayank's Certifications:"]
-    for cert in certifications:
-        response.append(f"• {cert}")
-    
-    return "\n".join(response)
+    """All certifications"""
+    return records.responses["certifications"]
 
 def extract_skills(context: str) -> str:
-    """Extract skills information from context"""
-    # Get skills documents directly
-    skills_docs = get_documents_by_section("skills")
-    
-    if not skills_docs:
-        return "Skills information is not available in Mayank's portfolio."
-    
-    skills_content = skills_docs[0]["content"]
-    lines = skills_content.split("\n")
-    
-    response = ["Mayank's Technical Skills:"]
-    for line in lines:
-        line = line.strip()
-        if line and not line.startswith("["):
-            response.append(f"• {line}")
-    
-    if len(response) == 1:
-        return "Skills information is not available in Mayank's portfolio."
-    
-    return "\n".join(response)
+    """Skills by category"""
+    return records.responses["skills"]
 
 def extract_profile(context: str) -> str:
-    """Extract profile information from context"""
-    # Get profile document directly
-    profile_docs = get_documents_by_section("profile")
-    
-    if not profile_docs:
-        return "Profile information is not available in Mayank's portfolio."
-    
-    profile_content = profile_docs[0]["content"]
-    return f"Mayank's Profile:\n\n{profile_content}"
+    """The profile document"""
+    return records.responses["profile"]
 
 # ---------- COMPREHENSIVE EXTRACTOR ----------
 def extract_comprehensive_credentials(context: str) -> str:
     """Extract comprehensive credentials (education + experience + skills)"""
-    response_parts = []
-    
-    # Check what parts are being asked for (we'll get this from query context)
-    query_lower = context.lower() if "query:" in context.lower() else ""
-    
-    # Always include education for comprehensive queries
-    education = extract_education(context)
-    if "Education:" in education:
-        response_parts.append(education)
-    
-    # Add experience
-    experience = extract_experience(context)
-    if "Experience:" in experience:
-        response_parts.append(experience)
-    
-    # Add certifications
-    certifications = extract_certifications(context)
-    if "Certifications:" in certifications:
-        response_parts.append(certifications)
-    
-    # Add key skills summary
-    skills_docs = get_documents_by_section("skills")
-    if skills_docs:
-        skills_content = skills_docs[0]["content"]
-        # Extract key skills
-        key_skills = []
-        lines = skills_content.split("\n")
-        for line in lines:
-            if "AI & ML:" in line:
-                key_skills.append("AI/ML technologies")
-            elif "Development:" in line:
-                key_skills.append("Full-stack development")
-            elif "Backend & Databases:" in line:
-                key_skills.append("Backend systems & databases")
-        
-        if key_skills:
-            response_parts.append(f"Key Expertise: {', '.join(key_skills)}")
-    
-    if not response_parts:
-        return "Credential information is not available in Mayank's portfolio."
-    
-    # Add a summary at the beginning
-    summary = "Mayank's Background Summary:"
-    response_parts.insert(0, summary)
-    
-    return "\n\n".join(response_parts)
+    return records.responses["comprehensive"]
 
 # ---------- SPECIALIZED EXTRACTOR FOR LANGUAGES ----------
 def extract_languages(context: str, query: str) -> str:
     """Extract only language information from profile"""
-    # Get profile document directly
-    profile_docs = get_documents_by_section("profile")
-    
-    if not profile_docs:
-        return "Language information is not available in Mayank's portfolio."
-    
-    profile_content = profile_docs[0]["content"]
-    lines = profile_content.split("\n")
-    
-    # Look for languages spoken line
-    languages_line = None
-    for line in lines:
-        if line.startswith("Languages Spoken:"):
-            languages_line = line.replace("Languages Spoken:", "").strip()
-            break
-    
-    if not languages_line:
+    if not records.languages:
         return "Language information is not available in Mayank's portfolio."
     
     # Check if query is about a specific language
@@ -706,7 +293,7 @@ def extract_languages(context: str, query: str) -> str:
                 return "Mayank's Marathi proficiency: Native"
     
     # General language query
-    return f"Mayank speaks: {languages_line}"
+    return records.responses["languages"]
 
 # ---------- HARD HALLUCINATION BLOCK ----------
 def enforce_no_hallucination(answer: str, context: str) -> str:
@@ -772,26 +359,8 @@ def handle_synthesis_query(query: str, context: str) -> str:
     
     # For AI experience connecting to projects
     if "ai" in query_lower and ("project" in query_lower or "connect" in query_lower or "relate" in query_lower):
-        # Get AI skills
-        skills_docs = get_documents_by_section("skills")
-        ai_skills = []
-        for doc in skills_docs:
-            lines = doc["content"].split("\n")
-            for line in lines:
-                if "AI & ML:" in line:
-                    skills_text = line.replace("AI & ML:", "").strip()
-                    ai_skills = [s.strip() for s in skills_text.split(",")]
-                    break
-        
-        # Get projects
-        project_docs = get_documents_by_section("projects")
-        projects_with_ai = []
-        for doc in project_docs:
-            content = doc["content"]
-            if any(skill.lower() in content.lower() for skill in ai_skills):
-                projects_with_ai.append(doc["content"])
-        
-        if not projects_with_ai:
+        # Projects that use one of the AI & ML skills
+        if not records.ai_projects:
             return "This information is not available in Mayank's portfolio."
         
         # Create a synthesis response
@@ -862,88 +431,368 @@ def handle_synthesis_query(query: str, context: str) -> str:
     
     return None
 
-# Then update the answer() function to add synthesis handling:
-def answer(query: str) -> str:
-    """Main function to answer queries with Gemini primary + RAG fallback"""
+OUT_OF_CONTEXT_RESPONSE = (
+    "This information is not available in Mayank's portfolio. "
+    "Please ask about Mayank's background, skills, projects, experience, or education."
+)
 
+def is_refused(query: str) -> bool:
+    """The refusal checks that run before any retrieval"""
     query_lower = query.lower()
 
     # QUICK REJECT: "Who won" questions without Mayank reference
     if query_lower.startswith("who won") and not any(k in query_lower for k in ["mayank", "his", "he"]):
-        return (
-            "This information is not available in Mayank's portfolio. "
-            "Please ask about Mayank's background, skills, projects, experience, or education."
-        )
+        return True
 
     # FIRST: Check if query is clearly out-of-context
-    if is_out_of_context(query):
-        return (
-            "This information is not available in Mayank's portfolio. "
-            "Please ask about Mayank's background, skills, projects, experience, or education."
-        )
-
-    # Retrieve context
-    context = retrieve_context(query, k=5)
-
-    # Detect section
-    section = detect_section(query)
+    return is_out_of_context(query)
+
+_UNSET = object()
+
+class AnswerState:
+    """
+    One question on its way through the answer stages:
+    guard -> classify -> structured answer -> retrieve -> generate -> verify.
+
+    Each stage output (section, query embedding, context) is computed at
+    most once, when a stage first needs it; questions answered before the
+    generate stage never encode the query or search the index.
+    """
+
+    def __init__(self, query: str, context: str = None, embedding=None):
+        self.query = query
+        self.query_lower = query.lower()
+        self._section = _UNSET
+        self._context = context
+        self._embedding = embedding
+        self._lexical = None
+        self.retrieved = False
+        self.encoder_calls = 0
+        self.faiss_searches = 0
+
+    @property
+    def section(self):
+        """The classify stage"""
+        if self._section is _UNSET:
+            self._section = detect_section(self.query)
+        return self._section
+
+    @property
+    def embedding(self):
+        if self._embedding is None:
+            embed_stage([self])
+        return self._embedding
+
+    def lexical(self, k: int = 5):
+        """lexical_retrieval() for the question, run once per k"""
+        if self._lexical is None or self._lexical[0] != k:
+            self._lexical = (k, lexical_retrieval(self.query, k, self.section))
+        return self._lexical[1]
+
+    @property
+    def fast_path(self) -> bool:
+        """Whether the lexical fast path settles retrieval, so the question never needs the encoder"""
+        return self.lexical()[1] is not None
+
+    @property
+    def context(self) -> str:
+        if self._context is None:
+            retrieve_stage([self])
+        return self._context
+
+    def record(self, path: str):
+        stage_stats.record(path, self.retrieved, self.encoder_calls, self.faiss_searches)
+
+def guard_stage(state: AnswerState):
+    """Refusals that need nothing but the question text; the refusal text or None"""
+    if is_refused(state.query):
+        return OUT_OF_CONTEXT_RESPONSE
 
     # Special handling for AI general questions
+    query_lower = state.query_lower
     if "ai" in query_lower or "artificial intelligence" in query_lower:
         if "general" in query_lower or query_lower.startswith("what is"):
             return (
                 "This information is not available in Mayank's portfolio. "
                 "If you're asking about Mayank's AI skills, please ask about his skills or experience."
             )
+    return None
+
+def structured_stage(state: AnswerState):
+    """Answers rendered from the section records; (answer, path) or (None, None)"""
+    query = state.query
+    query_lower = state.query_lower
+    section = state.section
 
     # ---------- SYNTHESIS QUERIES ----------
     if section == "synthesis":
-        synthesis_response = handle_synthesis_query(query, context)
+        synthesis_response = handle_synthesis_query(query, "")
         if synthesis_response:
-            return synthesis_response
+            return synthesis_response, "structured"
         # If no specialized handler, fall through to Gemini/RAG
 
     # Language queries (hard-locked)
     language_terms = ["speak", "language", "german", "english", "hindi", "marathi", "proficiency"]
     if any(t in query_lower for t in language_terms):
         if not any(t in query_lower for t in ["programming", "coding", "code"]):
-            return extract_languages(context, query)
+            return extract_languages("", query), "structured"
 
     # ---------- HARD-LOCKED SECTIONS ----------
+    # The extractors answer from the section records, so none of them needs retrieval
     if section == "education":
-        return extract_education(context)
+        return extract_education(""), "structured"
     elif section == "experience":
-        return extract_experience(context)
+        return extract_experience(""), "structured"
     elif section == "projects":
-        return extract_projects(context, query)  # Pass query for specific project handling
+        return extract_projects("", query), "structured"  # Pass query for specific project handling
     elif section == "skills":
-        return extract_skills(context)
+        return extract_skills(""), "structured"
     elif section == "awards":
-        return extract_awards(context)
+        return extract_awards(""), "structured"
     elif section == "certifications":
-        return extract_certifications(context)
+        return extract_certifications(""), "structured"
     elif section == "profile":
         if not any(k in query_lower for k in ["mayank", "his", "he", "him"]):
-            return "This information is not available in Mayank's portfolio."
-        return extract_profile(context)
+            return "This information is not available in Mayank's portfolio.", "refusal"
+        return extract_profile(""), "structured"
     elif section == "comprehensive":
-        return extract_comprehensive_credentials(context)
+        return extract_comprehensive_credentials(""), "structured"
+
+    return None, None
+
+def prepare_answer(state: AnswerState):
+    """
+    The stages of answer() that do not need an LLM (guard, classify,
+    structured answer). Returns (final_answer, path) with path "refusal" or
+    "structured", or (None, None) when Gemini or the local model has to
+    answer from the retrieved context.
+    """
+    with span("guard"):
+        refusal = guard_stage(state)
+    if refusal is not None:
+        return refusal, "refusal"
+    with span("section"):
+        section = state.section
+    note("section", section)
+    with span("structured"):
+        return structured_stage(state)
 
+def answer(query: str) -> str:
+    """Main function to answer queries with Gemini primary + RAG fallback"""
+    return answer_with_path(query)[0]
+
+def answer_with_path(query: str):
+    """
+    Answer a query and report which path produced the answer:
+    "refusal", "structured", "gemini", "local" or "semantic_cache"
+    """
+    with span("response_cache"):
+        cached = response_cache.get_entry(query)
+    if cached is not None:
+        note("response_cache", "hit")
+        return cached
+
+    final_answer, path = answer_uncached(query)
+    response_cache.put(query, final_answer, path)
+    return final_answer, path
+
+def answer_uncached(query: str):
+    """Answer a query without consulting the exact-match response cache; returns (answer, path)"""
+    state = AnswerState(query)
+    final_answer, path = prepare_answer(state)
+    if final_answer is None:
+        final_answer, path = answer_from_state(state)
+    state.record(path)
+    return final_answer, path
+
+def semantic_lookup(state: AnswerState):
+    """
+    The semantic cache stage; returns (answer, embedding) as
+    semantic_cache.lookup() does. Questions the lexical fast path settles
+    skip it, since looking them up would run the encoder they otherwise
+    never need.
+    """
+    if not semantic_cache.enabled or state.fast_path:
+        return None, None
+    embedding = state.embedding
+    with span("semantic_cache"):
+        return semantic_cache.lookup(state.query, state.section, embedding)
+
+def answer_from_state(state: AnswerState):
+    """The LLM part of answer_uncached(): semantic cache, then retrieve, generate and verify"""
+    # ---------- SEMANTIC CACHE ----------
+    cached_answer, embedding = semantic_lookup(state)
+    if cached_answer is not None:
+        return cached_answer, "semantic_cache"
+
+    context = state.context
+    raw_answer, path = generate_llm_answer(state.query, context)
+    final_answer = verify_answer(raw_answer, context)
+    semantic_cache.store(embedding, state.query, final_answer, state.section)
+    return final_answer, path
+
+# ---------- BATCHES ----------
+def prepare_batch(queries):
+    """
+    Everything in answering a batch of questions that does not need an LLM.
+
+    Returns, per question, (answer, path) or a BatchJob for
+    finish_batch_item(). Only the questions left for an LLM are retrieved;
+    those that need dense retrieval share one encode() call and one FAISS
+    search per section.
+    """
+    results = [None] * len(queries)
+    pending = []
+    for i, query in enumerate(queries):
+        cached = response_cache.get_entry(query)
+        if cached is not None:
+            results[i] = cached
+            continue
+        state = AnswerState(query)
+        final_answer, path = prepare_answer(state)
+        if final_answer is not None:
+            response_cache.put(query, final_answer, path)
+            state.record(path)
+            results[i] = (final_answer, path)
+        else:
+            pending.append((i, state))
+
+    if pending:
+        states = [state for _, state in pending]
+        # Also embeds every question the semantic cache will look up (those off the lexical fast path)
+        retrieve_stage(states)
+        for i, state in pending:
+            results[i] = BatchJob(state.query, state.context, state._embedding, state)
+    return results
+
+def finish_batch_item(job):
+    """Answer a batch question that needs Gemini or the local model; returns (answer, path)"""
+    state = job.state or AnswerState(job.query, job.context, job.embedding)
+    final_answer, path = answer_from_state(state)
+    state.record(path)
+    response_cache.put(job.query, final_answer, path)
+    return final_answer, path
+
+def generate_llm_answer(query: str, context: str):
+    """
+    The generate stage: Gemini, falling back to the local model when it fails
+    or gives an unusable answer. Returns (unverified answer, path).
+    """
     # ---------- GEMINI PRIMARY ----------
     if USE_GEMINI:
         try:
-            gemini_response = gemini_answer(query, context)
+            with span("gemini"), llm_call("gemini"):
+                gemini_response = gemini_answer(query, context)
 
             if is_valid_gemini_answer(gemini_response, query):
-                # Enforce hallucination safety one last time
-                return enforce_no_hallucination(gemini_response, context)
+                return gemini_response, "gemini"
+
+        except Exception as e:
+            print(f"[Gemini Error] {e}")
 
+    # ---------- RAG FALLBACK (TRUSTED) ----------
+    with span("qwen"), llm_call("local"):
+        return local_model.get().generate_answer(context, query), "local"
+
+def verify_answer(answer: str, context: str) -> str:
+    """The verify stage: enforce hallucination safety against the retrieved context"""
+    with span("verify"):
+        return enforce_no_hallucination(answer, context)
+
+def stream_answer(query: str):
+    """
+    Stream the answer to a query as a sequence of events.
+
+    Refusals and hard-locked answers are sent as a single "answer" event.
+    Gemini and local model answers are sent as "token" events while they
+    are generated. Once a stream finishes it goes through the same checks
+    as answer(); if the checked text differs, a "retract" event follows
+    whose text replaces everything streamed so far (an empty text means
+    the tokens that follow replace it). The last event is "path", the
+    answer path for metrics; it is not sent to the client.
+    """
+    cached = response_cache.get_entry(query)
+    if cached is not None:
+        yield {"event": "answer", "text": cached[0]}
+        yield {"event": "path", "path": cached[1]}
+        return
+
+    state = AnswerState(query)
+    final_answer, path = prepare_answer(state)
+    if final_answer is not None:
+        response_cache.put(query, final_answer, path)
+        state.record(path)
+        yield {"event": "answer", "text": final_answer}
+        yield {"event": "path", "path": path}
+        return
+
+    cached_answer, embedding = semantic_lookup(state)
+    if cached_answer is not None:
+        response_cache.put(query, cached_answer, "semantic_cache")
+        state.record("semantic_cache")
+        yield {"event": "answer", "text": cached_answer}
+        yield {"event": "path", "path": "semantic_cache"}
+        return
+
+    for event in stream_llm_answer(query, state.context):
+        if event["event"] == "final":
+            semantic_cache.store(embedding, query, event["text"], state.section)
+            response_cache.put(query, event["text"], event["path"])
+            state.record(event["path"])
+            yield {"event": "path", "path": event["path"]}
+        else:
+            yield event
+
+def stream_llm_answer(query: str, context: str):
+    """Streaming counterpart of generate_llm_answer(), ending with a "final" event carrying the checked answer and its path"""
+    # ---------- GEMINI PRIMARY ----------
+    if USE_GEMINI:
+        parts = []
+        try:
+            with llm_call("gemini"):
+                for text in stream_gemini(query, context):
+                    parts.append(text)
+                    yield {"event": "token", "text": text}
         except Exception as e:
             print(f"[Gemini Error] {e}")
 
+        gemini_response = "".join(parts).strip()
+        if parts and is_valid_gemini_answer(gemini_response, query):
+            checked = verify_answer(gemini_response, context)
+            if checked != gemini_response:
+                yield {"event": "retract", "text": checked}
+            yield {"event": "final", "text": checked, "path": "gemini"}
+            return
+
+        # Discard the rejected Gemini tokens before falling back
+        if parts:
+            yield {"event": "retract", "text": ""}
+
     # ---------- RAG FALLBACK (TRUSTED) ----------
-    raw_answer = generate_answer(context, query)
-    return enforce_no_hallucination(raw_answer, context)
+    parts = []
+    qwen = local_model.get()
+    with llm_call("local"):
+        for text in qwen.stream_answer(context, query):
+            parts.append(text)
+            yield {"event": "token", "text": text}
+
+    streamed = "".join(parts).strip()
+    # A rejected question is answered as generate_answer() answers it, without post-processing
+    answer = streamed if streamed == qwen.REJECTION_RESPONSE else qwen.postprocess_answer(streamed, query)
+    checked = verify_answer(answer, context)
+    if checked != streamed:
+        yield {"event": "retract", "text": checked}
+    yield {"event": "final", "text": checked, "path": "local"}
+
+# ---------- WARMUP ----------
+def warmup_steps():
+    """Steps of the optional background warmup: one embedding, the indexes and one local generation"""
+    return [
+        lambda: encode(["What is Mayank's current role?"]),
+        faiss_index.get,
+        bm25_index.get,
+        lambda: local_model.get().generate_answer("Role: AI Engineer", "What is Mayank's current role?"),
+    ]
 
 # ---------- DIRECT ACCESS FUNCTIONS ----------
 def get_all_education() -> str:
@@ -0,0 +1,52 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+
+class SectionIndex:
+    """
+    Exact nearest-neighbour search over the whole corpus or one section.
+
+    Wraps the flat FAISS index written by ingest.py with one flat sub-index
+    per section (same metric, vectors copied out of the main index), so a
+    section-restricted search only scans that section and returns its k
+    nearest documents, never documents from other sections. Results are
+    FAISS-style (distances, ids) with global document ids (positions in
+    texts.json), padded with -1 when the section has fewer than k documents.
+    """
+
+    def __init__(self, index, sections: Sequence[str]):
+        if index.ntotal != len(sections):
+            raise ValueError(f"Index has {index.ntotal} vectors for {len(sections)} documents; re-run ingest.py")
+        self.index = index
+        vectors = index.reconstruct_n(0, index.ntotal)
+        labels = np.asarray(sections)
+
+        self.ids: Dict[str, np.ndarray] = {}
+        self.sub_indexes = {}
+        for section in dict.fromkeys(sections):
+            ids = np.flatnonzero(labels == section).astype("int64")
+            sub_index = faiss.IndexFlat(index.d, index.metric_type)
+            sub_index.add(vectors[ids])
+            self.ids[section] = ids
+            self.sub_indexes[section] = sub_index
+
+    def search(self, embeddings: np.ndarray, k: int, section: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(distances, ids) of the k nearest documents per row, within `section` if it has any documents"""
+        if section not in self.sub_indexes:
+            return self.index.search(embeddings, k)
+        distances, local = self.sub_indexes[section].search(embeddings, k)
+        return distances, np.where(local >= 0, self.ids[section][np.maximum(local, 0)], -1)
+
+    def search_many(self, embeddings: np.ndarray, k: int,
+                    sections: List[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+        """search() for a batch where every row has its own section; one FAISS call per distinct section"""
+        distances = np.full((len(sections), k), np.inf, dtype="float32")
+        indices = np.full((len(sections), k), -1, dtype="int64")
+        rows_by_section = {}
+        for row, section in enumerate(sections):
+            rows_by_section.setdefault(section, []).append(row)
+        for section, rows in rows_by_section.items():
+            distances[rows], indices[rows] = self.search(embeddings[rows], k, section)
+        return distances, indices
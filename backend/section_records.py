@@ -0,0 +1,281 @@
+"""
+Portfolio sections as typed records, built once when texts.json is loaded.
+
+ingest.py stores the structured fields of every document next to its text.
+The records are built from those fields (or, for a texts.json written before
+the fields existed, by parsing the "Key: value" lines of the text), sorted by
+date once, and the fixed section responses are rendered up front so the
+extractors in rag.py only look them up.
+"""
+import re
+from typing import Dict, List, Optional
+
+NOT_AVAILABLE = "{} information is not available in Mayank's portfolio."
+
+# Text label -> field name, for documents without structured fields
+LABELS = {
+    "profile": {
+        "Name": "name", "Title": "title", "Location": "location", "Bio": "bio",
+        "Availability": "availability", "Focus Areas": "focus",
+        "Languages Spoken": "languages", "Interests": "interests"
+    },
+    "experience": {
+        "Role": "role", "Company": "company", "Period": "period", "Description": "description",
+        "Achievements": "achievements", "Technologies": "technologies"
+    },
+    "education": {"Degree": "degree", "Institution": "institution", "Years": "years"},
+    "certifications": {"Certification": "certification"},
+    "awards": {"Award Title": "title", "Description": "description"},
+    "projects": {
+        "Project Name": "name", "Description": "description", "Features": "features",
+        "Technologies": "technologies", "Role": "role", "Timeline": "timeline"
+    }
+}
+
+# Keywords that ask about one project, matched against the question and the project name
+SPECIFIC_PROJECTS = {
+    "phishguard": ["phishguard", "phishing", "url detector"],
+    "yogar": ["yogar", "yoga", "augmented reality", "ar yoga"],
+    "part number": ["part number", "vision transformer", "machine vision"]
+}
+
+
+def _text(value) -> str:
+    """Field value as it appears in the document text"""
+    if isinstance(value, list):
+        return ", ".join(value)
+    return (value or "").strip()
+
+
+def parse_fields(section: str, content: str) -> dict:
+    """Recover the fields of a document from its "Key: value" lines"""
+    if section == "skills":
+        categories = {}
+        for line in content.split("\n"):
+            label, sep, value = line.strip().partition(":")
+            if sep and not line.startswith("["):
+                categories[label] = value.strip()
+        return {"categories": categories}
+
+    labels = LABELS.get(section, {})
+    fields = {}
+    for line in content.split("\n"):
+        label, sep, value = line.strip().partition(":")
+        if sep and label in labels and labels[label] not in fields:
+            fields[labels[label]] = value.strip()
+    return fields
+
+
+def document_fields(doc: dict) -> dict:
+    return doc.get("fields") or parse_fields(doc["section"], doc["content"])
+
+
+# ---------- RECORDS ----------
+class Education:
+    __slots__ = ("degree", "institution", "years", "start_year")
+
+    def __init__(self, fields: dict):
+        self.degree = _text(fields.get("degree")).replace("[EDUCATION]", "").strip()
+        self.institution = _text(fields.get("institution"))
+        self.years = _text(fields.get("years"))
+        # First year of e.g. "2023 – 2026"
+        try:
+            self.start_year = int(self.years.split("–")[0].strip())
+        except ValueError:
+            self.start_year = 0
+
+
+class Experience:
+    __slots__ = ("role", "company", "period", "technologies", "start_year")
+
+    def __init__(self, fields: dict):
+        self.role = _text(fields.get("role")).replace("[EXPERIENCE]", "").strip()
+        self.company = _text(fields.get("company"))
+        self.period = _text(fields.get("period"))
+        self.technologies = _text(fields.get("technologies"))
+        # First year of e.g. "January 2026 – Present"
+        match = re.search(r"\d{4}", self.period)
+        self.start_year = int(match.group()) if match else 0
+
+
+class Project:
+    __slots__ = ("name", "description", "features", "technologies", "role", "timeline")
+
+    def __init__(self, fields: dict):
+        self.name = _text(fields.get("name")).replace("[PROJECT]", "").strip()
+        self.description = _text(fields.get("description"))
+        self.features = _text(fields.get("features"))
+        self.technologies = _text(fields.get("technologies"))
+        self.role = _text(fields.get("role"))
+        self.timeline = _text(fields.get("timeline"))
+
+
+class Award:
+    __slots__ = ("title", "description")
+
+    def __init__(self, fields: dict):
+        self.title = _text(fields.get("title"))
+        self.description = _text(fields.get("description"))
+
+
+# ---------- RENDERING ----------
+def render_education(entries: List[Education]) -> str:
+    if not entries:
+        return NOT_AVAILABLE.format("Education")
+    response = ["Mayank's Education:"]
+    for edu in entries:
+        response.append(f"• {edu.degree} at {edu.institution} ({edu.years})")
+    return "\n".join(response)
+
+
+def render_experience(entries: List[Experience]) -> str:
+    if not entries:
+        return NOT_AVAILABLE.format("Experience")
+    response = ["Mayank's Work Experience:"]
+    for exp in entries:
+        response.append(f"\n{exp.role}")
+        response.append(f"  Company: {exp.company}")
+        response.append(f"  Period: {exp.period}")
+        if exp.technologies:
+            response.append(f"  Technologies: {exp.technologies}")
+    return "\n".join(response)
+
+
+def render_projects(entries: List[Project]) -> str:
+    if not entries:
+        return NOT_AVAILABLE.format("Project")
+    response = ["Mayank's Projects:"]
+    for proj in entries:
+        response.append(f"\n{proj.name}")
+        if proj.description:
+            response.append(f"  Description: {proj.description}")
+        if proj.technologies:
+            response.append(f"  Technologies: {proj.technologies}")
+        if proj.role:
+            response.append(f"  Role: {proj.role}")
+        if proj.timeline:
+            response.append(f"  Timeline: {proj.timeline}")
+    return "\n".join(response)
+
+
+def render_project(proj: Project) -> str:
+    response = [f"Mayank's Project: {proj.name}"]
+    for label, value in (("Description", proj.description), ("Features", proj.features),
+                         ("Technologies", proj.technologies), ("Role", proj.role),
+                         ("Timeline", proj.timeline)):
+        if value:
+            response.append(f"\n{label}: {value}")
+    return "\n".join(response)
+
+
+def render_awards(entries: List[Award]) -> str:
+    if not entries:
+        return NOT_AVAILABLE.format("Awards")
+    response = ["Mayank's Awards:"]
+    for award in entries:
+        response.append(f"\n• {award.title}")
+        if award.description:
+            response.append(f"  {award.description}")
+    return "\n".join(response)
+
+
+def render_certifications(certifications: List[str]) -> str:
+    if not certifications:
+        return NOT_AVAILABLE.format("Certifications")
+    return "\n".join(["Mayank's Certifications:"] + [f"• {cert}" for cert in certifications])
+
+
+def render_skills(lines: List[str]) -> str:
+    if not lines:
+        return NOT_AVAILABLE.format("Skills")
+    return "\n".join(["Mayank's Technical Skills:"] + [f"• {line}" for line in lines])
+
+
+# ---------- SECTIONS ----------
+class SectionRecords:
+    """Typed records and pre-rendered responses for every portfolio section"""
+
+    def __init__(self, documents: List[dict]):
+        self.documents: Dict[str, List[dict]] = {}
+        for doc in documents:
+            self.documents.setdefault(doc["section"], []).append(doc)
+
+        fields = {section: [document_fields(doc) for doc in docs] for section, docs in self.documents.items()}
+
+        # Most recent first; sort() is stable, so equal years keep the document order
+        self.education = [Education(f) for f in fields.get("education", []) if f.get("degree")]
+        self.education.sort(key=lambda edu: edu.start_year, reverse=True)
+        self.experience = [Experience(f) for f in fields.get("experience", []) if f.get("role")]
+        self.experience.sort(key=lambda exp: exp.start_year, reverse=True)
+
+        self.projects = [Project(f) for f in fields.get("projects", []) if f.get("name")]
+        self.awards = [Award(f) for f in fields.get("awards", []) if f.get("title")]
+        self.certifications = [_text(f["certification"]) for f in fields.get("certifications", []) if f.get("certification")]
+
+        # "Label: skills" lines of the first skills document
+        skills = fields.get("skills", [{}])[0].get("categories", {})
+        self.skill_lines = [f"{label}: {_text(value)}" for label, value in skills.items()]
+        self.ai_skills = [s.strip() for s in _text(skills.get("AI & ML", "")).split(",")] if "AI & ML" in skills else []
+
+        profile_docs = self.documents.get("profile", [])
+        self.profile_text = profile_docs[0]["content"] if profile_docs else None
+        self.languages = _text(fields["profile"][0].get("languages")) if profile_docs else ""
+
+        # Projects whose text mentions one of the AI & ML skills
+        self.ai_projects = [
+            doc["content"] for doc in self.documents.get("projects", [])
+            if any(skill.lower() in doc["content"].lower() for skill in self.ai_skills)
+        ]
+
+        self.responses = self._render()
+
+        # (question keywords, response) for questions about one project
+        self.project_responses = []
+        for keywords in SPECIFIC_PROJECTS.values():
+            for proj in self.projects:
+                if any(keyword in proj.name.lower() for keyword in keywords):
+                    self.project_responses.append((keywords, render_project(proj)))
+                    break
+
+    def _render(self) -> Dict[str, str]:
+        responses = {
+            "education": render_education(self.education),
+            "experience": render_experience(self.experience),
+            "projects": render_projects(self.projects),
+            "awards": render_awards(self.awards),
+            "certifications": render_certifications(self.certifications),
+            "skills": render_skills(self.skill_lines),
+            "profile": (f"Mayank's Profile:\n\n{self.profile_text}" if self.profile_text is not None
+                        else NOT_AVAILABLE.format("Profile")),
+            "languages": (f"Mayank speaks: {self.languages}" if self.languages
+                          else NOT_AVAILABLE.format("Language"))
+        }
+
+        # Education, experience, certifications and a skills summary
+        parts = [responses[section] for section, marker in (("education", "Education:"),
+                                                            ("experience", "Experience:"),
+                                                            ("certifications", "Certifications:"))
+                 if marker in responses[section]]
+        expertise = {"AI & ML:": "AI/ML technologies", "Development:": "Full-stack development",
+                     "Backend & Databases:": "Backend systems & databases"}
+        key_skills = []
+        for line in self.skill_lines:
+            for marker, summary in expertise.items():
+                if marker in line:
+                    key_skills.append(summary)
+                    break
+        if key_skills:
+            parts.append(f"Key Expertise: {', '.join(key_skills)}")
+        responses["comprehensive"] = (
+            "\n\n".join(["Mayank's Background Summary:"] + parts) if parts
+            else "Credential information is not available in Mayank's portfolio."
+        )
+        return responses
+
+    def project_response(self, query: str) -> Optional[str]:
+        """The detailed response for a question about one project, if it names one"""
+        query_lower = query.lower() if query else ""
+        for keywords, response in self.project_responses:
+            if any(keyword in query_lower for keyword in keywords):
+                return response
+        return None
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Callable, List
+
+# Built-in queries of GET /test
+DEFAULT_QUERIES = [
+    "What is Mayank's education?",
+    "Tell me about Mayank's experience",
+    "Does Mayank speak German?",
+    "What projects has Mayank worked on?",
+    "What skills does Mayank have?"
+]
+
+# GET /test?suite=full runs the queries in this file: a JSON list of questions
+# or of {"query": ..., "expect": [...]} where one of the expected strings has
+# to appear in the answer
+TEST_SUITE_FILE = os.getenv("TEST_SUITE_FILE", "data/self_test_queries.json")
+TEST_CONCURRENCY = int(os.getenv("TEST_CONCURRENCY", "4"))
+TEST_TIMEOUT = float(os.getenv("TEST_TIMEOUT", "30"))
+
+
+def load_suite(path: str = TEST_SUITE_FILE) -> List[dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        items = json.load(f)
+    return [item if isinstance(item, dict) else {"query": item} for item in items]
+
+
+def check_answer(item: dict, result: str) -> str:
+    """PASS / FAIL against the expected strings, else the old heuristics"""
+    text = result.lower()
+    if item.get("expect"):
+        return "PASS" if any(e.lower() in text for e in item["expect"]) else "FAIL: expected text missing"
+    if "not available" in text and "german" not in item["query"].lower():
+        return "WARNING: Missing data"
+    if "error" in text:
+        return "ERROR"
+    return "PASS"
+
+
+async def run_suite(items: List[dict], answer_with_path: Callable, concurrency: int = TEST_CONCURRENCY,
+                    timeout: float = TEST_TIMEOUT) -> dict:
+    """
+    Answer the queries concurrently, at most `concurrency` at a time and each
+    within `timeout` seconds. `answer_with_path` is an async (answer, path)
+    function. A timed-out query is reported as TIMEOUT; its worker thread
+    finishes in the background.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def run_one(item):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result, path = await asyncio.wait_for(answer_with_path(item["query"]), timeout)
+            except asyncio.TimeoutError:
+                return {"query": item["query"], "status": "TIMEOUT", "latency_seconds": round(time.perf_counter() - start, 3)}
+            except Exception as e:
+                return {"query": item["query"], "status": "ERROR", "error": str(e),
+                        "latency_seconds": round(time.perf_counter() - start, 3)}
+            result = str(result)
+            return {
+                "query": item["query"],
+                "result_preview": result[:150] + "..." if len(result) > 150 else result,
+                "status": check_answer(item, result),
+                "path": path,
+                "length": len(result),
+                "latency_seconds": round(time.perf_counter() - start, 3)
+            }
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_one(item) for item in items))
+    wall = time.perf_counter() - start
+
+    latencies = [r["latency_seconds"] for r in results]
+    statuses = [r["status"].split(":")[0] for r in results]
+    paths = {}
+    for r in results:
+        if "path" in r:
+            paths[r["path"]] = paths.get(r["path"], 0) + 1
+
+    return {
+        "tests": results,
+        "summary": {
+            "total": len(results),
+            "passed": statuses.count("PASS"),
+            "failed": len(results) - statuses.count("PASS"),
+            "by_status": {s: statuses.count(s) for s in sorted(set(statuses))},
+            "by_path": paths,
+            "wall_seconds": round(wall, 3),
+            "sum_latency_seconds": round(sum(latencies), 3),
+            "p50_latency_seconds": round(statistics.median(latencies), 3) if latencies else None,
+            "max_latency_seconds": max(latencies) if latencies else None,
+            "concurrency": concurrency,
+            "timeout_seconds": timeout
+        }
+    }
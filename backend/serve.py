@@ -0,0 +1,172 @@
+# serve.py
+# Multi-worker launcher that loads the read-only models and indexes once and
+# forks the uvicorn workers from that process, so the workers share the
+# weight pages copy-on-write instead of each holding its own copy.
+#
+#   python serve.py                      # SERVE_WORKERS workers on PORT
+#   kill -USR1 <launcher pid>            # print per-worker unique/shared memory
+#
+# Threads do not survive fork(), so nothing the workers share may start one in
+# the launcher: the Gemini client's httpx event loop thread, the AnswerPool
+# workers, the DeepCheck schedule and the Qwen batching loop all start lazily
+# (on first use or in the app's startup hook), and main() refuses to fork if
+# preloading started any thread anyway.
+import gc
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "2"))
+SERVE_PRELOAD = [name.strip() for name in os.getenv("SERVE_PRELOAD", "encoder,faiss_index,bm25_index,qwen").split(",") if name.strip()]
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", 7860))
+
+
+# ---------- MEMORY REPORT ----------
+def smaps_rollup(pid: int) -> dict:
+    """Memory of a process in kB from /proc/<pid>/smaps_rollup (Linux)"""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+        "unique": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+def memory_report(pids: dict) -> str:
+    """Table of RSS split into unique (private) and shared pages; `pids` maps a label to a pid"""
+    lines = [f"{'process':<14} {'pid':>8} {'rss MB':>9} {'unique MB':>10} {'shared MB':>10} {'pss MB':>9}"]
+    total_pss = 0
+    for label, pid in pids.items():
+        try:
+            m = smaps_rollup(pid)
+        except OSError:
+            continue
+        total_pss += m["pss"]
+        lines.append(f"{label:<14} {pid:>8} {m['rss'] / 1024:>9.1f} {m['unique'] / 1024:>10.1f} "
+                     f"{m['shared'] / 1024:>10.1f} {m['pss'] / 1024:>9.1f}")
+    lines.append(f"{'total (pss)':<14} {'':>8} {'':>9} {'':>10} {'':>10} {total_pss / 1024:>9.1f}")
+    return "\n".join(lines)
+
+
+# ---------- PRELOAD ----------
+def preload():
+    """Import the app and load the shared components in this (the parent) process"""
+    # Collections before the fork would only fragment the heap; the objects
+    # that exist now are frozen right before forking
+    gc.disable()
+
+    try:
+        import torch
+        # One intra-op thread while loading: an OpenMP thread pool started
+        # here would not survive the fork
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+
+    start = time.perf_counter()
+    import app
+    import components
+    loaded = components.preload(SERVE_PRELOAD)
+    print(f"Preloaded {', '.join(loaded) or 'nothing'} in {time.perf_counter() - start:.1f}s")
+    return app
+
+
+def started_threads() -> list:
+    """Names of the Python threads running besides the main one"""
+    return [thread.name for thread in threading.enumerate() if thread is not threading.main_thread()]
+
+
+def run_worker(app_module, sock: socket.socket, threads: int):
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    gc.enable()
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app_module.app, log_level="info"))
+    server.run(sockets=[sock])
+    os._exit(0)
+
+
+def main():
+    app_module = preload()
+    # A forked worker would inherit these threads' locks and state without the threads
+    running = started_threads()
+    if running:
+        print(f"Preloading started threads ({', '.join(running)}); they would not survive the fork, not starting workers")
+        sys.exit(1)
+    threads = max(1, (os.cpu_count() or 1) // SERVE_WORKERS)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((HOST, PORT))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    # Keep the garbage collector away from everything loaded so far, so the
+    # workers do not write to (and copy) those pages when they collect
+    gc.freeze()
+
+    workers = {}
+    stopping = False
+
+    def spawn(number: int):
+        pid = os.fork()
+        if pid == 0:
+            run_worker(app_module, sock, threads)
+        workers[pid] = number
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def report(signum, frame):
+        pids = {"launcher": os.getpid()}
+        pids.update({f"worker {number}": pid for pid, number in sorted(workers.items(), key=lambda item: item[1])})
+        print(memory_report(pids), flush=True)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, report)
+
+    for number in range(SERVE_WORKERS):
+        spawn(number)
+    print(f"Serving on {HOST}:{PORT} with {SERVE_WORKERS} workers ({threads} torch threads each), launcher pid {os.getpid()}")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except InterruptedError:
+            continue
+        except ChildProcessError:
+            break
+        number = workers.pop(pid, None)
+        if number is not None and not stopping:
+            print(f"Worker {number} (pid {pid}) exited with status {status}, restarting")
+            time.sleep(1)
+            spawn(number)
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import threading
+
+
+class StageStats:
+    """
+    Per answer path: how many questions ran the retrieve stage and how many
+    encoder passes and FAISS searches they made. "avoided" counts against
+    retrieving every question up front (one encoder pass and one FAISS
+    search each), which is what answer() did before the stages were lazy.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = {}
+
+    def record(self, path: str, retrieved: bool, encoder_calls: int, faiss_searches: int):
+        with self._lock:
+            counts = self._paths.setdefault(path, {"answers": 0, "retrievals": 0, "encoder_calls": 0, "faiss_searches": 0})
+            counts["answers"] += 1
+            counts["retrievals"] += int(retrieved)
+            counts["encoder_calls"] += encoder_calls
+            counts["faiss_searches"] += faiss_searches
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                path: dict(counts,
+                           encoder_calls_avoided=counts["answers"] - counts["encoder_calls"],
+                           faiss_searches_avoided=counts["answers"] - counts["faiss_searches"])
+                for path, counts in self._paths.items()
+            }
@@ -0,0 +1,94 @@
+# test_answer_checks.py
+# Checks that the blocking and streaming answer paths apply the same checks
+# to an LLM answer: the gemini pipeline's validate_answer() rewrites on /chat
+# and /chat/stream alike, and the rag pipeline's local model rejection is
+# returned unchanged by both. Gemini is replaced by a fake client and no
+# model is loaded. Exits non-zero on a failure.
+#
+#   python test_answer_checks.py
+import sys
+from types import SimpleNamespace
+
+import gemini_portfolio
+import model
+import rag
+from gemini_client import GeminiResponse
+
+
+# ---------- FAKES ----------
+class FakeGemini:
+    """Answers every prompt with `text`, in one response or as word chunks"""
+
+    def __init__(self):
+        self.text = ""
+
+    def generate_content(self, model_name, prompt, **kwargs):
+        return GeminiResponse({"candidates": [{"content": {"parts": [{"text": self.text}]}}]})
+
+    def stream_content(self, model_name, prompt, **kwargs):
+        words = self.text.split(" ")
+        return [SimpleNamespace(text=word + " " * (i < len(words) - 1)) for i, word in enumerate(words)]
+
+
+fake = FakeGemini()
+gemini_portfolio.gemini_client.get = lambda: fake
+gemini_portfolio.semantic_cache.enabled = False
+rag.local_model.get = lambda: model
+rag.semantic_cache.enabled = False
+rag.USE_GEMINI = False
+
+
+# ---------- CHECKS ----------
+failures = []
+
+
+def check(name: str, condition: bool, detail=""):
+    print(f"{'ok  ' if condition else 'FAIL'} {name} {detail}")
+    if not condition:
+        failures.append(name)
+
+
+def streamed_text(events) -> str:
+    """The text a client ends up showing for a stream of events"""
+    text = ""
+    for event in events:
+        if event["event"] == "token":
+            text += event["text"]
+        elif event["event"] in ("answer", "retract"):
+            text = event["text"]
+    return text
+
+
+def main():
+    cases = [
+        ("Summarise what makes him a strong engineer", "Mayank combines AI research with shipped products.",
+         "Mayank combines AI research with shipped products."),
+        ("Summarise how he communicates", "Mayank is fluent in German and English.",
+         "Mayank's German proficiency: Intermediate (A2 certified)"),
+        ("Summarise where he studied", "Mayank studied at IIT Bombay.",
+         gemini_portfolio.NOT_AVAILABLE_RESPONSE),
+    ]
+    for question, gemini_text, expected in cases:
+        fake.text = gemini_text
+        gemini_portfolio.response_cache.clear()
+        blocking, path = gemini_portfolio.answer_uncached(question)
+        gemini_portfolio.response_cache.clear()
+        streaming = streamed_text(gemini_portfolio.stream_answer(question))
+        check(f"gemini: {gemini_text!r}", path == "gemini" and blocking == streaming == expected,
+              f"/chat {blocking!r}, /chat/stream {streaming!r}")
+
+    # A question the local model refuses without generating
+    question = "Summarise the plot of a famous novel"
+    context = "Mayank is an AI engineer."
+    blocking = rag.verify_answer(rag.generate_llm_answer(question, context)[0], context)
+    events = list(rag.stream_llm_answer(question, context))
+    streaming = streamed_text(events)
+    check("rag: rejection", blocking == streaming == events[-1]["text"] == model.REJECTION_RESPONSE,
+          f"/chat {blocking!r}, /chat/stream {streaming!r}")
+
+    print(f"\n{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
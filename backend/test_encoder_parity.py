@@ -0,0 +1,99 @@
+# test_encoder_parity.py
+# Checks that the int8 / ONNX encoders retrieve the same documents as the
+# PyTorch encoder that built portfolio.index, and that re-ingesting with
+# them keeps the same ranking. Exits non-zero on a failure.
+#
+#   python test_encoder_parity.py                 # int8 onnx onnx-int8
+#   python test_encoder_parity.py onnx-int8       # one backend
+import json
+import sys
+
+import faiss
+import numpy as np
+
+from encoder import load_encoder
+
+CANDIDATES = sys.argv[1:] or ["int8", "onnx", "onnx-int8"]
+K = 5
+MIN_TOP1_AGREEMENT = 0.9
+MIN_TOPK_OVERLAP = 0.9
+
+QUESTIONS = [
+    "What is Mayank's education?",
+    "What is his project YogAR about?",
+    "How does Mayank's AI experience connect to his projects?",
+    "Tell me about his experience and education",
+    "What is the Part Number Recognition system project?",
+    "Does Mayank speak German?",
+    "What did Mayank do at GlideCloud?",
+    "Which technologies did Mayank use in PhishGuard?",
+    "What was Mayank's role at CSI VIT Pune?",
+    "What certifications does Mayank have?",
+    "What awards has Mayank won?",
+    "What are his machine learning skills?",
+    "Where is Mayank located?",
+    "Is Mayank available for hire?",
+    "Which databases has he worked with?",
+    "What frontend frameworks does Mayank know?",
+]
+
+index = faiss.read_index("portfolio.index")
+with open("texts.json", "r", encoding="utf-8") as f:
+    documents = json.load(f)
+stored = index.reconstruct_n(0, index.ntotal)
+texts = [doc["content"] for doc in documents]
+
+
+def search(search_index, queries):
+    _, indices = search_index.search(np.asarray(queries, dtype="float32"), K)
+    return indices
+
+
+def agreement(reference, candidate):
+    top1 = float(np.mean(reference[:, 0] == candidate[:, 0]))
+    overlap = float(np.mean([len(set(r) & set(c)) / K for r, c in zip(reference, candidate)]))
+    return top1, overlap
+
+
+print("Encoder parity against portfolio.index")
+print("=" * 80)
+
+reference_encoder = load_encoder("torch")
+reference_docs = reference_encoder.encode(texts)
+drift = float(np.abs(reference_docs - stored).max())
+print(f"torch encoder vs stored index vectors: max abs difference {drift:.2e}")
+if drift > 1e-3:
+    print("WARNING: portfolio.index was not built by the current torch encoder; re-run ingest.py")
+reference_queries = reference_encoder.encode(QUESTIONS)
+reference = search(index, reference_queries)
+
+# What retrieval looks like after re-running ingest.py with the torch encoder
+reference_index = faiss.IndexFlatL2(reference_docs.shape[1])
+reference_index.add(np.asarray(reference_docs, dtype="float32"))
+reference_reindexed = search(reference_index, reference_queries)
+
+failed = False
+# doc cos: lowest cosine between a document embedded by the candidate and by torch
+print(f"\n{'backend':<10} {'doc cos':>8} {'top-1':>7} {f'top-{K}':>7} {'reindexed top-1':>16}  result")
+for backend in CANDIDATES:
+    encoder = load_encoder(backend)
+    docs = np.asarray(encoder.encode(texts), dtype="float32")
+    doc_cosine = float(np.min(np.sum(docs * reference_docs, axis=1)))
+
+    # Candidate queries against the existing index
+    queries = encoder.encode(QUESTIONS)
+    top1, overlap = agreement(reference, search(index, queries))
+
+    # Candidate queries against an index rebuilt by the candidate (after re-ingest)
+    rebuilt = faiss.IndexFlatL2(docs.shape[1])
+    rebuilt.add(docs)
+    reindexed_top1, _ = agreement(reference_reindexed, search(rebuilt, queries))
+
+    ok = top1 >= MIN_TOP1_AGREEMENT and overlap >= MIN_TOPK_OVERLAP
+    failed = failed or not ok
+    print(
+        f"{backend:<10} {doc_cosine:>8.4f} {top1:>7.0%} {overlap:>7.0%} {reindexed_top1:>16.0%}  "
+        f"{'PASS' if ok else 'FAIL'}"
+    )
+
+sys.exit(1 if failed else 0)
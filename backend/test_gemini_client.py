@@ -0,0 +1,261 @@
+# test_gemini_client.py
+# Checks gemini_client.GeminiClient against a local stub of the Gemini REST
+# API (no API key or network needed): connection reuse, retries on 503 but
+# not on 400, Retry-After, the deadline, the bulkhead, the circuit breaker
+# opening and closing again (also when the probe gets a malformed body or
+# is cancelled), and streaming (including a consumer that stops early).
+# Exits non-zero on a failure.
+#
+#   python test_gemini_client.py
+import asyncio
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from gemini_client import CircuitBreaker, GeminiClient, GeminiError, GeminiUnavailable
+
+
+# ---------- STUB SERVER ----------
+class Stub:
+    """
+    Answers every request with the next scripted reply (an HTTP status, or
+    "badjson" for a 200 whose body is not JSON; default 200), recording what it saw
+    """
+
+    def __init__(self):
+        self.script = []
+        self.delay = 0.0
+        self.requests = 0
+        self.ports = set()
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def reply(self):
+        with self.lock:
+            return self.script.pop(0) if self.script else 200
+
+
+def response_body(text: str) -> dict:
+    return {
+        "candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}],
+        "usageMetadata": {"promptTokenCount": 12, "candidatesTokenCount": 3}
+    }
+
+
+def make_handler(stub: Stub):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            with stub.lock:
+                stub.requests += 1
+                stub.ports.add(self.client_address[1])
+                stub.active += 1
+                stub.max_active = max(stub.max_active, stub.active)
+            try:
+                time.sleep(stub.delay)
+                status = stub.reply()
+                if status == "badjson":
+                    self.send_response(200)
+                    self.send_header("Content-Length", "8")
+                    self.end_headers()
+                    self.wfile.write(b"not json")
+                elif status != 200:
+                    payload = json.dumps({"error": {"code": status}}).encode()
+                    self.send_response(status)
+                    if status == 429:
+                        self.send_header("Retry-After", "1")
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                elif "alt=sse" in self.path:
+                    self.stream(body)
+                else:
+                    prompt = body["contents"][0]["parts"][0]["text"]
+                    payload = json.dumps(response_body(f"echo: {prompt}")).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up at its deadline
+                pass
+            finally:
+                with stub.lock:
+                    stub.active -= 1
+
+        def stream(self, body):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            for word in ["one ", "two ", "three"]:
+                chunk = response_body(word)
+                if word != "three":
+                    del chunk["usageMetadata"]
+                self.wfile.write(f"data: {json.dumps(chunk)}\r\n\r\n".encode())
+                self.wfile.flush()
+                time.sleep(0.01)
+            self.close_connection = True
+
+    return Handler
+
+
+def start_stub():
+    stub = Stub()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(stub))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return stub, f"http://127.0.0.1:{server.server_address[1]}/v1beta"
+
+
+# ---------- CHECKS ----------
+failures = []
+
+
+def check(name: str, condition: bool, detail=""):
+    print(f"{'ok  ' if condition else 'FAIL'} {name} {detail}")
+    if not condition:
+        failures.append(name)
+
+
+def raises(fn, error=GeminiError):
+    try:
+        fn()
+    except error as e:
+        return e
+    return None
+
+
+def main():
+    stub, base = start_stub()
+
+    def client(**kwargs):
+        settings = {"timeout": 2.0, "max_retries": 2, "backoff": 0.01, "max_concurrency": 4,
+                    "breaker": CircuitBreaker(failures=3, cooldown=0.5)}
+        settings.update(kwargs)
+        return GeminiClient(api_key="stub", base_url=base, **settings)
+
+    def reset():
+        while stub.active:
+            time.sleep(0.05)
+        stub.script, stub.delay, stub.requests, stub.max_active = [], 0.0, 0, 0
+        stub.ports.clear()
+
+    # Pooled connections
+    c = client()
+    texts = [c.generate_content("m", f"q{i}").text for i in range(5)]
+    check("answers", texts == [f"echo: q{i}" for i in range(5)])
+    check("one keep-alive connection for 5 calls", len(stub.ports) == 1, stub.ports)
+    check("usage metadata", c.generate_content("m", "q").usage_metadata.prompt_token_count == 12)
+
+    # Retries only on upstream errors
+    reset()
+    stub.script = [503, 503]
+    check("retried twice after 503", c.generate_content("m", "q").text == "echo: q" and stub.requests == 3, stub.requests)
+    reset()
+    stub.script = [400]
+    e = raises(lambda: c.generate_content("m", "q"))
+    check("400 is not retried", e is not None and e.status == 400 and stub.requests == 1, stub.requests)
+    reset()
+    stub.script = [503, 503, 503]
+    e = raises(lambda: c.generate_content("m", "q"))
+    check("gives up after max_retries", e is not None and e.upstream and stub.requests == 3, stub.requests)
+    reset()
+    stub.script = [429]
+    start = time.perf_counter()
+    c.generate_content("m", "q")
+    check("429 waits for Retry-After", time.perf_counter() - start >= 1.0, f"{time.perf_counter() - start:.2f}s")
+
+    # Deadline: a hung upstream releases the caller after `timeout`
+    reset()
+    stub.delay = 3.0
+    c = client(timeout=0.5, max_retries=5)
+    start = time.perf_counter()
+    e = raises(lambda: c.generate_content("m", "q"))
+    elapsed = time.perf_counter() - start
+    check("deadline covers retries", e is not None and elapsed < 0.8, f"{elapsed:.2f}s, {stub.requests} request(s)")
+
+    # Bulkhead: at most max_concurrency calls reach the upstream at once
+    reset()
+    stub.delay = 0.2
+    c = client(max_concurrency=2)
+    threads = [threading.Thread(target=c.generate_content, args=("m", "q")) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    check("bulkhead of 2", stub.max_active == 2 and stub.requests == 6, f"max active {stub.max_active}")
+    check("slots released", c.stats()["in_use"] == 0)
+
+    # Circuit breaker: opens after 3 failed calls, fails fast, probes after the cooldown
+    reset()
+    c = client(max_retries=0)
+    stub.script = [503] * 3
+    for _ in range(3):
+        raises(lambda: c.generate_content("m", "q"))
+    check("circuit opens", c.breaker.state == "open", c.breaker.state)
+    start = time.perf_counter()
+    e = raises(lambda: c.generate_content("m", "q"), GeminiUnavailable)
+    check("open circuit fails fast without a request", e is not None and stub.requests == 3
+          and time.perf_counter() - start < 0.01, f"{(time.perf_counter() - start) * 1e6:.0f} us")
+    time.sleep(0.6)
+    stub.script = [503]
+    raises(lambda: c.generate_content("m", "q"))
+    check("failed probe reopens", c.breaker.state == "open" and stub.requests == 4, c.breaker.state)
+    time.sleep(0.6)
+    check("successful probe closes", c.generate_content("m", "q").text == "echo: q" and c.breaker.state == "closed")
+    reset()
+    stub.script = [400] * 5
+    for _ in range(5):
+        raises(lambda: c.generate_content("m", "q"))
+    check("client errors do not open the circuit", c.breaker.state == "closed")
+
+    # The half-open probe always settles the breaker
+    reset()
+    stub.script = [503] * 3 + ["badjson"]
+    for _ in range(3):
+        raises(lambda: c.generate_content("m", "q"))
+    time.sleep(0.6)
+    e = raises(lambda: c.generate_content("m", "q"), ValueError)
+    check("malformed probe response reopens", e is not None and c.breaker.state == "open", c.breaker.state)
+    time.sleep(0.6)
+    stub.delay = 1.0
+    try:
+        asyncio.run(asyncio.wait_for(c.agenerate_content("m", "q"), 0.2))
+    except asyncio.TimeoutError:
+        pass
+    time.sleep(0.05)
+    stub.delay = 0.0
+    check("cancelled probe lets the next call probe", c.generate_content("m", "q").text == "echo: q"
+          and c.breaker.state == "closed", c.breaker.state)
+
+    # Streaming
+    reset()
+    c = client()
+    stream = c.stream_content("m", "q")
+    chunks = [chunk.text for chunk in stream]
+    check("stream chunks", chunks == ["one ", "two ", "three"], chunks)
+    check("stream usage", stream.usage_metadata is not None and stream.usage_metadata.candidates_token_count == 3)
+    reset()
+    stub.script = [503]
+    check("stream retried before the first chunk", "".join(chunk.text for chunk in c.stream_content("m", "q")) == "one two three"
+          and stub.requests == 2, stub.requests)
+    for chunk in c.stream_content("m", "q"):
+        break
+    check("early stop releases the slot", c.stats()["in_use"] == 0, c.stats())
+
+    print(f"\n{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# test_lexical_fast_path.py
+# Counts encoder calls in the rag pipeline: a question the lexical fast path
+# settles (a rare term with a clear BM25 winner) must be answered on every
+# route (/chat and /ask, /chat/stream, /chat/batch) without encoding the
+# query, also with the semantic cache enabled, while a question that needs
+# dense retrieval is encoded once. The local model is replaced by a fake.
+# Exits non-zero on a failure.
+#
+#   python test_lexical_fast_path.py
+import os
+import sys
+from types import SimpleNamespace
+
+os.environ.update(USE_GEMINI="false", SEMANTIC_CACHE="true", LEXICAL_FAST_PATH="true", RETRIEVAL_MODE="hybrid")
+
+import rag
+
+FAST_PATH_QUESTION = "What did Mayank use Tesseract for?"
+DENSE_QUESTION = "What motivates Mayank?"
+
+rag.local_model.get = lambda: SimpleNamespace(
+    REJECTION_RESPONSE="",
+    generate_answer=lambda context, question: "Mayank's answer.",
+    stream_answer=lambda context, question: iter(["Mayank's ", "answer."]),
+    postprocess_answer=lambda text, question: text,
+)
+
+encoded = []
+real_embed = rag.query_embeddings.embed
+
+
+def counting_embed(queries):
+    encoded.extend(queries)
+    return real_embed(queries)
+
+
+rag.query_embeddings.embed = counting_embed
+
+
+# ---------- CHECKS ----------
+failures = []
+
+
+def check(name: str, condition: bool, detail=""):
+    print(f"{'ok  ' if condition else 'FAIL'} {name} {detail}")
+    if not condition:
+        failures.append(name)
+
+
+def encoder_calls(route, question: str) -> int:
+    """Questions encoded while answering `question` from scratch"""
+    rag.response_cache.clear()
+    rag.semantic_cache.clear()
+    rag.query_embeddings.clear()
+    encoded.clear()
+    route(question)
+    return len(encoded)
+
+
+ROUTES = {
+    "/chat, /ask": rag.answer_uncached,
+    "/chat/stream": lambda question: list(rag.stream_answer(question)),
+    "/chat/batch": lambda question: [rag.finish_batch_item(job) for job in rag.prepare_batch([question])],
+}
+
+
+def main():
+    check("fast path question is settled by BM25", rag.AnswerState(FAST_PATH_QUESTION).fast_path)
+    for name, route in ROUTES.items():
+        calls = encoder_calls(route, FAST_PATH_QUESTION)
+        check(f"{name}: fast path question is not encoded", calls == 0, f"{calls} encoder call(s)")
+        calls = encoder_calls(route, DENSE_QUESTION)
+        check(f"{name}: dense question is encoded once", calls == 1, f"{calls} encoder call(s)")
+
+    print(f"\n{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
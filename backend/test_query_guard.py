@@ -0,0 +1,523 @@
+# test_query_guard.py
+# Differential check of query_guard against the keyword scans it replaced.
+# The reference functions below are verbatim copies of the previous
+# model.is_portfolio_question, rag.detect_section / is_out_of_context and
+# gemini_portfolio.is_out_of_context / format_specific_response. A generated
+# corpus of questions is run through both and every decision must match.
+# Exits non-zero on a mismatch.
+#
+#   python test_query_guard.py [number of generated questions]
+import random
+import sys
+from typing import Optional
+
+import query_guard
+from gemini_portfolio import PORTFOLIO_DATA, format_project_response, format_specific_response
+
+
+# ---------- REFERENCE: model.py ----------
+PORTFOLIO_KEYWORDS = [
+    "mayank", "portfolio", "profile", "education", "experience",
+    "skill", "project", "award", "certification", "work", "job",
+    "contact", "location", "available", "hire", "background",
+    "degree", "college", "university", "school", "study",
+    "role", "position", "company", "employ", "technical",
+    "technology", "programming", "code", "ai", "ml", 
+    "machine learning", "artificial intelligence", "develop",
+    "build", "create", "design", "system", "certificate",
+    "certified", "honor", "recognition", "language", "speak",
+    "german", "english", "hindi", "marathi", "interests",
+    "hobby", "passion", "focus", "area", "credentials",
+    "qualification", "achievement", "accomplishment"
+]
+
+def reference_is_portfolio_question(question: str) -> bool:
+    """Check if question is about the portfolio"""
+    question_lower = question.lower()
+    
+    # Check for explicit portfolio references
+    if "mayank" in question_lower or "portfolio" in question_lower:
+        return True
+    
+    # Check for portfolio keywords
+    for keyword in PORTFOLIO_KEYWORDS:
+        if keyword in question_lower:
+            return True
+    
+    # Questions starting with "what" about work/education/skills
+    if question_lower.startswith("what"):
+        what_topics = ["what does", "what is", "what are", "what was", "what were"]
+        if any(topic in question_lower for topic in what_topics):
+            # Check if it's about Mayank's attributes
+            mayank_attributes = ["his", "mayank's", "he", "him"]
+            if any(attr in question_lower for attr in mayank_attributes):
+                return True
+    
+    # Questions starting with "where", "when", "how" about Mayank
+    if question_lower.startswith(("where", "when", "how")):
+        mayank_attributes = ["his", "mayank", "he", "does mayank"]
+        if any(attr in question_lower for attr in mayank_attributes):
+            return True
+    
+    return False
+
+
+# ---------- REFERENCE: rag.py ----------
+def reference_detect_section(question: str):
+    q = question.lower()
+
+    # Keep out-of-context filtering first
+    # "AI in general" should not trigger profile section
+    if "ai in general" in q or "artificial intelligence in general" in q:
+        return None
+    
+    # "What is AI?" should not trigger any section
+    if ("what is ai" in q or "what is artificial intelligence" in q) and "mayank" not in q:
+        return None
+    
+    # "Who won" questions should not trigger any section
+    if q.startswith("who won") or q.startswith("who is the") or q.startswith("who are the"):
+        if "mayank" not in q and "his" not in q and "he" not in q:
+            return None
+
+    # ---------- COMBINATION QUERIES ----------
+    # Queries asking for multiple sections should go to comprehensive
+    if ("and" in q or "both" in q or "also" in q):
+        # Check for education + experience combinations
+        if ("education" in q and "experience" in q) or \
+           ("education" in q and "work" in q) or \
+           ("study" in q and "work" in q):
+            return "comprehensive"
+        
+        # Check for other combinations
+        sections_count = 0
+        portfolio_sections = ["education", "experience", "projects", "skills", 
+                             "background", "work", "career", "achievements"]
+        
+        for section in portfolio_sections:
+            if section in q:
+                sections_count += 1
+        
+        if sections_count >= 2:
+            return "comprehensive"
+
+    # ---------- SYNTHESIS/REASONING QUERIES ----------
+    synthesis_keywords = ["connect", "relate", "relationship", "impact", "influence", "how does", "how do"]
+    if any(keyword in q for keyword in synthesis_keywords):
+        # But ONLY if they're about Mayank's portfolio
+        if any(k in q for k in ["mayank", "his", "he", "portfolio"]):
+            return "synthesis"
+        else:
+            return None
+
+    # ---------- HARD-LOCKED SECTIONS ----------
+    # "Credentials" should go to education or a comprehensive response
+    if "credential" in q or "qualification" in q or "background" in q:
+        return "comprehensive"
+    
+    # First, check for specific spoken languages
+    spoken_languages = ["german", "english", "hindi", "marathi", "french", "spanish"]
+    if any(lang in q for lang in spoken_languages):
+        if "speak" in q or "spoken" in q or "language" in q or "know" in q or "proficiency" in q:
+            return "profile"
+    
+    # Check for programming language queries
+    if "programming" in q or "coding" in q or "code" in q:
+        return "skills"
+    
+    # Check for specific programming languages
+    programming_languages = ["python", "javascript", "java", "c++", "c#", "php", "ruby", "go", "rust", "html", "css", "sql"]
+    if any(lang in q for lang in programming_languages):
+        return "skills"
+    
+    if "language" in q:
+        # Distinguish between programming languages and spoken languages
+        if "programming" in q or "code" in q or "develop" in q or "coding" in q:
+            return "skills"
+        if "speak" in q or "spoken" in q or "talk" in q or "communicate" in q or "proficiency" in q:
+            return "profile"
+    
+    # "What does Mayank do?" should go to profile
+    if "what does" in q and ("do" in q or "work as" in q or "job" in q):
+        return "profile"
+    
+    # Profile-related queries
+    if ("available" in q or "hire" in q or "contact" in q or 
+        "where" in q or "location" in q or "interests" in q):
+        return "profile"
+    
+    if "project" in q or "built" in q or "developed" in q:
+        return "projects"
+    
+    if ("education" in q or "degree" in q or "college" in q or 
+        "school" in q or "study" in q or "academic" in q or 
+        "background" in q or "student" in q or "learn" in q):
+        return "education"
+    
+    if ("experience" in q or "work" in q or "intern" in q or 
+        "job" in q or "role" in q or "position" in q or 
+        "company" in q or "employed" in q):
+        return "experience"
+    
+    if ("skill" in q or "technical" in q or "programming" in q or 
+        "technology" in q or "expertise" in q or "proficient" in q):
+        return "skills"
+    
+    if ("award" in q or "achievement" in q or "prize" in q or 
+        "winner" in q or "recognition" in q or "honor" in q):
+        return "awards"
+    
+    if ("certification" in q or "certificate" in q or "certified" in q):
+        return "certifications"
+    
+    if ("profile" in q or "about" in q or "bio" in q or 
+        "who" in q or "introduce" in q or "background" in q or
+        "what does" in q or "tell me about" in q):
+        return "profile"
+    
+    return None
+
+def reference_rag_out_of_context(query: str) -> bool:
+    """Check if query is clearly unrelated to Mayank's portfolio"""
+    query_lower = query.lower()
+    
+    # Clearly out-of-context topics that should be rejected immediately
+    out_of_context_keywords = [
+        "weather", "cricket", "football", "sports", "movie", "music",
+        "news", "politics", "stock", "market", "recipe", "cooking",
+        "travel", "holiday", "health", "medical", "doctor",
+        "physics", "chemistry", "biology", "math", "history",
+        "world cup", "tournament", "match", "game", "player",
+        "president", "prime minister", "government", "height", "hobby", "election"
+    ]
+    
+    # FIRST: Check for specific out-of-context patterns
+    if any(keyword in query_lower for keyword in out_of_context_keywords):
+        return True
+    
+    # SECOND: Check for general knowledge questions
+    if query_lower.startswith(("tell me about ", "explain ", "what is ")):
+        # Extract the topic
+        for prefix in ["tell me about ", "explain ", "what is "]:
+            if query_lower.startswith(prefix):
+                topic = query_lower[len(prefix):].strip()
+                # Check if it's about Mayank or his portfolio
+                if any(term in topic for term in ["mayank", "his", "he", "him"]):
+                    return False  # It's about Mayank, so it's in context
+                
+                # Check if topic contains portfolio keywords
+                portfolio_terms = [
+                    "portfolio", "ai", "ml", "machine learning", "artificial intelligence",
+                    "education", "experience", "projects", "skills", "background",
+                    "work", "job", "career", "certification", "award"
+                ]
+                
+                if any(term in topic for term in portfolio_terms):
+                    return False  # It's portfolio-related
+                
+                # If no portfolio keywords, it's out of context
+                return True
+        return False
+    
+    # THIRD: Check for "who" questions that aren't about Mayank
+    if query_lower.startswith("who "):
+        # Allow "who is mayank" or "who is he" or questions about his background
+        if any(term in query_lower for term in ["mayank", "he", "his", "him", "portfolio"]):
+            return False
+        # Reject all other "who" questions
+        return True
+    
+    # FOURTH: Check for "tell me about" without Mayank reference but about portfolio
+    if query_lower.startswith("tell me about"):
+        # Check if it's about portfolio sections
+        portfolio_sections = [
+            "education", "experience", "projects", "skills", "background",
+            "work", "job", "career", "achievements", "certifications"
+        ]
+        if any(section in query_lower for section in portfolio_sections):
+            return False  # It's portfolio-related
+    
+    # FIFTH: Check for combination queries (experience AND education, etc.)
+    portfolio_combination_terms = [
+        "experience and education", "education and experience",
+        "projects and skills", "skills and projects",
+        "background and experience", "education and projects",
+        "work and education", "career and education"
+    ]
+    
+    if any(combo in query_lower for combo in portfolio_combination_terms):
+        return False  # Combination queries are in-context
+    
+    # SIXTH: Check for general questions without "Mayank" reference but about portfolio
+    portfolio_keywords = [
+        "education", "experience", "projects", "skills", "background",
+        "work", "job", "career", "achievement", "award", "certification",
+        "degree", "college", "university", "school", "study", "intern",
+        "role", "position", "company", "technology", "programming",
+        "development", "design", "ai", "ml", "machine learning"
+    ]
+    
+    # If query contains portfolio keywords, it's in context
+    if any(keyword in query_lower for keyword in portfolio_keywords):
+        # Additional check: make sure it's not asking about general topics
+        if "in general" in query_lower or "generally" in query_lower:
+            return True  # "AI in general" is out of context
+        return False  # Portfolio-related
+    
+    # Check for questions starting with portfolio-related question words
+    portfolio_question_patterns = [
+        "tell me about his", "what is his", "what are his",
+        "describe his", "explain his", "how is his"
+    ]
+    
+    if any(pattern in query_lower for pattern in portfolio_question_patterns):
+        return False  # Questions about "his" are in context
+    
+    return False  # Default: assume it's in context if not clearly out-of-context
+
+
+# ---------- REFERENCE: gemini_portfolio.py ----------
+def reference_gemini_out_of_context(query: str) -> bool:
+    """Check if query is unrelated to Mayank's portfolio"""
+    query_lower = query.lower()
+    
+    # Out-of-context topics
+    out_of_context_topics = [
+        "weather", "cricket", "football", "sports", "movie", "music",
+        "news", "politics", "stock", "market", "recipe", "cooking",
+        "travel", "holiday", "health", "medical", "doctor",
+        "physics", "chemistry", "biology", "math", "history",
+        "world cup", "tournament", "match", "game", "player",
+        "president", "prime minister", "government", "election",
+        "religion", "philosophy"
+    ]
+    
+    # Check for general knowledge questions without Mayank reference
+    if any(topic in query_lower for topic in out_of_context_topics):
+        return True
+    
+    # Check for "who is" questions not about Mayank
+    if query_lower.startswith("who is "):
+        topic = query_lower[7:].strip()
+        if not any(name in topic for name in ["mayank", "kulkarni"]):
+            return True
+    
+    # Check for "what is" questions about general topics
+    if query_lower.startswith("what is ") and "mayank" not in query_lower:
+        topic = query_lower[8:].strip()
+        # Allow if it's about portfolio-related terms
+        portfolio_terms = [
+            "ai", "ml", "machine learning", "artificial intelligence",
+            "rag", "llm", "vision transformer", "phishing",
+            "data science", "computer engineering", "diploma", "btech"
+        ]
+        if not any(term in topic for term in portfolio_terms):
+            return True
+    
+    # Check for "tell me about" without Mayank reference
+    if query_lower.startswith("tell me about "):
+        topic = query_lower[14:].strip()
+        portfolio_sections = [
+            "mayank", "his", "education", "experience", "projects",
+            "skills", "background", "work", "portfolio", "certifications",
+            "awards", "languages", "contact", "email"
+        ]
+        if not any(section in topic for section in portfolio_sections):
+            return True
+    
+    return False
+
+def reference_format_specific_response(query: str) -> Optional[str]:
+    """Handle specific query types with structured responses"""
+    query_lower = query.lower()
+    
+    # Language queries
+    language_queries = {
+        "german": "Mayank's German proficiency: Intermediate (A2 certified)",
+        "english": "Mayank's English proficiency: Fluent",
+        "hindi": "Mayank's Hindi proficiency: Native",
+        "marathi": "Mayank's Marathi proficiency: Native",
+    }
+    
+    for lang, response in language_queries.items():
+        if f"speak {lang}" in query_lower or f"know {lang}" in query_lower or f"{lang} proficiency" in query_lower:
+            return response
+    
+    # What languages does Mayank speak?
+    if "what language" in query_lower or "languages does" in query_lower:
+        languages = PORTFOLIO_DATA["profile"]["languages"]
+        return f"Mayank speaks: {', '.join(languages)}"
+    
+    # Specific project queries
+    projects = PORTFOLIO_DATA["projects"]
+    for project in projects:
+        project_name = project["name"].lower()
+        if "phishguard" in query_lower or "phishing" in query_lower:
+            return format_project_response(project) if "phishguard" in project_name else None
+        elif "part number" in query_lower:
+            return format_project_response(project) if "part number" in project_name else None
+        elif "yogar" in query_lower or "yoga" in query_lower:
+            return format_project_response(project) if "yogar" in project_name else None
+    
+    # Education list
+    if "education" in query_lower or "degree" in query_lower or "study" in query_lower:
+        education = PORTFOLIO_DATA["education"]
+        response = ["Mayank's Education:"]
+        for edu in education:
+            degree = edu["degree"].replace("[EDUCATION] ", "")
+            response.append(f"• {degree} at {edu['institution']} ({edu['year']})")
+        return "\n".join(response)
+    
+    # Experience list
+    if "experience" in query_lower or "work" in query_lower or "job" in query_lower:
+        experience = PORTFOLIO_DATA["experience"]
+        response = ["Mayank's Work Experience (most recent first):"]
+        for exp in experience:
+            role = exp["role"].replace("[EXPERIENCE] ", "")
+            response.append(f"\n{role}")
+            response.append(f"  Company: {exp['company']}")
+            response.append(f"  Period: {exp['period']}")
+            if 'description' in exp:
+                response.append(f"  Description: {exp['description']}")
+            if 'technologies' in exp:
+                response.append(f"  Technologies: {', '.join(exp['technologies'])}")
+        return "\n".join(response)
+    
+    # Skills
+    if "skill" in query_lower or "technical" in query_lower:
+        skills = PORTFOLIO_DATA["skills"]
+        response = ["Mayank's Technical Skills:"]
+        response.append("\nAI & ML:")
+        response.extend([f"  • {skill}" for skill in skills["ai_ml"]])
+        response.append("\nDevelopment:")
+        response.extend([f"  • {skill}" for skill in skills["development"]])
+        response.append("\nBackend & Databases:")
+        response.extend([f"  • {skill}" for skill in skills["backend_database"]])
+        response.append("\nSoft Skills:")
+        response.extend([f"  • {skill}" for skill in skills["soft_skills"]])
+        return "\n".join(response)
+    
+    # Contact/email
+    if "contact" in query_lower or "email" in query_lower or "reach" in query_lower:
+        profile = PORTFOLIO_DATA["profile"]
+        return f"Mayank can be contacted at: {profile['email']}\nLocation: {profile['location']}\nAvailability: {profile['availability']}"
+    
+    return None
+
+
+# ---------- GENERATED CORPUS ----------
+SAMPLE_QUESTIONS = [
+    "What is Mayank's education?",
+    "What is his project YogAR about?",
+    "How does Mayank's AI experience connect to his projects?",
+    "Tell me about his experience and education",
+    "What is the Part Number Recognition system project?",
+    "Does Mayank speak German?",
+    "What is his location?",
+    "Who is his mentor?",
+    "Who won the world cup in 2022?",
+    "What is AI in general?",
+    "Who is the president of India?",
+    "What is the weather today?",
+    "What programming languages does he know?",
+    "Is Mayank available for hire?",
+]
+
+PREFIXES = [
+    "", "", "", "what is ", "what is", "who is ", "who is the ", "who are the ", "who won ", "who ",
+    "tell me about ", "tell me about", "explain ", "what does ", "what are ", "what was ", "what were ",
+    "where ", "when ", "how ", "how does ", "how do ", "does ", "can you ", "  ",
+]
+SEPARATORS = [" ", " ", " ", "", "'s ", " and ", ", ", "? ", "-", " in general "]
+NOISE = ["the", "a", "of", "in", "today", "2022", "xyz", "is", "his", "he", "him", "who", "it", "s"]
+
+
+def reference_keywords():
+    """Every string literal in the reference functions, used as question fragments"""
+    found = set(PORTFOLIO_KEYWORDS)
+    functions = [reference_is_portfolio_question, reference_detect_section, reference_rag_out_of_context,
+                 reference_gemini_out_of_context, reference_format_specific_response]
+    stack = [constant for function in functions for constant in function.__code__.co_consts]
+    while stack:
+        constant = stack.pop()
+        if isinstance(constant, str) and "\n" not in constant and len(constant) < 40:
+            found.add(constant)
+        elif isinstance(constant, tuple):
+            stack.extend(constant)
+        elif hasattr(constant, "co_consts"):
+            stack.extend(constant.co_consts)
+    return sorted(found)
+
+
+def generate(rng, fragments, count):
+    for _ in range(count):
+        text = rng.choice(PREFIXES)
+        for _ in range(rng.randint(0, 4)):
+            fragment = rng.choice(fragments)
+            if rng.random() < 0.1:
+                # Part of a keyword, to hit near misses
+                start = rng.randint(0, len(fragment))
+                fragment = fragment[start:start + rng.randint(1, 6)]
+            text += fragment + rng.choice(SEPARATORS)
+
+        roll = rng.random()
+        if roll < 0.1:
+            text = text.upper()
+        elif roll < 0.2:
+            text = text.title()
+        elif roll < 0.3:
+            text = text.capitalize()
+        if rng.random() < 0.5:
+            text = text.strip()
+        if rng.random() < 0.3:
+            text += "?"
+        yield text
+
+
+def decisions(question):
+    return (
+        reference_is_portfolio_question(question),
+        reference_detect_section(question),
+        reference_rag_out_of_context(question),
+        reference_gemini_out_of_context(question),
+        reference_format_specific_response(question),
+    ), (
+        query_guard.is_portfolio_question(question),
+        query_guard.detect_section(question),
+        query_guard.rag_out_of_context(question),
+        query_guard.gemini_out_of_context(question),
+        format_specific_response(question),
+    )
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    rng = random.Random(0)
+    fragments = reference_keywords() + NOISE
+    questions = SAMPLE_QUESTIONS + list(generate(rng, fragments, count))
+
+    names = ["is_portfolio_question", "detect_section", "rag is_out_of_context",
+             "gemini is_out_of_context", "format_specific_response"]
+    mismatches = []
+    outcomes = [dict() for _ in names]
+    for question in questions:
+        expected, actual = decisions(question)
+        for i, value in enumerate(expected):
+            key = value if not isinstance(value, str) or len(value) < 20 else value[:20] + "..."
+            outcomes[i][key] = outcomes[i].get(key, 0) + 1
+        if expected != actual:
+            mismatches.append((question, expected, actual))
+
+    print(f"Query guard differential check: {len(questions)} questions, {len(fragments)} fragments")
+    print("=" * 80)
+    for name, counts in zip(names, outcomes):
+        summary = ", ".join(f"{key!r}: {n}" for key, n in sorted(counts.items(), key=lambda item: -item[1]))
+        print(f"{name:<26} {summary}")
+
+    if mismatches:
+        print(f"\n{len(mismatches)} MISMATCHES")
+        for question, expected, actual in mismatches[:10]:
+            diff = [names[i] for i in range(len(names)) if expected[i] != actual[i]]
+            print(f"  {question!r}: {', '.join(diff)}")
+        sys.exit(1)
+    print("\nAll decisions identical")
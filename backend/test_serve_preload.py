@@ -0,0 +1,43 @@
+# test_serve_preload.py
+# Checks that serve.py's preload (what the launcher loads before forking the
+# workers) starts no threads: the Gemini client's event loop thread, the
+# answer pool, the deep check and the Qwen batching loop must only start in
+# the workers. Each answer pipeline is preloaded in its own process.
+# Exits non-zero on a failure.
+#
+#   python test_serve_preload.py
+import json
+import os
+import subprocess
+import sys
+
+PIPELINES = ["gemini", "rag"]
+
+if len(sys.argv) > 1:
+    # Child: preload one pipeline and report the threads it left running
+    os.environ["ANSWER_PIPELINE"] = sys.argv[1]
+    import serve
+    serve.preload()
+    print(json.dumps(serve.started_threads()))
+    sys.exit(0)
+
+failures = []
+
+
+def check(name: str, condition: bool, detail=""):
+    print(f"{'ok  ' if condition else 'FAIL'} {name} {detail}")
+    if not condition:
+        failures.append(name)
+
+
+for pipeline in PIPELINES:
+    result = subprocess.run([sys.executable, __file__, pipeline], capture_output=True, text=True)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        check(f"{pipeline}: preload", False, result.stderr.strip()[-500:])
+        continue
+    threads = json.loads(lines[-1])
+    check(f"{pipeline}: preload starts no threads", threads == [], threads)
+
+print(f"\n{len(failures)} failure(s)")
+sys.exit(1 if failures else 0)
@@ -0,0 +1,83 @@
+# test_stream_errors.py
+# Checks that a local model generation that raises ends a /chat/stream
+# response with an "error" event (instead of leaving the client and an
+# answer pool worker waiting forever), with and without QWEN_BATCHING.
+# Runs the rag pipeline with the local model only. Exits non-zero on a failure.
+#
+#   python test_stream_errors.py
+import os
+import sys
+import threading
+
+os.environ.update(ANSWER_PIPELINE="rag", USE_GEMINI="false", SEMANTIC_CACHE="false")
+
+from fastapi.testclient import TestClient
+
+import model
+from app import app
+from batching import BatchEngine
+from worker_pool import answer_pool
+
+# Reaches the local model: about Mayank, but no hard-locked section
+QUESTION = "What motivates Mayank?"
+TIMEOUT = 60
+
+
+# ---------- CHECKS ----------
+failures = []
+
+
+def check(name: str, condition: bool, detail=""):
+    print(f"{'ok  ' if condition else 'FAIL'} {name} {detail}")
+    if not condition:
+        failures.append(name)
+
+
+def stream_events(client, question: str):
+    """The event names of a /chat/stream response, or None if it did not end within TIMEOUT"""
+    events = []
+
+    def read():
+        with client.stream("POST", "/chat/stream", json={"question": question}) as response:
+            for line in response.iter_lines():
+                if line.startswith("event: "):
+                    events.append(line[len("event: "):])
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    reader.join(TIMEOUT)
+    return None if reader.is_alive() else events
+
+
+def failing_generate(*args, **kwargs):
+    raise RuntimeError("simulated generation failure")
+
+
+def main():
+    model.load()
+    client = TestClient(app)
+
+    # model.generate() in its own thread
+    model.batch_engine = None
+    real_generate = model.model.generate
+    model.model.generate = failing_generate
+    try:
+        events = stream_events(client, QUESTION)
+    finally:
+        model.model.generate = real_generate
+    check("unbatched: stream ends with an error", events is not None and events[-2:] == ["error", "done"], events)
+
+    # The continuous batching engine
+    model.batch_engine = BatchEngine(model.model, eos_token_id=model.tokenizer.eos_token_id)
+    model.batch_engine._prefill = failing_generate
+    events = stream_events(client, f"{QUESTION} ")
+    check("batched: stream ends with an error", events is not None and events[-2:] == ["error", "done"], events)
+
+    check("no answer pool worker left busy", answer_pool.stats()["in_flight"] == 0, answer_pool.stats())
+
+    print(f"\n{len(failures)} failure(s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
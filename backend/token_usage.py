@@ -0,0 +1,46 @@
+import threading
+
+from tracing import note
+
+
+class TokenUsage:
+    """Running totals of Gemini token counts, read from each response's usage_metadata"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.output_tokens = 0
+        self.last_call = {}
+
+    def record(self, response) -> dict:
+        """Record the usage of a finished (or fully iterated streaming) response"""
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is None:
+            return {}
+
+        usage = {
+            "prompt_tokens": getattr(metadata, "prompt_token_count", 0) or 0,
+            "cached_tokens": getattr(metadata, "cached_content_token_count", 0) or 0,
+            "output_tokens": getattr(metadata, "candidates_token_count", 0) or 0,
+        }
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += usage["prompt_tokens"]
+            self.cached_tokens += usage["cached_tokens"]
+            self.output_tokens += usage["output_tokens"]
+            self.last_call = usage
+        note("gemini_tokens", usage)
+        return usage
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "prompt_tokens": self.prompt_tokens,
+                "cached_tokens": self.cached_tokens,
+                "output_tokens": self.output_tokens,
+                "avg_prompt_tokens": round(self.prompt_tokens / self.calls, 1) if self.calls else 0.0,
+                "last_call": self.last_call,
+            }
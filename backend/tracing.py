@@ -0,0 +1,77 @@
+"""
+Per-request timing of the answer stages.
+
+An endpoint creates a Trace and runs the pipeline with traced(); the stages
+time themselves with `with span("name"):` and, in explain mode, attach
+details with note(). Outside a traced call both are no-ops, so the
+pipeline functions can be used (and benchmarked) without a trace.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """Stage timings of one request and, with explain=True, what each stage found"""
+
+    def __init__(self, explain: bool = False):
+        self.explain = explain
+        self.created = time.perf_counter()
+        self.started = None
+        # stage -> seconds, in the order the stages first ran
+        self.timings = {}
+        self.details = {}
+
+    def add(self, stage: str, seconds: float):
+        self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def timings_ms(self) -> dict:
+        return {stage: round(seconds * 1000, 3) for stage, seconds in self.timings.items()}
+
+    def server_timing(self) -> str:
+        """The stage timings as a Server-Timing header value, plus the wait for a worker and the total"""
+        metrics = []
+        if self.started is not None:
+            metrics.append(f"queue;dur={(self.started - self.created) * 1000:.3f}")
+        metrics += [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.timings.items()]
+        metrics.append(f"total;dur={(time.perf_counter() - self.created) * 1000:.3f}")
+        return ", ".join(metrics)
+
+
+def traced(trace: Trace, fn, *args, **kwargs):
+    """Call fn with `trace` as the current trace (use it as the function run on the answer pool)"""
+    trace.started = time.perf_counter()
+    token = _current.set(trace)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as `stage` of the current trace"""
+    trace = _current.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add(stage, time.perf_counter() - start)
+
+
+def explaining() -> bool:
+    """Whether the current request asked for ?explain=1 (check before building costly details)"""
+    trace = _current.get()
+    return trace is not None and trace.explain
+
+
+def note(key: str, value):
+    """Record an explain detail of the current request"""
+    trace = _current.get()
+    if trace is not None and trace.explain:
+        trace.details[key] = value
@@ -0,0 +1,152 @@
+import asyncio
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Size of the answer pool and of the wait queue in front of it
+CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", "4"))
+CHAT_QUEUE_SIZE = int(os.getenv("CHAT_QUEUE_SIZE", "16"))
+
+
+class PoolSaturated(Exception):
+    """Raised when the wait queue is full and a request cannot be admitted"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Answer pool is saturated, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AnswerPool:
+    """
+    Bounded worker pool for the blocking answer pipeline.
+
+    The blocking Gemini / Qwen calls run on a dedicated thread pool so the
+    event loop stays free for /health, /sections and other requests. At most
+    `max_workers` calls run at once and at most `max_queue` more wait for a
+    worker; anything beyond that is rejected immediately with PoolSaturated.
+    """
+
+    def __init__(self, max_workers: int = CHAT_WORKERS, max_queue: int = CHAT_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="answer")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._avg_latency = 1.0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _admit(self):
+        with self._lock:
+            if self._queued + self._in_flight >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PoolSaturated(self._retry_after())
+            self._queued += 1
+
+    def _retry_after(self) -> int:
+        # Rough time for the current backlog to drain, at least one second
+        backlog = self._queued + self._in_flight
+        return max(1, math.ceil(self._avg_latency * backlog / self.max_workers))
+
+    def _call(self, fn, args, kwargs):
+        with self._lock:
+            self._queued -= 1
+            self._in_flight += 1
+        start = time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self._in_flight -= 1
+                self._avg_latency = 0.8 * self._avg_latency + 0.2 * elapsed
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def _on_done(self, future):
+        # A request cancelled while still waiting never reaches _call
+        if future.cancelled():
+            with self._lock:
+                self._queued -= 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Run a blocking function on the pool, raising PoolSaturated if the queue is full"""
+        self._admit()
+        future = self._executor.submit(self._call, fn, args, kwargs)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def stream(self, fn, *args, **kwargs):
+        """
+        Run a blocking generator on the pool and return an async iterator over its items.
+
+        Admission happens immediately, so PoolSaturated is raised before any
+        response has been started. The generator is stopped early if the
+        consumer goes away.
+        """
+        self._admit()
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        stopped = threading.Event()
+
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, item)
+            except RuntimeError:
+                # The event loop has already shut down
+                stopped.set()
+
+        def produce():
+            generator = fn(*args, **kwargs)
+            try:
+                for item in generator:
+                    if stopped.is_set():
+                        break
+                    put(("item", item))
+            except Exception as e:
+                put(("error", e))
+            finally:
+                generator.close()
+                put(("done", None))
+
+        future = self._executor.submit(self._call, produce, (), {})
+        future.add_done_callback(self._on_done)
+
+        async def consume():
+            try:
+                while True:
+                    kind, value = await items.get()
+                    if kind == "done":
+                        return
+                    if kind == "error":
+                        raise value
+                    yield value
+            finally:
+                stopped.set()
+
+        return consume()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "queue_size": self.max_queue,
+                "queue_depth": self._queued,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_latency_seconds": round(self._avg_latency, 4),
+            }
+
+
+answer_pool = AnswerPool()
@@ -26,14 +26,53 @@ export default function AIChat() {
     setLoading(true)
 
     try {
-      const res = await fetch("https://MortalMax-portfolio-api.hf.space/chat", {
+      const res = await fetch("https://MortalMax-portfolio-api.hf.space/chat/stream", {
         method: "POST",
-        headers: { "Content-Type": "application/json" },
+        headers: { "Content-Type": "application/json", Accept: "text/event-stream" },
         body: JSON.stringify({ question: userMessage.content }),
       })
 
-      const data = await res.json()
-      setMessages((prev) => [...prev, { role: "assistant", content: data.answer }])
+      if (!res.ok || !res.body) throw new Error(`Request failed: ${res.status}`)
+
+      // Add the assistant bubble on the first event and fill it in as events arrive
+      let started = false
+      const setAnswer = (update: (content: string) => string) => {
+        if (!started) {
+          started = true
+          setLoading(false)
+          setMessages((prev) => [...prev, { role: "assistant", content: update("") }])
+          return
+        }
+        setMessages((prev) => {
+          const last = prev[prev.length - 1]
+          return [...prev.slice(0, -1), { ...last, content: update(last.content) }]
+        })
+      }
+
+      const reader = res.body.getReader()
+      const decoder = new TextDecoder()
+      let buffer = ""
+
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += decoder.decode(value, { stream: true })
+
+        // Server-Sent Events are separated by a blank line
+        const events = buffer.split("\n\n")
+        buffer = events.pop() ?? ""
+
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1]
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] ?? "{}")
+
+          if (event === "token") {
+            setAnswer((content) => content + data.text)
+          } else if (event === "answer" || event === "retract" || event === "error") {
+            setAnswer(() => data.text)
+          }
+        }
+      }
     } catch {
       setMessages((prev) => [
         ...prev,